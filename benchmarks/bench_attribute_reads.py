@@ -0,0 +1,151 @@
+#!/usr/bin/env python
+#
+# Copyright (c) 2015-2017 Axel Huebl, Remi Lehe
+#
+# Permission to use, copy, modify, and/or distribute this software for any
+# purpose with or without fee is hereby granted, provided that the above
+# copyright notice and this permission notice appear in all copies.
+#
+# THE SOFTWARE IS PROVIDED "AS IS" AND THE AUTHOR DISCLAIMS ALL WARRANTIES
+# WITH REGARD TO THIS SOFTWARE INCLUDING ALL IMPLIED WARRANTIES OF
+# MERCHANTABILITY AND FITNESS. IN NO EVENT SHALL THE AUTHOR BE LIABLE FOR
+# ANY SPECIAL, DIRECT, INDIRECT, OR CONSEQUENTIAL DAMAGES OR ANY DAMAGES
+# WHATSOEVER RESULTING FROM LOSS OF USE, DATA OR PROFITS, WHETHER IN AN
+# ACTION OF CONTRACT, NEGLIGENCE OR OTHER TORTIOUS ACTION, ARISING OUT OF
+# OR IN CONNECTION WITH THE USE OR PERFORMANCE OF THIS SOFTWARE.
+#
+"""
+Micro-benchmark: HDF5 attribute-read calls per record
+
+Counts the calls into h5py's attribute interface (name listings, existence
+tests and value reads) while checking one iteration of the example file,
+once with the former `get_attr` (list of all names + one read per call) on
+plain h5py objects and once on the index, whose IndexAttrs only read the
+values that the checks need (types come from the stored datatypes).
+
+IndexAttrs introspect the attributes with the low-level h5a interface, so
+the calls of both interfaces are counted: the totals are those of the
+low-level calls, which the high-level ones make as well.
+
+Usage (from the repository root):
+  PYTHONPATH=. python benchmarks/bench_attribute_reads.py
+"""
+
+import os
+import sys
+import tempfile
+from contextlib import contextmanager
+
+import h5py as h5
+from h5py import h5a
+from h5py._hl.attrs import AttributeManager
+
+from openpmd_validator import check_h5, createExamples_h5
+
+
+def legacy_get_attr(f, name):
+    """ get_attr as it was before the attribute snapshots """
+    if name in list(f.attrs.keys()):
+        return(True, f.attrs[name])
+    else:
+        return(False, None)
+
+
+# the counted functions of the high-level and of the low-level interface
+high_level_calls = ("__iter__", "__contains__", "__getitem__")
+low_level_calls = ("get_num_attrs", "iterate", "exists", "open")
+
+
+@contextmanager
+def count_attribute_calls():
+    """
+    Count the calls of the h5py attribute interface, as a dictionary
+    {"AttributeManager.<method>" or "h5a.<function>": calls}
+    """
+    counts = {}
+    originals = []
+
+    def counting(name, function):
+        counts[name] = 0
+
+        def wrapped(*args, **kwargs):
+            counts[name] += 1
+            return function(*args, **kwargs)
+        return wrapped
+
+    for owner, prefix, names in ((AttributeManager, "AttributeManager.",
+                                  high_level_calls),
+                                 (h5a, "h5a.", low_level_calls)):
+        for name in names:
+            function = getattr(owner, name)
+            originals.append((owner, name, function))
+            setattr(owner, name, counting(prefix + name, function))
+    try:
+        yield counts
+    finally:
+        for owner, name, function in originals:
+            setattr(owner, name, function)
+
+
+def count_records(f, iteration):
+    """ Number of mesh and particle records of an iteration """
+    base_path = "/data/%s/" % iteration
+    n = len(f[base_path + "meshes"])
+    for species in f[base_path + "particles"].values():
+        n += len(species)
+    return n
+
+
+def check_iteration(f, iteration, extensionStates):
+    """ The per-iteration checks of check_iterations """
+    with open(os.devnull, "w") as devnull:
+        stdout, sys.stdout = sys.stdout, devnull
+        try:
+            check_h5.check_base_path(f, iteration, False, extensionStates)
+            check_h5.check_meshes(f, iteration, False, extensionStates)
+            check_h5.check_particles(f, iteration, False, extensionStates)
+        finally:
+            sys.stdout = stdout
+
+
+def main():
+    file_name = os.path.join(tempfile.mkdtemp(), "example.h5")
+    f = h5.File(file_name, "w")
+    createExamples_h5.setup_root_attr(f)
+    createExamples_h5.setup_base_path(f, iteration=0)
+    createExamples_h5.write_meshes(f, iteration=0)
+    createExamples_h5.write_particles(f, iteration=0)
+    f.close()
+
+    f = h5.File(file_name, "r")
+    extensionStates = {"ED-PIC": True}
+    n_records = count_records(f, 0)
+
+    get_attr = check_h5.get_attr
+    check_h5.get_attr = legacy_get_attr
+    try:
+        with count_attribute_calls() as before:
+            check_iteration(f, "0", extensionStates)
+    finally:
+        check_h5.get_attr = get_attr
+
+    with count_attribute_calls() as after:
+        it = check_h5.build_index(f, "/data/0/")
+        check_iteration(it, "0", extensionStates)
+    f.close()
+
+    print("Attribute-read calls for %d records:" % n_records)
+    print("%-30s %10s %10s" % ("call", "before", "after"))
+    for name in [ "AttributeManager." + name for name in high_level_calls ] \
+            + [ "h5a." + name for name in low_level_calls ]:
+        print("%-30s %10d %10d" % (name, before[name], after[name]))
+    total_before = sum( before["h5a." + name] for name in low_level_calls )
+    total_after = sum( after["h5a." + name] for name in low_level_calls )
+    print("%-30s %10d %10d" % ("total (h5a)", total_before, total_after))
+    print("%-30s %10.1f %10.1f" % ("per record",
+                                   float(total_before) / n_records,
+                                   float(total_after) / n_records))
+
+
+if __name__ == "__main__":
+    main()
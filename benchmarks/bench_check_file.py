@@ -0,0 +1,285 @@
+#!/usr/bin/env python
+#
+# Copyright (c) 2015-2017 Axel Huebl, Remi Lehe
+#
+# Permission to use, copy, modify, and/or distribute this software for any
+# purpose with or without fee is hereby granted, provided that the above
+# copyright notice and this permission notice appear in all copies.
+#
+# THE SOFTWARE IS PROVIDED "AS IS" AND THE AUTHOR DISCLAIMS ALL WARRANTIES
+# WITH REGARD TO THIS SOFTWARE INCLUDING ALL IMPLIED WARRANTIES OF
+# MERCHANTABILITY AND FITNESS. IN NO EVENT SHALL THE AUTHOR BE LIABLE FOR
+# ANY SPECIAL, DIRECT, INDIRECT, OR CONSEQUENTIAL DAMAGES OR ANY DAMAGES
+# WHATSOEVER RESULTING FROM LOSS OF USE, DATA OR PROFITS, WHETHER IN AN
+# ACTION OF CONTRACT, NEGLIGENCE OR OTHER TORTIOUS ACTION, ARISING OUT OF
+# OR IN CONNECTION WITH THE USE OR PERFORMANCE OF THIS SOFTWARE.
+#
+"""
+Benchmark suite: check_file on synthetic files along several axes
+
+Writes openPMD files with the writers of createExamples_h5 and scales one
+axis at a time, the others staying at their default:
+
+  iterations    number of iterations (copies of the first one)
+  species       number of particle species (copies of `electrons`)
+  records       number of mesh records (copies of `E` besides rho, E, B)
+  components    number of components of the vector mesh records
+  attributes    additional attributes on every group and dataset
+  cells         cells per side of an additional 2D mesh record (file size)
+
+and times check_file in each mode: serial, with worker processes, with a
+warm result cache, with --check-data and with a data sample. The best time
+of a few repetitions is reported and can be written to JSON, together with
+the versions of the software and the git commit, so that two commits can be
+compared on the same machine.
+
+Usage (from the repository root):
+  PYTHONPATH=. python benchmarks/bench_check_file.py [-o results.json]
+      [--axes iterations,species] [--modes serial,data] [--repeat N]
+      [--workers N]
+  PYTHONPATH=. python benchmarks/bench_check_file.py \\
+      --compare before.json after.json
+"""
+
+import getopt
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+import h5py as h5
+import numpy as np
+
+from openpmd_validator import check_h5, createExamples_h5
+from openpmd_validator.cache_h5 import ResultCache
+from openpmd_validator.data_h5 import DataCheck
+
+
+# parameters of the files, when they are not scaled
+defaults = {"iterations": 1, "species": 1, "records": 3, "components": 3,
+            "attributes": 0, "cells": 0}
+
+# values of each axis
+axes = [
+    ("iterations", [1, 4, 16, 64]),
+    ("species", [1, 4, 16, 64]),
+    ("records", [3, 12, 48]),
+    ("components", [3, 12, 48]),
+    ("attributes", [0, 16, 64]),
+    ("cells", [64, 512, 2048]),
+]
+
+modes = ["serial", "workers", "cached", "data", "sampled"]
+
+
+def write_file(file_name, iterations=1, species=1, records=3, components=3,
+               attributes=0, cells=0):
+    """
+    Write a valid openPMD file with the given sizes, see the module
+    documentation. The first iteration is written with createExamples_h5,
+    extended and then copied to the other iterations.
+    """
+    f = h5.File(file_name, "w")
+    createExamples_h5.setup_root_attr(f)
+    createExamples_h5.setup_base_path(f, 0)
+    createExamples_h5.write_meshes(f, 0)
+    createExamples_h5.write_particles(f, 0)
+
+    meshes = f["/data/0/meshes"]
+    E = meshes["E"]
+    for i in range(3, components):
+        E.copy("x", "x%d" % i)
+    for i in range(3, records):
+        meshes.copy("E", "E%d" % i)
+    if cells > 0:
+        # writes the record `E` into a scratch group and moves it
+        scratch = f.create_group("scratch")
+        data = np.random.rand(cells, cells)
+        createExamples_h5.write_e_2d_cartesian(scratch, data, data, data)
+        f.move("scratch/E", "/data/0/meshes/Ecells")
+        del f["scratch"]
+
+    particles = f["/data/0/particles"]
+    for i in range(1, species):
+        particles.copy("electrons", "electrons%d" % i)
+
+    if attributes > 0:
+        def add_attributes(name, obj):
+            for i in range(attributes):
+                obj.attrs["benchmarkAttribute%d" % i] = np.float64(i)
+        f["/data/0"].visititems(add_attributes)
+
+    for iteration in range(1, iterations):
+        f.copy("/data/0", "/data/%d" % iteration)
+    f.close()
+
+
+def check(file_name, mode, workers, cache_directory):
+    """ Check `file_name` once in `mode` and return the Result """
+    options = {"cache": False}
+    if mode == "workers":
+        options["workers"] = workers
+    elif mode == "cached":
+        options["cache"] = ResultCache(cache_directory)
+    elif mode == "data":
+        options["data_check"] = True
+    elif mode == "sampled":
+        options["data_check"] = DataCheck(sample_bytes=1024**2)
+    return check_h5.check_file(file_name, False, True,
+                               findings=check_h5.Findings(echo=False),
+                               **options)
+
+
+def time_check(file_name, mode, workers, repeat, cache_directory):
+    """
+    The best of `repeat` timings of check in `mode`
+
+    Returns
+    -------
+    A tuple (seconds, Result)
+    """
+    if mode == "cached":
+        # warm the cache
+        check(file_name, mode, workers, cache_directory)
+    best = None
+    for _ in range(repeat):
+        start = time.time()
+        result_array = check(file_name, mode, workers, cache_directory)
+        seconds = time.time() - start
+        if best is None or seconds < best:
+            best = seconds
+    return best, result_array
+
+
+def git_commit():
+    """ The git commit of the working tree, None if it is unknown """
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "HEAD"],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            stderr=subprocess.STDOUT).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(axis_names, mode_names, repeat, workers):
+    """ Run the benchmarks and return them as a JSON-serializable dict """
+    directory = tempfile.mkdtemp()
+    results = []
+    try:
+        print("%-12s %6s %-8s %10s %8s %8s" % ("axis", "value", "mode",
+              "time [s]", "errors", "size MB"))
+        for axis, values in axes:
+            if axis not in axis_names:
+                continue
+            for value in values:
+                parameters = dict(defaults)
+                parameters[axis] = value
+                file_name = os.path.join(directory, "%s_%d.h5"
+                                         % (axis, value))
+                write_file(file_name, **parameters)
+                size = os.path.getsize(file_name)
+                for mode in mode_names:
+                    cache_directory = os.path.join(directory, "cache")
+                    seconds, result_array = time_check(
+                        file_name, mode, workers, repeat, cache_directory)
+                    shutil.rmtree(cache_directory, ignore_errors=True)
+                    results.append({"axis": axis, "value": value,
+                                    "mode": mode, "seconds": seconds,
+                                    "errors": result_array[0],
+                                    "warnings": result_array[1],
+                                    "bytes": size})
+                    print("%-12s %6d %-8s %10.4f %8d %8.1f"
+                          % (axis, value, mode, seconds, result_array[0],
+                             size / 1.e6))
+                    sys.stdout.flush()
+                os.remove(file_name)
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+    return {"commit": git_commit(),
+            "machine": platform.node(),
+            "python": platform.python_version(),
+            "h5py": h5.version.version,
+            "hdf5": h5.version.hdf5_version,
+            "repeat": repeat, "workers": workers,
+            "results": results}
+
+
+def compare(before_name, after_name):
+    """ Print the timings of two result files side by side """
+    runs = []
+    for file_name in (before_name, after_name):
+        with open(file_name) as json_file:
+            runs.append(json.load(json_file))
+    before, after = [ dict(((r["axis"], r["value"], r["mode"]), r["seconds"])
+                           for r in run["results"]) for run in runs ]
+    print("before: %s\nafter:  %s" % (runs[0]["commit"], runs[1]["commit"]))
+    if runs[0]["machine"] != runs[1]["machine"]:
+        print("Warning: the runs are from different machines!")
+    print("%-12s %6s %-8s %10s %10s %7s" % ("axis", "value", "mode",
+          "before [s]", "after [s]", "ratio"))
+    for r in runs[1]["results"]:
+        key = (r["axis"], r["value"], r["mode"])
+        if key not in before:
+            continue
+        print("%-12s %6d %-8s %10.4f %10.4f %7.2f"
+              % (key + (before[key], after[key], after[key] / before[key])))
+
+
+def usage():
+    print(__doc__)
+    sys.exit(2)
+
+
+def main(argv):
+    try:
+        opts, args = getopt.getopt(argv, "ho:",
+                                   ["axes=", "modes=", "repeat=", "workers=",
+                                    "compare"])
+    except getopt.GetoptError:
+        usage()
+    output = None
+    axis_names = [ axis for axis, _ in axes ]
+    mode_names = list(modes)
+    repeat = 3
+    workers = 4
+    for opt, arg in opts:
+        if opt == "-h":
+            usage()
+        elif opt == "-o":
+            output = arg
+        elif opt == "--axes":
+            axis_names = arg.split(",")
+        elif opt == "--modes":
+            mode_names = arg.split(",")
+        elif opt == "--repeat":
+            repeat = int(arg)
+        elif opt == "--workers":
+            workers = int(arg)
+        elif opt == "--compare":
+            if len(args) != 2:
+                usage()
+            compare(*args)
+            return
+    for name in axis_names:
+        if name not in defaults:
+            print("Unknown axis '%s'!" % name)
+            usage()
+    for name in mode_names:
+        if name not in modes:
+            print("Unknown mode '%s'!" % name)
+            usage()
+
+    results = run(axis_names, mode_names, repeat, workers)
+    if output is not None:
+        with open(output, "w") as json_file:
+            json.dump(results, json_file, indent=2, sort_keys=True)
+        print("Results written to %s" % output)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,216 @@
+#!/usr/bin/env python
+#
+# Copyright (c) 2015-2017 Axel Huebl, Remi Lehe
+#
+# Permission to use, copy, modify, and/or distribute this software for any
+# purpose with or without fee is hereby granted, provided that the above
+# copyright notice and this permission notice appear in all copies.
+#
+# THE SOFTWARE IS PROVIDED "AS IS" AND THE AUTHOR DISCLAIMS ALL WARRANTIES
+# WITH REGARD TO THIS SOFTWARE INCLUDING ALL IMPLIED WARRANTIES OF
+# MERCHANTABILITY AND FITNESS. IN NO EVENT SHALL THE AUTHOR BE LIABLE FOR
+# ANY SPECIAL, DIRECT, INDIRECT, OR CONSEQUENTIAL DAMAGES OR ANY DAMAGES
+# WHATSOEVER RESULTING FROM LOSS OF USE, DATA OR PROFITS, WHETHER IN AN
+# ACTION OF CONTRACT, NEGLIGENCE OR OTHER TORTIOUS ACTION, ARISING OUT OF
+# OR IN CONNECTION WITH THE USE OR PERFORMANCE OF THIS SOFTWARE.
+#
+"""
+Benchmark: sweep the HDF5 file access settings of check_file on one file
+
+A full grid of all settings is too large to time, so the settings are
+swept one at a time from the HDF5 defaults:
+
+  driver          sec2 (default), stdio, core
+  page buffer     1 MiB, 16 MiB (only for files with paged file space)
+  metadata cache  8 MiB, 32 MiB, 128 MiB
+  chunk cache     16 MiB and 64 MiB with 10007 slots, 100003 slots
+  libver          latest
+
+and then the best value of each setting that beat the defaults are timed
+together. The fastest configuration is printed with the options of
+openPMD_check_h5 that select it.
+
+Run it on the filesystem that holds the files to check. The operating
+system caches the file after the first check, so the timings are those of
+a warm cache unless the file is larger than the memory.
+
+Usage (from the repository root):
+  PYTHONPATH=. python benchmarks/bench_file_access.py [-i <file>]
+      [--check-data] [-j <N>] [--repeat N] [-o results.json]
+
+Without -i, a synthetic file with 16 iterations is written and checked.
+"""
+
+import getopt
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import h5py as h5
+
+from bench_check_file import git_commit, write_file
+from openpmd_validator import check_h5
+from openpmd_validator.access_h5 import FileAccess, is_paged
+
+
+# values of each setting besides the HDF5 default
+settings = [
+    ("driver", [{"driver": "stdio"}, {"driver": "core"}]),
+    ("page buffer", [{"page_buf_size": 1024**2},
+                     {"page_buf_size": 16 * 1024**2}]),
+    ("metadata cache", [{"mdc_bytes": 8 * 1024**2},
+                        {"mdc_bytes": 32 * 1024**2},
+                        {"mdc_bytes": 128 * 1024**2}]),
+    ("chunk cache", [{"rdcc_nbytes": 16 * 1024**2, "rdcc_nslots": 10007},
+                     {"rdcc_nbytes": 64 * 1024**2, "rdcc_nslots": 100003}]),
+    ("libver", [{"libver": "latest"}]),
+]
+
+# options of openPMD_check_h5 for the FileAccess parameters
+cli_options = [("driver", "--driver"), ("page_buf_size", "--page-buffer"),
+               ("mdc_bytes", "--metadata-cache"),
+               ("rdcc_nbytes", "--chunk-cache"),
+               ("rdcc_nslots", "--chunk-slots"), ("libver", "--libver")]
+
+
+def time_check(file_name, parameters, data_check, workers, repeat):
+    """
+    The best of `repeat` timings of check_file with the FileAccess of
+    `parameters`
+
+    Returns
+    -------
+    A tuple (seconds, Result)
+    """
+    best = None
+    for _ in range(repeat):
+        start = time.time()
+        result_array = check_h5.check_file(
+            file_name, False, False, workers=workers,
+            findings=check_h5.Findings(echo=False), cache=False,
+            data_check=data_check, file_access=FileAccess(**parameters))
+        seconds = time.time() - start
+        if best is None or seconds < best:
+            best = seconds
+    return best, result_array
+
+
+def command_line(parameters):
+    """ The options of openPMD_check_h5 that select `parameters` """
+    return " ".join("%s %s" % (option, parameters[name])
+                    for name, option in cli_options
+                    if name in parameters) or "(none)"
+
+
+def sweep(file_name, data_check, workers, repeat):
+    """ Run the sweep and return it as a JSON-serializable dict """
+    f = h5.File(file_name, "r")
+    paged = is_paged(f)
+    f.close()
+
+    results = []
+
+    def run(setting, parameters):
+        seconds, result_array = time_check(file_name, parameters, data_check,
+                                           workers, repeat)
+        results.append({"setting": setting, "parameters": parameters,
+                        "seconds": seconds, "errors": result_array[0],
+                        "warnings": result_array[1]})
+        print("%-16s %10.4f %8d  %s"
+              % (setting, seconds, result_array[0],
+                 FileAccess(**parameters).describe()))
+        sys.stdout.flush()
+        return seconds
+
+    print("%-16s %10s %8s  %s" % ("setting", "time [s]", "errors",
+                                  "file access"))
+    # warm the cache of the operating system
+    run("warm-up", {})
+    default_seconds = run("defaults", {})
+    combined = {}
+    n_improved = 0
+    for setting, values in settings:
+        if setting == "page buffer" and not paged:
+            print("%-16s skipped: the file space of the file is not paged"
+                  % setting)
+            continue
+        best_seconds = default_seconds
+        for parameters in values:
+            seconds = run(setting, parameters)
+            if seconds < best_seconds:
+                best_seconds = seconds
+                best = parameters
+        if best_seconds < default_seconds:
+            combined.update(best)
+            n_improved += 1
+    if n_improved > 1:
+        run("combined", combined)
+
+    fastest = min(results[1:], key=lambda result: result["seconds"])
+    print("\nFastest: %s (%.4f s, defaults: %.4f s)"
+          % (FileAccess(**fastest["parameters"]).describe(),
+             fastest["seconds"], default_seconds))
+    print("Options: %s" % command_line(fastest["parameters"]))
+    return {"commit": git_commit(),
+            "file": os.path.abspath(file_name),
+            "bytes": os.path.getsize(file_name),
+            "paged": paged,
+            "check_data": data_check,
+            "h5py": h5.version.version,
+            "hdf5": h5.version.hdf5_version,
+            "repeat": repeat, "workers": workers,
+            "results": results,
+            "fastest": fastest}
+
+
+def usage():
+    print(__doc__)
+    sys.exit(2)
+
+
+def main(argv):
+    try:
+        opts, args = getopt.getopt(argv, "hi:o:j:",
+                                   ["check-data", "repeat="])
+    except getopt.GetoptError:
+        usage()
+    file_name = None
+    output = None
+    data_check = False
+    workers = 1
+    repeat = 3
+    for opt, arg in opts:
+        if opt == "-h":
+            usage()
+        elif opt == "-i":
+            file_name = arg
+        elif opt == "-o":
+            output = arg
+        elif opt == "-j":
+            workers = int(arg)
+        elif opt == "--check-data":
+            data_check = True
+        elif opt == "--repeat":
+            repeat = int(arg)
+
+    directory = None
+    if file_name is None:
+        directory = tempfile.mkdtemp()
+        file_name = os.path.join(directory, "sweep.h5")
+        write_file(file_name, iterations=16, cells=512)
+    try:
+        results = sweep(file_name, data_check, workers, repeat)
+    finally:
+        if directory is not None:
+            shutil.rmtree(directory, ignore_errors=True)
+    if output is not None:
+        with open(output, "w") as json_file:
+            json.dump(results, json_file, indent=2, sort_keys=True)
+        print("Results written to %s" % output)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,119 @@
+#!/usr/bin/env python
+#
+# Copyright (c) 2015-2017 Axel Huebl, Remi Lehe
+#
+# Permission to use, copy, modify, and/or distribute this software for any
+# purpose with or without fee is hereby granted, provided that the above
+# copyright notice and this permission notice appear in all copies.
+#
+# THE SOFTWARE IS PROVIDED "AS IS" AND THE AUTHOR DISCLAIMS ALL WARRANTIES
+# WITH REGARD TO THIS SOFTWARE INCLUDING ALL IMPLIED WARRANTIES OF
+# MERCHANTABILITY AND FITNESS. IN NO EVENT SHALL THE AUTHOR BE LIABLE FOR
+# ANY SPECIAL, DIRECT, INDIRECT, OR CONSEQUENTIAL DAMAGES OR ANY DAMAGES
+# WHATSOEVER RESULTING FROM LOSS OF USE, DATA OR PROFITS, WHETHER IN AN
+# ACTION OF CONTRACT, NEGLIGENCE OR OTHER TORTIOUS ACTION, ARISING OUT OF
+# OR IN CONNECTION WITH THE USE OR PERFORMANCE OF THIS SOFTWARE.
+#
+"""
+Benchmark: error/warning accumulation with Result vs. numpy arrays
+
+Runs the per-iteration checks of a file with many iterations on indexes
+whose attribute values were read by a first, untimed run, so that no HDF5
+I/O is timed: once with the slotted Result counts and once with every
+Result replaced by a 2-element numpy array, as the checks accumulated them
+before. Reports the number and size of the count objects allocated and the
+best wall time of both.
+
+Usage (from the repository root):
+  PYTHONPATH=. python benchmarks/bench_result_accumulation.py [iterations]
+"""
+
+import os
+import sys
+import tempfile
+import timeit
+
+import h5py as h5
+import numpy as np
+
+from openpmd_validator import check_h5, createExamples_h5
+
+
+def write_file(file_name, n_iterations):
+    """ Write the example file with `n_iterations` iterations """
+    f = h5.File(file_name, "w")
+    createExamples_h5.setup_root_attr(f)
+    for iteration in range(n_iterations):
+        createExamples_h5.setup_base_path(f, iteration)
+        createExamples_h5.write_meshes(f, iteration)
+        createExamples_h5.write_particles(f, iteration)
+    f.close()
+
+
+def numpy_result(errors=0, warnings=0):
+    """ The former accumulator of the checks """
+    return np.array([errors, warnings])
+
+
+def counting(factory, counter):
+    """ Wrap `factory` to count the objects it creates """
+    def wrapped(*args):
+        counter[0] += 1
+        return factory(*args)
+    return wrapped
+
+
+def check_iterations(indexes, extensionStates):
+    """ The per-iteration checks of check_iterations """
+    for iteration, it in indexes:
+        check_h5.check_base_path(it, iteration, False, extensionStates)
+        check_h5.check_meshes(it, iteration, False, extensionStates)
+        check_h5.check_particles(it, iteration, False, extensionStates)
+
+
+def run(indexes, factory, repeat):
+    """ Allocations, allocated bytes and best time of the checks """
+    extensionStates = {"ED-PIC": True}
+    result = check_h5.Result
+    findings = check_h5.set_findings(check_h5.Findings(echo=False))
+    try:
+        counter = [0]
+        check_h5.Result = counting(factory, counter)
+        check_iterations(indexes, extensionStates)
+
+        check_h5.Result = factory
+        time = min(timeit.repeat(
+            lambda: check_iterations(indexes, extensionStates),
+            number=1, repeat=repeat))
+    finally:
+        check_h5.Result = result
+        check_h5.set_findings(findings)
+    size = sys.getsizeof(factory())
+    return counter[0], counter[0] * size, time
+
+
+def main():
+    n_iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    file_name = os.path.join(tempfile.mkdtemp(), "iterations.h5")
+    write_file(file_name, n_iterations)
+
+    # the indexes read the attribute values from the file when they are
+    # first accessed: keep it open while the checks run
+    f = h5.File(file_name, "r")
+    root_attrs = dict(f.attrs.items())
+    indexes = [ (str(iteration),
+                 check_h5.build_index(f, "/data/%d/" % iteration, root_attrs))
+                for iteration in range(n_iterations) ]
+
+    print("Checks of %d iterations:" % n_iterations)
+    print("%-12s %12s %14s %10s" % ("counts", "allocations", "allocated",
+                                    "time"))
+    for name, factory in (("numpy array", numpy_result),
+                          ("Result", check_h5.Result)):
+        allocations, size, time = run(indexes, factory, repeat=5)
+        print("%-12s %12d %11.1f kB %8.3f s" % (name, allocations,
+                                                size / 1024., time))
+    f.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+#!/usr/bin/env python
+#
+# Copyright (c) 2015-2017 Axel Huebl, Remi Lehe
+#
+# Permission to use, copy, modify, and/or distribute this software for any
+# purpose with or without fee is hereby granted, provided that the above
+# copyright notice and this permission notice appear in all copies.
+#
+# THE SOFTWARE IS PROVIDED "AS IS" AND THE AUTHOR DISCLAIMS ALL WARRANTIES
+# WITH REGARD TO THIS SOFTWARE INCLUDING ALL IMPLIED WARRANTIES OF
+# MERCHANTABILITY AND FITNESS. IN NO EVENT SHALL THE AUTHOR BE LIABLE FOR
+# ANY SPECIAL, DIRECT, INDIRECT, OR CONSEQUENTIAL DAMAGES OR ANY DAMAGES
+# WHATSOEVER RESULTING FROM LOSS OF USE, DATA OR PROFITS, WHETHER IN AN
+# ACTION OF CONTRACT, NEGLIGENCE OR OTHER TORTIOUS ACTION, ARISING OUT OF
+# OR IN CONNECTION WITH THE USE OR PERFORMANCE OF THIS SOFTWARE.
+#
+"""
+Micro-benchmark: attribute checks per record, per call vs. rule table
+
+Checks the attributes of all records and components of one iteration of
+the example file, on an index whose attribute values were read by a first,
+untimed run: once with one test_attr call per requirement, which compiles
+types, names and regexes on every call as the checks did before, and once
+with the precompiled rules of check_h5.attribute_rules. Both runs are timed
+without and with the ED-PIC extension.
+
+Usage (from the repository root):
+  PYTHONPATH=. python benchmarks/bench_rule_table.py
+"""
+
+import os
+import tempfile
+import timeit
+
+import h5py as h5
+
+from openpmd_validator import check_h5, createExamples_h5
+
+
+def write_file(file_name):
+    """ Write one iteration of the example file """
+    f = h5.File(file_name, "w")
+    createExamples_h5.setup_root_attr(f)
+    createExamples_h5.setup_base_path(f, 0)
+    createExamples_h5.write_meshes(f, 0)
+    createExamples_h5.write_particles(f, 0)
+    f.close()
+
+
+def scoped_objects(it):
+    """ The indexed objects of one iteration, per scope of the rules """
+    meshes = it["/data/0/meshes/"]
+    objects = [ ("meshes", meshes) ]
+    for record in [ meshes[name] for name in meshes.keys() ]:
+        objects.append(("mesh_record", record))
+        components = [ record ] if check_h5.is_scalar_record(record) else \
+            [ record[name] for name in record.keys() ]
+        for component in components:
+            objects.append(("mesh_component", component))
+            objects.append(("component", component))
+    particles = it["/data/0/particles/"]
+    for species in [ particles[name] for name in particles.keys() ]:
+        objects.append(("species", species))
+        for record_name in species.keys():
+            if record_name == "particlePatches":
+                continue
+            record = species[record_name]
+            objects.append(("particle_record", record))
+            components = [ record ] if check_h5.is_scalar_record(record) \
+                else [ record[name] for name in record.keys() ]
+            for component in components:
+                if isinstance(component, check_h5.IndexGroup):
+                    objects.append(("constant", component))
+                objects.append(("component", component))
+    return objects
+
+
+def per_call(objects, extensionStates):
+    """ One test_attr call per requirement """
+    for scope, obj in objects:
+        for rule_scope, extension, request, name, is_type, type_format, \
+                condition in check_h5.attribute_rules:
+            if rule_scope != scope:
+                continue
+            if extension is not None and not extensionStates[extension]:
+                continue
+            if condition is None or condition(obj.attrs):
+                check_h5.test_attr(obj, False, request, name, is_type,
+                                   type_format)
+
+
+def rule_table(objects, extensionStates):
+    """ The precompiled rules of each scope """
+    for scope, obj in objects:
+        check_h5.check_rules(obj, False, scope, extensionStates)
+
+
+def main():
+    file_name = os.path.join(tempfile.mkdtemp(), "example.h5")
+    write_file(file_name)
+    # the index reads the attribute values from the file when they are
+    # first accessed: keep it open while the checks run
+    f = h5.File(file_name, "r")
+    it = check_h5.build_index(f, "/data/0/", dict(f.attrs.items()))
+    objects = scoped_objects(it)
+    n_records = sum( 1 for scope, _ in objects
+                     if scope in ("mesh_record", "particle_record") )
+
+    check_h5.set_findings(check_h5.Findings(echo=False))
+    # read the attribute values that the checks access
+    rule_table(objects, {"ED-PIC": True})
+    number = 200
+    print("Attribute checks of %d records (%d objects):"
+          % (n_records, len(objects)))
+    print("%-10s %-12s %14s" % ("ED-PIC", "checks", "per record"))
+    for pic in (False, True):
+        extensionStates = {"ED-PIC": pic}
+        for name, function in (("per call", per_call),
+                               ("rule table", rule_table)):
+            time = min(timeit.repeat(
+                lambda: function(objects, extensionStates),
+                number=number, repeat=5)) / number
+            print("%-10s %-12s %11.1f us" % (pic, name,
+                                             1.e6 * time / n_records))
+    f.close()
+
+
+if __name__ == "__main__":
+    main()
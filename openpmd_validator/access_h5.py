@@ -0,0 +1,140 @@
+#!/usr/bin/env python
+#
+# Copyright (c) 2015-2017 Axel Huebl, Remi Lehe
+#
+# Permission to use, copy, modify, and/or distribute this software for any
+# purpose with or without fee is hereby granted, provided that the above
+# copyright notice and this permission notice appear in all copies.
+#
+# THE SOFTWARE IS PROVIDED "AS IS" AND THE AUTHOR DISCLAIMS ALL WARRANTIES
+# WITH REGARD TO THIS SOFTWARE INCLUDING ALL IMPLIED WARRANTIES OF
+# MERCHANTABILITY AND FITNESS. IN NO EVENT SHALL THE AUTHOR BE LIABLE FOR
+# ANY SPECIAL, DIRECT, INDIRECT, OR CONSEQUENTIAL DAMAGES OR ANY DAMAGES
+# WHATSOEVER RESULTING FROM LOSS OF USE, DATA OR PROFITS, WHETHER IN AN
+# ACTION OF CONTRACT, NEGLIGENCE OR OTHER TORTIOUS ACTION, ARISING OUT OF
+# OR IN CONNECTION WITH THE USE OR PERFORMANCE OF THIS SOFTWARE.
+#
+"""
+HDF5 file access settings of the checks
+
+The checks read many small pieces of metadata and, with data checks, whole
+chunks. On parallel filesystems the HDF5 defaults (a 2 MiB metadata cache,
+no page buffer, a 1 MiB chunk cache per dataset) can make each of them a
+separate round trip. FileAccess collects the settings of the file access
+property list and opens files with them; the defaults of HDF5 are kept for
+everything that is not set.
+"""
+
+import h5py as h5
+
+
+# file drivers that can open a file for reading without further options
+drivers = ("sec2", "stdio", "core")
+
+# library version bounds (older h5py versions know fewer of them)
+libvers = ("earliest", "v108", "v110", "v112", "v114", "v200", "latest")
+
+
+class FileAccess(object):
+    """
+    Settings of the file access property list used to open files
+
+    Parameters
+    ----------
+    driver : string or None
+        The HDF5 file driver, one of `drivers` (None: the default, sec2).
+        The core driver reads the whole file into memory when opening it.
+
+    page_buf_size : int or None
+        Size of the page buffer in bytes. Only files written with the
+        paged file space strategy use it.
+
+    mdc_bytes : int or None
+        Initial and maximum size of the metadata cache in bytes
+
+    rdcc_nbytes : int or None
+        Size of the raw data chunk cache of each dataset in bytes
+
+    rdcc_nslots : int or None
+        Number of hash slots of the raw data chunk cache, ideally a prime
+        about 100 times the number of chunks that fit into it
+
+    libver : string or None
+        Lower bound of the library version of the objects, one of
+        `libvers`
+    """
+
+    def __init__(self, driver=None, page_buf_size=None, mdc_bytes=None,
+                 rdcc_nbytes=None, rdcc_nslots=None, libver=None):
+        if driver is not None and driver not in drivers:
+            raise ValueError("Unknown HDF5 file driver '%s'" % driver)
+        if libver is not None and libver not in libvers:
+            raise ValueError("Unknown HDF5 library version '%s'" % libver)
+        self.driver = driver
+        self.page_buf_size = page_buf_size
+        self.mdc_bytes = mdc_bytes
+        self.rdcc_nbytes = rdcc_nbytes
+        self.rdcc_nslots = rdcc_nslots
+        self.libver = libver
+
+    def kwargs(self):
+        """ The keyword arguments of h5py.File for these settings """
+        kwargs = {}
+        for name in ("driver", "page_buf_size", "rdcc_nbytes",
+                     "rdcc_nslots", "libver"):
+            value = getattr(self, name)
+            if value is not None:
+                kwargs[name] = value
+        return kwargs
+
+    def open(self, file_name, swmr=False):
+        """
+        Open `file_name` read-only with these settings
+
+        Parameters
+        ----------
+        file_name : string
+            The HDF5 file to open
+
+        swmr : bool
+            Open the file in the single-writer/multiple-reader read mode,
+            which needs the "latest" library version bounds
+
+        Returns
+        -------
+        An h5py.File object
+        """
+        kwargs = self.kwargs()
+        if swmr:
+            kwargs["libver"] = "latest"
+        try:
+            f = h5.File(file_name, "r", swmr=swmr, **kwargs)
+        except (IOError, OSError, ValueError):
+            if "page_buf_size" not in kwargs:
+                raise
+            # older HDF5 versions refuse a page buffer for files that are
+            # not paged
+            del kwargs["page_buf_size"]
+            f = h5.File(file_name, "r", swmr=swmr, **kwargs)
+        if self.mdc_bytes is not None:
+            config = f.id.get_mdc_config()
+            config.set_initial_size = True
+            config.initial_size = self.mdc_bytes
+            config.max_size = max(config.max_size, self.mdc_bytes)
+            config.min_size = min(config.min_size, self.mdc_bytes)
+            f.id.set_mdc_config(config)
+        return f
+
+    def describe(self):
+        """ The settings that differ from the HDF5 defaults, as text """
+        settings = [ "%s=%s" % (name, value) for name, value in
+                     sorted(self.kwargs().items()) ]
+        if self.mdc_bytes is not None:
+            settings.append("mdc_bytes=%d" % self.mdc_bytes)
+        return ",".join(settings) or "defaults"
+
+
+def is_paged(f):
+    """ Whether the h5py.File `f` was written with paged file space """
+    strategy = f.id.get_create_plist().get_file_space_strategy()[0]
+    return strategy == h5.h5f.FSPACE_STRATEGY_PAGE
@@ -0,0 +1,306 @@
+#!/usr/bin/env python
+#
+# Copyright (c) 2015-2017 Axel Huebl, Remi Lehe
+#
+# Permission to use, copy, modify, and/or distribute this software for any
+# purpose with or without fee is hereby granted, provided that the above
+# copyright notice and this permission notice appear in all copies.
+#
+# THE SOFTWARE IS PROVIDED "AS IS" AND THE AUTHOR DISCLAIMS ALL WARRANTIES
+# WITH REGARD TO THIS SOFTWARE INCLUDING ALL IMPLIED WARRANTIES OF
+# MERCHANTABILITY AND FITNESS. IN NO EVENT SHALL THE AUTHOR BE LIABLE FOR
+# ANY SPECIAL, DIRECT, INDIRECT, OR CONSEQUENTIAL DAMAGES OR ANY DAMAGES
+# WHATSOEVER RESULTING FROM LOSS OF USE, DATA OR PROFITS, WHETHER IN AN
+# ACTION OF CONTRACT, NEGLIGENCE OR OTHER TORTIOUS ACTION, ARISING OUT OF
+# OR IN CONNECTION WITH THE USE OR PERFORMANCE OF THIS SOFTWARE.
+#
+"""
+Persistent cache of per-iteration check results
+
+Files that grow by appending iterations are re-validated again and again.
+The cache keeps the results of each iteration together with a fingerprint
+of the HDF5 objects below its base path (their object headers and the
+values of their attributes), so that only iterations that are new or
+whose metadata changed have to be checked again.
+
+The data of the datasets is not part of the fingerprint: the results of
+data checks must never be cached.
+"""
+
+import h5py as h5
+import hashlib
+import json
+import numpy as np
+import os
+import tempfile
+
+
+# bump when the format of the entries or the checks change
+cache_version = 6
+
+
+def default_cache_directory():
+    """ The per-user cache directory of the validator """
+    base = os.environ.get("XDG_CACHE_HOME") or \
+        os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(base, "openpmd_validator")
+
+
+def high_level(oid):
+    """ The h5py object of the low-level object identifier `oid` """
+    if isinstance(oid, h5.h5g.GroupID):
+        return h5.Group(oid)
+    if isinstance(oid, h5.h5d.DatasetID):
+        return h5.Dataset(oid)
+    return h5.Datatype(oid)
+
+
+def attribute_fingerprint(oid, attr):
+    """
+    The type, shape and value of the attribute `attr` of the object `oid`
+
+    The value is read as it is stored, without converting it to numpy,
+    except for variable-length and reference types, whose stored bytes
+    are pointers.
+    """
+    file_type = attr.get_type()
+    space = attr.get_space()
+    if space.get_simple_extent_type() != h5.h5s.NULL and \
+       not (file_type.detect_class(h5.h5t.VLEN) or
+            file_type.detect_class(h5.h5t.REFERENCE) or
+            (isinstance(file_type, h5.h5t.TypeStringID) and
+             file_type.is_variable_str())):
+        value = np.empty(attr.get_storage_size(), np.uint8)
+        attr.read(value, mtype=file_type)
+        return file_type.encode() + \
+            repr(space.get_simple_extent_dims()).encode("ascii") + \
+            value.tobytes()
+    try:
+        value = high_level(oid).attrs[attr.name]
+    except (IOError, OSError, TypeError, ValueError):
+        # unreadable types: the object header covers their size
+        value = None
+    if isinstance(value, np.ndarray):
+        # repr(value) would elide the values of long arrays
+        value = value.tolist()
+    return file_type.encode() + repr(value).encode("utf-8")
+
+
+def update_fingerprint(digest, name, oid):
+    """ Add the object header and attributes of `oid`, linked at `name` """
+    info = h5.h5o.get_info(oid)
+    digest.update(repr((
+        name, getattr(info, "addr", None), info.num_attrs, info.hdr.nmesgs,
+        info.hdr.space.total, info.hdr.space.free, info.mtime,
+        info.ctime)).encode("utf-8"))
+    for index in range(info.num_attrs):
+        attr = h5.h5a.open(oid, index=index)
+        digest.update(attr.name)
+        digest.update(attribute_fingerprint(oid, attr))
+
+
+def object_fingerprint(obj, recursive=True):
+    """
+    Fingerprint of `obj` and all objects below it: their object headers
+    (addresses, attribute counts, header sizes and modification times) and
+    the values of their attributes, but not the data of the datasets
+
+    The objects below `obj` are found by walking the links like
+    check_h5.build_index does, so that objects linked more than once, by
+    hard or soft links, are fingerprinted under each of their paths.
+
+    Parameters
+    ----------
+    obj : an h5py.Group or h5py.File object
+        The object to fingerprint
+
+    recursive : bool
+        Whether to include all objects below `obj`
+
+    Returns
+    -------
+    A string with a hex digest
+    """
+    digest = hashlib.sha1()
+    update_fingerprint(digest, b".", obj.id)
+    # (path, group, ids of the groups above it), see build_index
+    groups = [(b".", obj.id, ())] if recursive else []
+    while groups:
+        group_path, group, ancestors = groups.pop()
+        ancestors = ancestors + (group,)
+        for name in group:
+            path = group_path + b"/" + name
+            try:
+                oid = h5.h5o.open(group, name)
+            except KeyError:
+                # e.g. dangling soft links
+                digest.update(repr((path, None)).encode("utf-8"))
+                continue
+            update_fingerprint(digest, path, oid)
+            if isinstance(oid, h5.h5g.GroupID) and oid not in ancestors:
+                groups.append((path, oid, ancestors))
+    return digest.hexdigest()
+
+
+class ResultCache(object):
+    """
+    Persistent, size-bounded cache of per-iteration check results
+
+    The iterations of each checked file are split into shards of
+    `shard_size` consecutive iterations, and each shard is stored as one
+    JSON entry in `directory`, keyed by the identity of the file, the check
+    options and the shard. When the total size of the entries exceeds
+    `max_bytes`, the least recently used ones are evicted.
+    """
+
+    def __init__(self, directory=None, max_bytes=64 * 1024**2,
+                 shard_size=4096):
+        if directory is None:
+            directory = default_cache_directory()
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.shard_size = shard_size
+
+    def file_key(self, f, options):
+        """
+        Key of the cache entries for the h5py.File `f`
+
+        The key combines the path and inode of the file, the fingerprint of
+        its root group (attributes such as `meshesPath` affect every
+        iteration) and the check `options`.
+        """
+        stat = os.stat(f.filename)
+        return json.dumps([cache_version, os.path.realpath(f.filename),
+                           stat.st_dev, stat.st_ino,
+                           object_fingerprint(f, recursive=False), options],
+                          sort_keys=True)
+
+    def shard(self, iteration):
+        """ The shard of the iteration name `iteration` """
+        return int(iteration) // self.shard_size
+
+    def _entry_path(self, key, shard):
+        name = hashlib.sha1(("%s %d" % (key, shard)).encode("utf-8"))
+        return os.path.join(self.directory, name.hexdigest() + ".json")
+
+    def load(self, key, shard=0):
+        """
+        The cached iterations of `shard` for `key`
+
+        Returns
+        -------
+        A dictionary {iteration: [fingerprint, ...]}, empty if nothing is
+        cached or the entry is unreadable
+        """
+        path = self._entry_path(key, shard)
+        try:
+            with open(path) as entry_file:
+                entry = json.load(entry_file)
+            # mark as recently used
+            os.utime(path, None)
+        except (IOError, OSError, ValueError):
+            return {}
+        if entry.get("key") != key or entry.get("shard") != shard:
+            return {}
+        return entry["iterations"]
+
+    def store(self, key, iterations, shard=0, evict=True):
+        """
+        Store the iterations {iteration: [fingerprint, ...]} of `shard` for
+        `key`, replacing the former entry, and evict old entries if needed
+        (and `evict` is set)
+        """
+        try:
+            if not os.path.isdir(self.directory):
+                os.makedirs(self.directory)
+            # write atomically: concurrent readers see the old or new entry
+            fd, tmp_path = tempfile.mkstemp(dir=self.directory,
+                                            suffix=".tmp")
+            with os.fdopen(fd, "w") as entry_file:
+                json.dump({"key": key, "shard": shard,
+                           "iterations": iterations}, entry_file)
+            os.rename(tmp_path, self._entry_path(key, shard))
+            if evict:
+                self.evict()
+        except (IOError, OSError):
+            # the cache is an optimization: never fail a check because of it
+            pass
+
+    def evict(self):
+        """ Remove the least recently used entries above `max_bytes` """
+        entries = []
+        for name in os.listdir(self.directory):
+            if not name.endswith(".json"):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            total -= size
+
+
+class CachedIterations(object):
+    """
+    The cached iterations of one file, loaded one shard at a time
+
+    At most `max_shards` shards are held in memory: the least recently
+    used one is written back (if it changed) when another one is loaded,
+    so that the memory does not grow with the number of iterations as
+    long as they are visited in order.
+    """
+    __slots__ = ("cache", "key", "max_shards", "shards")
+
+    def __init__(self, cache, key, max_shards=4):
+        self.cache = cache
+        self.key = key
+        self.max_shards = max_shards
+        # [shard, entries, changed], most recently used last
+        self.shards = []
+
+    def _shard(self, iteration):
+        shard = self.cache.shard(iteration)
+        for index, loaded in enumerate(self.shards):
+            if loaded[0] == shard:
+                self.shards.append(self.shards.pop(index))
+                return loaded
+        if len(self.shards) >= self.max_shards:
+            self._write(self.shards.pop(0))
+        loaded = [shard, self.cache.load(self.key, shard), False]
+        self.shards.append(loaded)
+        return loaded
+
+    def _write(self, loaded):
+        shard, entries, changed = loaded
+        if changed:
+            self.cache.store(self.key, entries, shard, evict=False)
+
+    def get(self, iteration):
+        """ The cached entry of `iteration`, or None """
+        return self._shard(iteration)[1].get(iteration)
+
+    def set(self, iteration, entry):
+        """ Replace the cached entry of `iteration` """
+        loaded = self._shard(iteration)
+        if loaded[1].get(iteration) != entry:
+            loaded[1][iteration] = entry
+            loaded[2] = True
+
+    def flush(self):
+        """ Write back all changed shards and evict old entries """
+        for loaded in self.shards:
+            self._write(loaded)
+        self.shards = []
+        try:
+            self.cache.evict()
+        except OSError:
+            pass
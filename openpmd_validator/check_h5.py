@@ -18,14 +18,32 @@
 import h5py as h5
 import numpy as np
 import re
-import string
 import sys, getopt, os.path
+import glob
+import heapq
+from collections import deque
+from itertools import islice
+import json
+import multiprocessing
+import tempfile
+import time
+import zlib
 # for isinstance
 try:
     from collections.abc import Iterable
 except ImportError:
     from collections import Iterable
-from posixpath import join
+from posixpath import join, basename, dirname, normpath
+from h5py import h5a
+
+from .access_h5 import FileAccess, drivers, libvers
+from .cache_h5 import CachedIterations, ResultCache, object_fingerprint
+from .options_h5 import parse_bytes
+from .data_h5 import DataCheck, find_non_finite, find_non_finite_constant, \
+    exclusive_prefix_sum_mismatch, component_reader, find_patch_outliers, \
+    has_float_values, sample_blocks, sample_patches
+from .profile_h5 import Profile
+from .mpi_h5 import mpi_context, schedules
 
 
 # version of the openPMD standard
@@ -37,7 +55,61 @@ def help():
     """ Print usage information for this file """
     print('This is the openPMD file check for HDF5 files.\n')
     print('Check for format version: %s\n' % openPMD)
-    print('Usage:\n  checkOpenPMD_h5.py -i <fileName> [-v] [--EDPIC]')
+    print('Usage:\n  checkOpenPMD_h5.py -i <fileName> [-v] [--EDPIC] [-j <N>]')
+    print('\n  -i, --file <fileName>  an HDF5 file, or a fileBased series given '
+          'as a directory\n                         or a file name pattern '
+          'with %T, e.g. data_%T.h5')
+    print('  -j, --jobs <N>  check the iterations (or the files of a series) '
+          'in N worker processes')
+    print('  --format <text|jsonl>  report as text (default) or as one JSON '
+          'object per line')
+    print('  --cache         reuse the results of iterations whose metadata '
+          'did not change\n                  since the last check (not '
+          'with --check-data)')
+    print('  --no-cache      check all iterations again (default)')
+    print('  --follow        check new iterations while a simulation writes '
+          'the file (SWMR)')
+    print('  --poll <s>      seconds between two polls in follow mode '
+          '(default: 1)')
+    print('  --idle-timeout <s>  stop following after no new iteration '
+          'appeared for s seconds')
+    print('  --check-data    also read the data of all record components and '
+          'check that\n                  it holds no NaN or infinite values')
+    print('  --sample-bytes <N>  check the data of a random sample of chunks '
+          'of at most N bytes\n                  per file (suffixes k, M, G '
+          'and T allowed), implies --check-data')
+    print('  --seed <N>      seed of the random sample (default: 0)')
+    print('  --max-errors <N>  stop the checks after N errors')
+    print('  --fail-fast     stop the checks at the first error '
+          '(--max-errors 1)')
+    print('  --profile       print the calls, HDF5 object opens, attribute '
+          'reads and time of\n                  each check function to '
+          'stderr')
+    print('  --profile-json <file>  also write the profile to a JSON file, '
+          'implies --profile')
+    print('  --mpi           split the iterations (or the files of a series) '
+          'between the MPI\n                  ranks of `mpiexec -n N`, '
+          'needs mpi4py')
+    print('  --mpi-schedule <static|dynamic>  split them round-robin '
+          '(default) or with\n                  work stealing, implies --mpi')
+    print('  --sort-batch <N>  sort the iterations in batches of N on disk, '
+          'for files with\n                  millions of iterations')
+    print('  --iterations <start:stop:step>  only check the iterations '
+          'start <= T < stop\n                  with (T - start) % step == 0 '
+          '(each part optional, or a\n                  single iteration T); '
+          'not for series')
+    print('  --last <N>      only check the last N (selected) iterations')
+    print('  --sample <K>    only check K (selected) iterations evenly '
+          'spread from the first\n                  to the last one')
+    print('\nHDF5 file access (default: the HDF5 defaults; sizes in bytes, '
+          'suffixes k, M, G\nand T allowed):')
+    print('  --driver <%s>  the file driver' % "|".join(drivers))
+    print('  --page-buffer <N>  size of the page buffer (paged files only)')
+    print('  --metadata-cache <N>  size of the metadata cache')
+    print('  --chunk-cache <N>  size of the chunk cache of each dataset')
+    print('  --chunk-slots <N>  number of hash slots of the chunk cache')
+    print('  --libver <version>  lower bound of the library version: %s'
+          % ", ".join(libvers))
     sys.exit()
 
 
@@ -46,8 +118,17 @@ def parse_cmd(argv):
     file_name = ''
     verbose = False
     force_extension_pic = False
+    options = {}
     try:
-        opts, args = getopt.getopt(argv,"hvi:e",["file=","EDPIC"])
+        opts, args = getopt.getopt(argv,"hvi:ej:",
+                                   ["file=","EDPIC","jobs=","format=",
+                                    "cache","no-cache","follow","poll=",
+                                    "idle-timeout=","check-data",
+                                    "sample-bytes=","seed=","max-errors=",
+                                    "fail-fast","profile","profile-json=",
+                                    "mpi","mpi-schedule=","sort-batch=",
+                                    "iterations=","last=","sample="] +
+                                   access_options)
     except getopt.GetoptError:
         print('checkOpenPMD_h5.py -i <fileName>')
         sys.exit(2)
@@ -60,10 +141,306 @@ def parse_cmd(argv):
             force_extension_pic = True
         elif opt in ("-i", "--file"):
             file_name = arg
-    if not os.path.isfile(file_name):
+        elif opt in ("-j", "--jobs"):
+            try:
+                options["workers"] = int(arg)
+            except ValueError:
+                print("Number of jobs '%s' is not an integer!" % arg)
+                help()
+        elif opt == "--format":
+            options["output_format"] = parse_format(arg, help)
+        elif opt == "--cache":
+            options["cache"] = True
+        elif opt == "--no-cache":
+            options["cache"] = False
+        elif opt == "--follow":
+            options["follow"] = True
+        elif opt == "--check-data":
+            options.setdefault("data_check", True)
+        elif opt in ("--sample-bytes", "--seed"):
+            parse_sample_option(opt, arg, options, help)
+        elif opt in ("--max-errors", "--fail-fast"):
+            parse_max_errors(opt, arg, options, help)
+        elif opt[2:] + "=" in access_options:
+            parse_access_option(opt, arg, options, help)
+        elif opt == "--profile":
+            options["profile"] = True
+        elif opt == "--profile-json":
+            options["profile"] = True
+            options["profile_json"] = arg
+        elif opt == "--mpi":
+            options.setdefault("mpi", "static")
+        elif opt == "--mpi-schedule":
+            if arg not in schedules:
+                print("Unknown MPI schedule '%s'!" % arg)
+                help()
+            options["mpi"] = arg
+        elif opt == "--sort-batch":
+            try:
+                options["sort_batch"] = int(arg)
+            except ValueError:
+                options["sort_batch"] = 0
+            if options["sort_batch"] < 1:
+                print("Option --sort-batch needs a positive integer!")
+                help()
+        elif opt == "--iterations":
+            try:
+                options["iterations"] = parse_iterations(arg)
+            except ValueError:
+                print("Option --iterations needs start:stop:step with "
+                      "non-negative integers and a positive step!")
+                help()
+        elif opt in ("--last", "--sample"):
+            try:
+                options[opt[2:]] = int(arg)
+            except ValueError:
+                options[opt[2:]] = 0
+            if options[opt[2:]] < 1:
+                print("Option %s needs a positive integer!" % opt)
+                help()
+        elif opt in ("--poll", "--idle-timeout"):
+            try:
+                seconds = float(arg)
+            except ValueError:
+                print("Option %s needs a number of seconds!" % opt)
+                help()
+            if opt == "--poll":
+                options["poll_interval"] = seconds
+            else:
+                options["idle_timeout"] = seconds
+    if not options.get("follow") and \
+       ("poll_interval" in options or "idle_timeout" in options):
+        print("Options --poll and --idle-timeout need --follow!")
+        help()
+    if options.get("follow"):
+        # the file might not be created yet
+        return(file_name, verbose, force_extension_pic, options)
+    if not (os.path.isfile(file_name) or is_series(file_name)):
         print("File '%s' not found!" % file_name)
         help()
-    return(file_name, verbose, force_extension_pic)
+    return(file_name, verbose, force_extension_pic, options)
+
+
+def parse_iterations(arg):
+    """
+    Parse the argument of the --iterations option, `start:stop:step` or
+    `T` for the single iteration T
+
+    Returns
+    -------
+    A slice
+
+    Raises
+    ------
+    ValueError : for a negative number or a step below 1
+    """
+    parts = [ int(part) if part.strip() else None
+              for part in arg.split(":") ]
+    if len(parts) == 1:
+        if parts[0] is None:
+            raise ValueError(arg)
+        parts = [parts[0], parts[0] + 1]
+    if len(parts) > 3:
+        raise ValueError(arg)
+    iterations = slice(*parts)
+    IterationSelection(iterations.start or 0, iterations.stop,
+                       1 if iterations.step is None else iterations.step)
+    return iterations
+
+
+def parse_format(arg, usage):
+    """ Check the argument of the --format option """
+    if arg not in ("text", "jsonl"):
+        print("Unknown report format '%s'!" % arg)
+        usage()
+    return arg
+
+
+def parse_sample_option(opt, arg, options, usage):
+    """ Set up the DataCheck of the --sample-bytes and --seed options """
+    data_check = options.get("data_check")
+    if not isinstance(data_check, DataCheck):
+        data_check = DataCheck()
+        options["data_check"] = data_check
+    try:
+        if opt == "--sample-bytes":
+            data_check.sample_bytes = parse_bytes(arg)
+        else:
+            data_check.seed = int(arg)
+    except ValueError:
+        print("Option %s needs an integer!" % opt)
+        usage()
+
+
+def parse_max_errors(opt, arg, options, usage):
+    """ Set the error limit of the --max-errors and --fail-fast options """
+    if opt == "--fail-fast":
+        options["max_errors"] = 1
+        return
+    try:
+        options["max_errors"] = int(arg)
+    except ValueError:
+        options["max_errors"] = 0
+    if options["max_errors"] < 1:
+        print("Option --max-errors needs a positive integer!")
+        usage()
+
+
+# command line options of the FileAccess settings
+access_options = ["driver=", "page-buffer=", "metadata-cache=",
+                  "chunk-cache=", "chunk-slots=", "libver="]
+
+
+def parse_access_option(opt, arg, options, usage):
+    """ Set up the FileAccess of the HDF5 file access options """
+    file_access = options.setdefault("file_access", FileAccess())
+    try:
+        if opt == "--driver":
+            if arg not in drivers:
+                raise ValueError(arg)
+            file_access.driver = arg
+        elif opt == "--page-buffer":
+            file_access.page_buf_size = parse_bytes(arg)
+        elif opt == "--metadata-cache":
+            file_access.mdc_bytes = parse_bytes(arg)
+        elif opt == "--chunk-cache":
+            file_access.rdcc_nbytes = parse_bytes(arg)
+        elif opt == "--chunk-slots":
+            file_access.rdcc_nslots = int(arg)
+        else:
+            if arg not in libvers:
+                raise ValueError(arg)
+            file_access.libver = arg
+    except ValueError:
+        print("Invalid value '%s' for option %s!" % (arg, opt))
+        usage()
+
+
+def set_output_format(output_format, file_name=None):
+    """ Make the active Findings collector report in `output_format` """
+    if output_format == "jsonl":
+        set_findings(JsonLinesFindings(file_name=file_name))
+    else:
+        set_findings(Findings())
+
+
+def batch_help():
+    """ Print usage information for the batch mode """
+    print('This is the openPMD batch file check for HDF5 files.\n')
+    print('Check for format version: %s\n' % openPMD)
+    print('Usage:\n  openPMD_check_h5_batch [-v] [--EDPIC] [-j <N>] '
+          '[--shard <i>/<N>] [--details] <path|glob|-> ...')
+    print('\n  <path>           an HDF5 file or a directory of HDF5 files')
+    print('  <glob>           a quoted file name pattern, e.g. "run*/*.h5"')
+    print('  -                read one path per line from stdin')
+    print('  -j, --jobs <N>   number of worker processes (default: all cores)')
+    print('  --shard <i>/<N>  only check the i-th of N deterministic shards '
+          '(i = 0..N-1)\n                   of the files, by their path '
+          'relative to the directory\n                   or glob they were '
+          'found in (or to the current directory)')
+    print('  --shard-root <dir>  shard all files by their path relative '
+          'to dir instead')
+    print('  --details        print the full report of files with errors '
+          'or warnings')
+    print('  --format <text|jsonl>  report as text (default) or as one JSON '
+          'object per line')
+    print('  --check-data     also check that the data of all record '
+          'components is finite')
+    print('  --sample-bytes <N>  only check a random sample of at most N '
+          'bytes of data per file')
+    print('  --seed <N>       seed of the random sample (default: 0)')
+    print('  --max-errors <N> stop after the file with which N errors are '
+          'reached')
+    print('  --fail-fast      stop after the first file with errors')
+    print('  --driver, --page-buffer, --metadata-cache, --chunk-cache, '
+          '--chunk-slots,\n  --libver        HDF5 file access settings, see '
+          'openPMD_check_h5 -h')
+    sys.exit()
+
+
+def parse_batch_cmd(argv):
+    """ Parse the command line arguments of the batch mode """
+    verbose = False
+    force_extension_pic = False
+    shard_root = None
+    options = {}
+    try:
+        opts, args = getopt.gnu_getopt(argv, "hvj:",
+                                   ["EDPIC", "jobs=", "shard=",
+                                    "shard-root=", "details",
+                                    "format=", "check-data", "sample-bytes=",
+                                    "seed=", "max-errors=", "fail-fast"] +
+                                   access_options)
+    except getopt.GetoptError:
+        batch_help()
+    for opt, arg in opts:
+        if opt == '-h':
+            batch_help()
+        elif opt in ("-v", "--verbose"):
+            verbose = True
+        elif opt == "--EDPIC":
+            force_extension_pic = True
+        elif opt in ("-j", "--jobs"):
+            try:
+                options["workers"] = int(arg)
+            except ValueError:
+                print("Number of jobs '%s' is not an integer!" % arg)
+                batch_help()
+        elif opt == "--shard":
+            try:
+                i, n = [ int(x) for x in arg.split("/") ]
+            except ValueError:
+                i, n = -1, 0
+            if not 0 <= i < n:
+                print("Shard '%s' is not of the form <i>/<N> with "
+                      "0 <= i < N!" % arg)
+                batch_help()
+            options["shard"] = (i, n)
+        elif opt == "--shard-root":
+            shard_root = arg
+        elif opt == "--details":
+            options["details"] = True
+        elif opt == "--format":
+            options["output_format"] = parse_format(arg, batch_help)
+        elif opt == "--check-data":
+            options.setdefault("data_check", True)
+        elif opt in ("--sample-bytes", "--seed"):
+            parse_sample_option(opt, arg, options, batch_help)
+        elif opt in ("--max-errors", "--fail-fast"):
+            parse_max_errors(opt, arg, options, batch_help)
+        elif opt[2:] + "=" in access_options:
+            parse_access_option(opt, arg, options, batch_help)
+    if len(args) == 0:
+        batch_help()
+
+    # each file with the directory that its shard key is relative to
+    file_names = []
+    roots = []
+    for arg in args:
+        if arg == "-":
+            found = [ line.strip() for line in sys.stdin if line.strip() ]
+            root = os.curdir
+        elif os.path.isdir(arg):
+            found = expand_series(arg)
+            root = arg
+        elif glob.has_magic(arg):
+            found = sorted(glob.glob(arg))
+            root = glob_root(arg)
+        else:
+            found = [ arg ]
+            root = os.curdir
+        file_names += found
+        roots += [ root if shard_root is None else shard_root ] * len(found)
+    options["roots"] = roots
+    return(file_names, verbose, force_extension_pic, options)
+
+
+def glob_root(pattern):
+    """ The leading directories of the file name `pattern` without wildcards """
+    root = os.path.dirname(pattern)
+    while glob.has_magic(root):
+        root = os.path.dirname(root)
+    return root or os.curdir
 
 
 def join_path(path, other_path):
@@ -73,20 +450,690 @@ def join_path(path, other_path):
     return join(path, other_path)
 
 
-def open_file(file_name):
+def is_series(name):
+    """
+    Whether `name` describes a fileBased iteration series, i.e. is a
+    directory or an `iterationFormat`-like file name pattern with `%T`
+    """
+    return os.path.isdir(name) or "%T" in os.path.basename(name)
+
+
+def expand_series(name):
+    """
+    List the files of a fileBased iteration series
+
+    Parameters
+    ----------
+    name : string
+        Either a directory, from which all HDF5 files are taken, or a file
+        name pattern in which `%T` stands for the iteration, e.g.
+        `diags/data_%T.h5`
+
+    Returns
+    -------
+    A list of file names, sorted by iteration
+    """
+    if os.path.isdir(name):
+        directory = name
+        files = [ f for f in os.listdir(directory)
+                  if os.path.isfile(os.path.join(directory, f)) and
+                  h5.is_hdf5(os.path.join(directory, f)) ]
+        key = lambda f: [ int(c) if c.isdigit() else c
+                          for c in re.split("([0-9]+)", f) ]
+    else:
+        directory, pattern = os.path.split(name)
+        prefix, _, suffix = pattern.partition("%T")
+        regEx = re.compile("^" + re.escape(prefix) + "([0-9]+)" +
+                           re.escape(suffix) + "$")
+        files = [ f for f in os.listdir(directory or os.curdir)
+                  if regEx.match(f) ]
+        key = lambda f: int(regEx.match(f).group(1))
+    return [ os.path.join(directory, f) for f in sorted(files, key=key) ]
+
+
+def open_file(file_name, file_access=None):
     if h5.is_hdf5(file_name):
-        f = h5.File(file_name, "r")
+        f = (file_access or FileAccess()).open(file_name)
         return(f)
     else:
         help()
-        
+
+
+class FileIndex(object):
+    """
+    Compact in-memory index of the metadata of an HDF5 file
+
+    Maps every absolute in-file path to an IndexGroup or IndexDataset node.
+    The nodes mimic the read-only parts of the h5py interface that the
+    checks use (`name`, `attrs`, `keys()`, item access, ...), so that all
+    checks can run against the index instead of issuing one HDF5 lookup per
+    access.
+    """
+    __slots__ = ("nodes", "file")
+
+    def __init__(self, f):
+        self.nodes = {}
+        self.file = f
+
+    def add(self, path, obj, attrs=None):
+        """
+        Add the h5py object `obj`, linked at `path`, to the index
+
+        `attrs` are the already indexed IndexAttrs of `obj`, if any
+        """
+        if isinstance(obj, h5.Group):
+            node = IndexGroup(self, path, obj, attrs)
+        elif isinstance(obj, h5.Dataset):
+            node = IndexDataset(self, path, obj, attrs)
+        else:
+            # e.g. committed data types
+            node = IndexNode(self, path, obj, attrs)
+        self.nodes[path] = node
+        if _profile is not None:
+            _profile.count(opens=int(path != "/"))
+        if path != "/":
+            parent = self.nodes.get(dirname(path))
+            if parent is not None:
+                parent._children.append(basename(path))
+        return node
+
+
+class IndexAttrs(object):
+    """
+    The attributes of an h5py object, introspected without reading them
+
+    The names and the stored datatypes and dataspaces of all attributes
+    are read at once with the low-level h5a/h5t interface, so that their
+    types can be checked without decoding and allocating their values (see
+    types). A value is only read, and then kept, when it is accessed.
+    Otherwise, this is a read-only dict of the attribute values.
+    """
+    __slots__ = ("_manager", "_types", "_values")
+
+    def __init__(self, obj):
+        self._manager = obj.attrs
+        self._types = {}
+        self._values = {}
+        oid = obj.id
+        for i in range(h5a.get_num_attrs(oid)):
+            attr = h5a.open(oid, index=i)
+            self._types[attr.name.decode("utf-8", "surrogateescape")] = \
+                stored_types(attr)
+
+    def types(self, name):
+        """
+        The type of the value of the attribute `name`, as h5py reads it,
+        and the type of its elements if it is an ndarray (None otherwise)
+        """
+        return self._types[name]
+
+    def __getitem__(self, name):
+        if name not in self._values:
+            if name not in self._types:
+                raise KeyError("Attribute '%s' does not exist" % name)
+            if _profile is not None:
+                _profile.count(attribute_reads=1)
+            self._values[name] = self._manager[name]
+        return self._values[name]
+
+    def get(self, name, default=None):
+        return self[name] if name in self._types else default
+
+    def __contains__(self, name):
+        return name in self._types
+
+    def __iter__(self):
+        return iter(self._types)
+
+    def __len__(self):
+        return len(self._types)
+
+    def keys(self):
+        return list(self._types)
+
+    def items(self):
+        return [ (name, self[name]) for name in self._types ]
+
+
+def stored_types(attr):
+    """
+    The type of the value of the h5py.h5a.AttrID `attr` as h5py reads it,
+    and the type of its elements for arrays, from its datatype and
+    dataspace alone
+    """
+    shape = attr.shape
+    dtype = attr.dtype
+    if shape is None:
+        # empty dataspace
+        return (h5.Empty, None)
+    if dtype.subdtype is not None:
+        # top-level array types are read as arrays of their base type
+        return (np.ndarray, dtype.subdtype[0].type)
+    if len(shape) > 0:
+        return (np.ndarray, dtype.type)
+    string_info = h5.check_string_dtype(dtype)
+    if string_info is not None and string_info.length is None:
+        # variable-length strings are decoded
+        return (str, None)
+    return (dtype.type, None)
+
+
+def attr_types(attrs, name):
+    """
+    The type of the attribute `name` and of its elements, see
+    IndexAttrs.types; reads the value for other attribute containers
+    """
+    if isinstance(attrs, IndexAttrs):
+        return attrs.types(name)
+    value = attrs[name]
+    if isinstance(value, np.ndarray):
+        return (np.ndarray, value.dtype.type)
+    return (type(value), None)
+
+
+class IndexNode(object):
+    """
+    An object of the file, with the IndexAttrs of its attributes
+    """
+    __slots__ = ("name", "attrs", "_index")
+
+    def __init__(self, index, path, obj, attrs=None):
+        self.name = path
+        if attrs is None:
+            attrs = IndexAttrs(obj)
+        self.attrs = attrs
+        self._index = index
+
+    @property
+    def file(self):
+        """ The h5py.File this node was indexed from """
+        return self._index.file
+
+
+class IndexGroup(IndexNode):
+    """ An indexed h5py.Group: child names in file order """
+    __slots__ = ("_children",)
+
+    def __init__(self, index, path, obj, attrs=None):
+        IndexNode.__init__(self, index, path, obj, attrs)
+        self._children = []
+
+    def _resolve(self, name):
+        if isinstance(name, bytes):
+            name = name.decode()
+        return self._index.nodes.get(
+            normpath(join_path(self.name, name)))
+
+    def keys(self):
+        return list(self._children)
+
+    def __iter__(self):
+        return iter(self._children)
+
+    def __len__(self):
+        return len(self._children)
+
+    def __contains__(self, name):
+        return self._resolve(name) is not None
+
+    def __getitem__(self, name):
+        node = self._resolve(name)
+        if node is None:
+            raise KeyError("'%s' does not exist in `%s`" % (name, self.name))
+        return node
+
+
+class IndexDataset(IndexNode):
+    """ An indexed h5py.Dataset: shape, dtype and chunk layout """
+    __slots__ = ("shape", "dtype", "chunks")
+
+    def __init__(self, index, path, obj, attrs=None):
+        IndexNode.__init__(self, index, path, obj, attrs)
+        self.shape = obj.shape
+        self.dtype = obj.dtype
+        self.chunks = obj.chunks
+
+
+def build_index(f, path="/", root_attrs=None):
+    """
+    Walk the HDF5 file `f` once below `path` and index all groups, datasets
+    and attributes found there
+
+    The walk follows the links like path lookups do: an object that is
+    linked more than once (by hard or soft links) is indexed under each
+    of its paths, while links back to a group that is being walked are not
+    followed again. Links that cannot be resolved, e.g. dangling soft
+    links, are left out.
+
+    Parameters
+    ----------
+    f : an h5py.File object
+        The file to index
+
+    path : string or None
+        The in-file path of the group to index recursively.
+        For None, only the attributes of the root group "/" are indexed.
+
+    root_attrs : IndexAttrs or None
+        The attributes of "/" that were already indexed, e.g. when
+        indexing one iteration after the other
+
+    Returns
+    -------
+    The IndexGroup of the root group "/"
+    """
+    index = FileIndex(f)
+    root = index.add("/", f, root_attrs)
+    if path is None:
+        return root
+
+    path = normpath(path)
+    if path == "/":
+        group = f
+    else:
+        group = f[path]
+        index.add(path, group)
+
+    # (path, group, ids of the groups above it); visititems would skip soft
+    # links and all but the first hard link to each object
+    groups = [(path, group, ())]
+    while groups:
+        group_path, group, ancestors = groups.pop()
+        ancestors = ancestors + (group.id,)
+        for name in group:
+            obj = group.get(name)
+            if obj is None:
+                continue
+            obj_path = join_path(group_path, name)
+            index.add(obj_path, obj)
+            if isinstance(obj, h5.Group) and obj.id not in ancestors:
+                groups.append((obj_path, obj, ancestors))
+    return root
+
+
+class Result(object):
+    """
+    Numbers of errors and warnings found by a check
+
+    A light replacement for a 2-element numpy array that supports the same
+    operations: `r[0]` (errors), `r[1]` (warnings), `+`, `+=`, iteration
+    and `np.asarray(r)`.
+    """
+    __slots__ = ("errors", "warnings")
+
+    def __init__(self, errors=0, warnings=0):
+        self.errors = errors
+        self.warnings = warnings
+
+    def __getitem__(self, i):
+        return (self.errors, self.warnings)[i]
+
+    def __len__(self):
+        return 2
+
+    def __iter__(self):
+        return iter((self.errors, self.warnings))
+
+    def __iadd__(self, other):
+        self.errors += int(other[0])
+        self.warnings += int(other[1])
+        return self
+
+    def __add__(self, other):
+        return Result(self.errors + int(other[0]),
+                      self.warnings + int(other[1]))
+
+    __radd__ = __add__
+
+    def __array__(self, dtype=None, copy=None):
+        return np.array([self.errors, self.warnings], dtype=dtype)
+
+    def __repr__(self):
+        return "Result(errors=%d, warnings=%d)" % (self.errors, self.warnings)
+
+
+# prefixes of the findings of each severity in the text report
+severity_prefixes = {"error": "Error: ", "warning": "Warning: ",
+                     "info": "Info: ", "note": ""}
+
+
+class Finding(object):
+    """
+    One finding of a check
+
+    severity : "error", "warning", "info" or "note" (progress and verbose
+               output without a prefix)
+    path : the in-file path of the object the finding is about
+    rule : short name of the requirement that was checked
+    message : human readable description
+    """
+    __slots__ = ("severity", "path", "rule", "message")
+
+    def __init__(self, severity, path, rule, message):
+        self.severity = severity
+        self.path = path
+        self.rule = rule
+        self.message = message
+
+    def __str__(self):
+        return severity_prefixes[self.severity] + self.message
+
+
+class ErrorLimitReached(Exception):
+    """ Raised by a Findings collector when its error limit is reached """
+
+
+class Findings(object):
+    """
+    Collector for the findings of the checks
+
+    Counts all errors and warnings reported to it. Each finding is printed
+    in the text report as soon as it is reported (`echo`) and/or kept as a
+    Finding object in `findings` (`keep`).
+
+    When the number of errors reaches `error_limit`, add() raises
+    ErrorLimitReached to stop the checks, and the report is marked as
+    `truncated`, see ErrorBudget. A report of only some of the iterations
+    is marked as `partial`, see IterationSelection.
+    """
+    __slots__ = ("errors", "warnings", "findings", "echo", "error_limit",
+                 "truncated", "partial")
+
+    def __init__(self, echo=True, keep=False):
+        self.errors = 0
+        self.warnings = 0
+        self.findings = [] if keep else None
+        self.echo = echo
+        self.error_limit = None
+        self.truncated = False
+        # None for a check of all iterations
+        self.partial = None
+
+    def add(self, finding):
+        """ Collect one Finding """
+        if finding.severity == "error":
+            self.errors += 1
+        elif finding.severity == "warning":
+            self.warnings += 1
+        if self.findings is not None:
+            self.findings.append(finding)
+        if self.echo:
+            print(str(finding))
+        if self.error_limit is not None and self.errors >= self.error_limit:
+            self.truncated = True
+            raise ErrorLimitReached(self.errors)
+
+    def replay(self, findings):
+        """ Collect the Finding objects that another collector kept """
+        for finding in findings:
+            self.add(finding)
+
+    def flush(self):
+        """ Make sure that everything reported so far is written out """
+        if self.echo:
+            sys.stdout.flush()
+
+    def begin_file(self, file_name):
+        """ Start the report of one file of a series or batch """
+        if self.echo:
+            print("File '%s':" % file_name)
+
+    def end_file(self, file_name, result_array):
+        """ End the report of one file of a series or batch """
+        if self.echo:
+            print("Result for '%s': %d Errors and %d Warnings."
+                  %( file_name, result_array[0], result_array[1]))
+
+    def summary(self, result_array):
+        """ Report the total numbers of errors and warnings """
+        if self.echo:
+            print("Result: %d Errors and %d Warnings%s%s."
+                  %( result_array[0], result_array[1],
+                     " (truncated: stopped at the error limit)"
+                     if self.truncated else "",
+                     " (partial: %s)" % self.partial
+                     if self.partial is not None else ""))
+
+
+class JsonLinesFindings(Findings):
+    """
+    Collector that streams the findings as JSON Lines
+
+    Each finding is written as one JSON object per line as soon as it is
+    reported, through a write buffer of at most `buffer_lines` lines, so
+    that memory stays flat however many findings there are. The report of
+    a series or batch adds one record per file, and summary() writes a
+    final record with the total numbers of errors and warnings:
+
+        {"type": "finding", "file": ..., "severity": ..., "path": ...,
+         "rule": ..., "message": ...}
+        {"type": "file", "file": ..., "errors": ..., "warnings": ...}
+        {"type": "summary", "errors": ..., "warnings": ...,
+         "truncated": ..., "partial": ...}
+    """
+    __slots__ = ("stream", "file_name", "buffer_lines", "_lines")
+
+    def __init__(self, stream=None, file_name=None, keep=False,
+                 buffer_lines=1024):
+        Findings.__init__(self, echo=False, keep=keep)
+        self.stream = stream
+        self.file_name = file_name
+        self.buffer_lines = buffer_lines
+        self._lines = []
+
+    def write(self, record):
+        """ Write one record (a dict) """
+        self._lines.append(json.dumps(record))
+        if len(self._lines) >= self.buffer_lines:
+            self.flush()
+
+    def flush(self):
+        """ Write out all buffered records """
+        stream = sys.stdout if self.stream is None else self.stream
+        if self._lines:
+            stream.write("\n".join(self._lines) + "\n")
+            self._lines = []
+        stream.flush()
+
+    def add(self, finding):
+        self.write({"type": "finding", "file": self.file_name,
+                    "severity": finding.severity, "path": finding.path,
+                    "rule": finding.rule, "message": finding.message})
+        Findings.add(self, finding)
+
+    def begin_file(self, file_name):
+        self.file_name = file_name
+
+    def end_file(self, file_name, result_array):
+        self.write({"type": "file", "file": file_name,
+                    "errors": int(result_array[0]),
+                    "warnings": int(result_array[1])})
+        self.file_name = None
+
+    def summary(self, result_array):
+        self.write({"type": "summary", "errors": int(result_array[0]),
+                    "warnings": int(result_array[1]),
+                    "truncated": self.truncated,
+                    "partial": self.partial})
+        self.flush()
+
+
+class ErrorBudget(object):
+    """
+    Stop the checks in a `with` block after `max_errors` more errors
+
+    The limit is set on the active Findings collector. When it is reached,
+    the block is left early without an exception, `exhausted` is set and
+    result() returns the errors and warnings reported within the block.
+    For max_errors=None, the block runs unchanged.
+    """
+    __slots__ = ("max_errors", "exhausted", "_collector", "_limit",
+                 "_errors", "_warnings")
+
+    def __init__(self, max_errors=None):
+        self.max_errors = max_errors
+        self.exhausted = False
+
+    def __enter__(self):
+        self._collector = _findings
+        self._limit = self._collector.error_limit
+        self._errors = self._collector.errors
+        self._warnings = self._collector.warnings
+        if self.max_errors is not None:
+            limit = self._errors + self.max_errors
+            if self._limit is not None:
+                limit = min(limit, self._limit)
+            self._collector.error_limit = limit
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        collector = self._collector
+        own_limit = collector.error_limit
+        collector.error_limit = self._limit
+        if exc_type is ErrorLimitReached and self.max_errors is not None \
+           and (self._limit is None or own_limit < self._limit):
+            self.exhausted = True
+            return True
+        return False
+
+    def result(self):
+        """ The errors and warnings reported within the block """
+        return Result(self._collector.errors - self._errors,
+                      self._collector.warnings - self._warnings)
+
+
+# the collector that report() sends findings to
+_findings = Findings()
+
+
+def set_findings(findings):
+    """
+    Make `findings` the active Findings collector
+
+    Returns
+    -------
+    The collector that was active before
+    """
+    global _findings
+    previous = _findings
+    _findings = findings
+    return previous
+
+
+# the active Profile of the checks, None if profiling is off
+_profile = None
+
+# the functions instrumented by a Profile
+profiled_functions = [
+    "check_root_attr", "get_extensions", "check_iterations",
+    "check_iteration", "object_fingerprint", "build_index",
+    "check_base_path", "check_meshes", "check_particles", "check_rules",
+    "check_attr", "test_attr", "test_key", "test_record", "test_component",
+    "test_record_shape", "test_species_shapes", "test_particle_patches",
+    "test_component_data", "test_patch_positions" ]
+
+
+def set_profile(profile):
+    """
+    Profile the checks with `profile`, or stop profiling for None
+
+    The functions of profiled_functions are replaced by counting wrappers
+    while a Profile is set, see profile_h5.
+
+    Returns
+    -------
+    The Profile that was active before
+    """
+    global _profile
+    previous = _profile
+    if previous is not None:
+        previous.restore()
+    _profile = profile
+    if profile is not None:
+        profile.instrument(globals(), profiled_functions)
+    return previous
+
+
+def _profiled_task(function, args, profiled=False):
+    """
+    Run `function(*args)` as a task of a worker process
+
+    With `profiled`, the task runs with a Profile of its own, whatever the
+    worker inherited from the parent process (nothing, with the spawn
+    start method), so that its statistics can be merged into the Profile
+    of the parent. Tasks that run in the parent process are counted by
+    its Profile directly and must not be `profiled`.
+
+    Returns
+    -------
+    A tuple (return value, profile statistics of the task or None), see
+    merge_profile
+    """
+    if not profiled:
+        return (function(*args), None)
+    previous = set_profile(Profile())
+    try:
+        value = function(*args)
+    finally:
+        profile = set_profile(previous)
+    return (value, profile.stats)
+
+
+def merge_profile(stats):
+    """ Add the profile statistics of a worker task, see _profiled_task """
+    if stats is not None and _profile is not None:
+        _profile.merge(stats)
+
+
+def open_object(node):
+    """ The h5py object of the indexed `node`, opened in its file """
+    if _profile is not None:
+        _profile.count(opens=1)
+    return node.file[node.name]
+
+
+def report(severity, path, rule, message):
+    """
+    Report a finding to the active Findings collector
+
+    Parameters
+    ----------
+    severity : string
+        Either "error", "warning", "info" or "note"
+
+    path : string
+        The in-file path of the object the finding is about
+
+    rule : string
+        Short name of the requirement that was checked
+
+    message : string
+        Description of the finding
+
+    Returns
+    -------
+    The Result of the finding: one error, one warning or nothing
+    """
+    _findings.add(Finding(severity, path, rule, message))
+    if severity == "error":
+        return Result(1, 0)
+    elif severity == "warning":
+        return Result(0, 1)
+    else:
+        return Result()
+
+
 def get_attr(f, name):
     """
     Try to access the path `name` in the file `f`
     Return the corresponding attribute if it is present
+
+    For indexed objects, the value is read once and then kept, see
+    IndexAttrs.
     """
-    if name in list(f.attrs.keys()):
-        return(True, f.attrs[name])
+    attrs = f.attrs
+    if name in attrs:
+        return(True, attrs[name])
     else:
         return(False, None)
         
@@ -117,12 +1164,14 @@ def get_extensions(f, v):
                 result[extension] = True
                 enabledExtMask |= bitmask
                 if v:
-                    print("Info: Found extension '%s'." % extension)
+                    report("info", f.name, "extension",
+                           "Found extension '%s'." % extension)
         # Mask out the extension bits we have already detected so only
         # unknown ones are left
         excessIDs = extensionIDs & ~enabledExtMask
         if excessIDs:
-            print("Warning: Unknown extension Mask left: %s" % excessIDs)
+            report("warning", f.name, "extension-unknown",
+                   "Unknown extension Mask left: %s" % excessIDs)
     return result
        
         
@@ -147,17 +1196,18 @@ def test_record(g, r):
     regEx = re.compile("^\w+$") # Python3 only: re.ASCII
     if regEx.match(r):
         # test component names
-        result_array = np.array([0,0])
+        result_array = Result()
         if not is_scalar_record(g[r]) :
             for component_name in g[r]:
                 if not regEx.match(component_name):
-                    print("Error: Component %s of record %s is NOT" \
-                    " named properly (a-Z0-9_)!" %(component_name, g[r].name) )
-                    result_array += np.array([1,0])
+                    result_array += report("error", g[r].name,
+                        "component-name", "Component %s of record %s is NOT"
+                        " named properly (a-Z0-9_)!"
+                        %(component_name, g[r].name) )
     else:
-        print("Error: Record %s is NOT named properly (a-Z0-9_)!" \
-              %(r.name) )
-        result_array = np.array([1,0])
+        result_array = report("error", g.name, "record-name",
+                              "Record %s is NOT named properly (a-Z0-9_)!"
+                              %(r) )
 
     return(result_array)
 
@@ -188,25 +1238,27 @@ def test_key(f, v, request, name):
     - The first element is 1 if an error occurred, and 0 otherwise
     - The second element is 0 if a warning arose, and 0 otherwise
     """
-    valid = (name in list(f.keys()))
+    valid = (name in f)
     if valid:
         if v:
-            print("Key %s (%s) exists in `%s`!" %(name, request, str(f.name) ) )
-        result_array = np.array([0,0])
+            report("note", f.name, "key-exists", "Key %s (%s) exists in `%s`!"
+                   %(name, request, str(f.name) ) )
+        result_array = Result()
     else:
         if request == "required":
-            print("Error: Key %s (%s) does NOT exist in `%s`!" \
-            %(name, request, str(f.name)) )
-            result_array = np.array([1, 0])
+            result_array = report("error", f.name, "key-missing",
+                                  "Key %s (%s) does NOT exist in `%s`!"
+                                  %(name, request, str(f.name)) )
         elif request == "recommended":
-            print("Warning: Key %s (%s) does NOT exist in `%s`!" \
-            %(name, request, str(f.name)) )
-            result_array = np.array([0, 1])
+            result_array = report("warning", f.name, "key-missing",
+                                  "Key %s (%s) does NOT exist in `%s`!"
+                                  %(name, request, str(f.name)) )
         elif request == "optional":
             if v:
-                print("Info: Key %s (%s) does NOT exist in `%s`!"  \
-            %(name, request, str(f.name)) )
-            result_array = np.array([0, 0])
+                report("info", f.name, "key-missing",
+                       "Key %s (%s) does NOT exist in `%s`!"
+                       %(name, request, str(f.name)) )
+            result_array = Result()
         else :
             raise ValueError("Unrecognized string for `request` : %s" %request)
 
@@ -241,6 +1293,9 @@ def test_attr(f, v, request, name, is_type=None, type_format=None):
         Used with is_type to specify numpy ndarray dtypes or a
         base np.string_ format regex. Can be a list of data types
         for ndarrays where at least one data type must match.
+
+    The requirement is compiled on every call: the requirements of the
+    standard are compiled once in attribute_rules, see check_rules.
     
     Returns
     -------
@@ -248,74 +1303,378 @@ def test_attr(f, v, request, name, is_type=None, type_format=None):
     - The first element is 1 if an error occurred, and 0 otherwise
     - The second element is 0 if a warning arose, and 0 otherwise
     """
-    valid, value = get_attr(f, name)
-    if valid:
-        if v:
-            print("Attribute %s (%s) exists in `%s`! Type = %s, Value = %s" \
-            %(name, request, str(f.name), type(value), str(value)) )
+    return(check_attr(f, v, AttrRule(None, None, request, name, is_type,
+                                     type_format)))
 
-        # test type
-        if is_type is not None:
-            type_format_names = None
-            if not type_format is None and not is_type is np.string_ and \
-               not isinstance(type_format, Iterable):
-                type_format = [type_format]
-                type_format_names = map(lambda x: x.__name__, type_format)
-            if not is_type is None and not isinstance(is_type, Iterable):
-                is_type = [is_type]
-            is_type_names = "' or '".join(map(lambda x: str(x.__name__), is_type))
-            # add for each type in is_type -> wrong, need to add this at the comparison level!
-            if type(value) in is_type:
-                # np.string_ format or general ndarray dtype text
-                if type(value) is np.string_ and type_format is not None:
-                    regEx = re.compile(type_format) # Python3 only: re.ASCII
-                    if regEx.match(value.decode()) :
-                        result_array = np.array([0,0])
-                    else:
-                        print("Error: Attribute %s in `%s` does not satisfy " \
-                              "format ('%s' should be in format '%s')!" \
-                              %(name, str(f.name), value.decode(), type_format ) )
-                        result_array = np.array([1,0])
-                # ndarray dtypes
-                elif type(value) is np.ndarray:
-                    if value.dtype.type in type_format:
-                        result_array = np.array([0,0])
-                    elif type_format is None:
-                        result_array = np.array([0,0])
-                    else:
-                        print("Error: Attribute %s in `%s` is not of type " \
-                              "ndarray of '%s' (is ndarray of '%s')!" \
-                              %(name, str(f.name), type_format_names, \
-                              value.dtype.type.__name__) )
-                        result_array = np.array([1,0])
-                else:
-                    result_array = np.array([0,0])
-            else:
-                print(
-                 "Error: Attribute %s in `%s` is not of type '%s' (is '%s')!" \
-                 %(name, str(f.name), is_type_names, \
-                  type(value).__name__) )
-                result_array = np.array([1,0])
-        else: # is_type is None (== arbitrary)
-            result_array = np.array([0,0])
-    else:
-        if request == "required":
-            print("Error: Attribute %s (%s) does NOT exist in `%s`!" \
-            %(name, request, str(f.name)) )
-            result_array = np.array([1, 0])
-        elif request == "recommended":
-            print("Warning: Attribute %s (%s) does NOT exist in `%s`!" \
-            %(name, request, str(f.name)) )
-            result_array = np.array([0, 1])
-        elif request == "optional":
-            if v:
-                print("Info: Attribute %s (%s) does NOT exist in `%s`!"  \
-            %(name, request, str(f.name)) )
-            result_array = np.array([0, 0])
-        else :
-            raise ValueError("Unrecognized string for `request` : %s" %request)
 
-    return(result_array)
+# how a missing attribute is reported per request level
+missing_severity = {"required": "error",
+                    "recommended": "warning",
+                    "optional": None}
+
+
+class AttrRule(object):
+    """
+    A requirement on one attribute, compiled once for fast checks
+
+    Parameters
+    ----------
+    scope : string or None
+        The kind of object the rule applies to, see attribute_rules
+
+    extension : string or None
+        The openPMD extension that defines the rule (None: base standard)
+
+    request, name, is_type, type_format :
+        See test_attr
+
+    condition : function or None
+        The rule only applies to objects for which condition(attrs) is
+        true, e.g. attr_is
+
+    Raises
+    ------
+    ValueError : for an unknown `request`
+    """
+    __slots__ = ("scope", "extension", "request", "name", "types",
+                 "type_names", "regex", "format", "dtypes", "dtype_names",
+                 "missing", "condition")
+
+    def __init__(self, scope, extension, request, name, is_type=None,
+                 type_format=None, condition=None):
+        if request not in missing_severity:
+            raise ValueError("Unrecognized string for `request` : %s"
+                             % request)
+        self.scope = scope
+        self.extension = extension
+        self.request = request
+        self.name = name
+        self.missing = missing_severity[request]
+        self.condition = condition
+
+        self.types = None
+        self.type_names = None
+        if is_type is not None:
+            if not isinstance(is_type, Iterable):
+                is_type = [is_type]
+            self.types = tuple(is_type)
+            self.type_names = "' or '".join( str(t.__name__)
+                                             for t in self.types )
+        # type_format: a format regex of strings or the dtypes of arrays
+        self.regex = None
+        self.format = None
+        self.dtypes = None
+        self.dtype_names = None
+        if type_format is not None:
+            if is_type is not None and self.types == (np.string_,):
+                self.regex = re.compile(type_format) # Python3 only: re.ASCII
+                self.format = type_format
+            else:
+                if not isinstance(type_format, Iterable):
+                    type_format = [type_format]
+                self.dtypes = tuple(type_format)
+                self.dtype_names = "' or '".join( str(t.__name__)
+                                                  for t in self.dtypes )
+
+
+def check_attr(f, v, rule):
+    """
+    Checks an attribute against a compiled AttrRule, see test_attr
+
+    Returns
+    -------
+    An array with 2 elements :
+    - The first element is 1 if an error occurred, and 0 otherwise
+    - The second element is 0 if a warning arose, and 0 otherwise
+    """
+    attrs = f.attrs
+    name = rule.name
+    if name not in attrs:
+        if rule.missing is not None:
+            return report(rule.missing, f.name, "attribute-missing",
+                          "Attribute %s (%s) does NOT exist in `%s`!"
+                          %(name, rule.request, str(f.name)) )
+        if v:
+            report("info", f.name, "attribute-missing",
+                   "Attribute %s (%s) does NOT exist in `%s`!"
+                   %(name, rule.request, str(f.name)) )
+        return Result()
+
+    if v:
+        value = attrs[name]
+        report("note", f.name, "attribute-exists",
+               "Attribute %s (%s) exists in `%s`! Type = %s, Value = %s"
+               %(name, rule.request, str(f.name), type(value), str(value)) )
+    if rule.types is None:
+        return Result()
+
+    # the types are checked from the stored datatype: the value is only
+    # read for a format regex
+    value_type, element_type = attr_types(attrs, name)
+    if value_type not in rule.types:
+        return report("error", f.name, "attribute-type",
+            "Attribute %s in `%s` is not of type '%s' (is '%s')!"
+            %(name, str(f.name), rule.type_names, value_type.__name__) )
+    # np.string_ format or general ndarray dtype text
+    if rule.regex is not None and value_type is np.string_:
+        value = attrs[name]
+        if not rule.regex.match(value.decode()):
+            return report("error", f.name, "attribute-format",
+                "Attribute %s in `%s` does not satisfy "
+                "format ('%s' should be in format '%s')!"
+                %(name, str(f.name), value.decode(), rule.format ) )
+    # ndarray dtypes
+    elif rule.dtypes is not None and value_type is np.ndarray:
+        if element_type not in rule.dtypes:
+            return report("error", f.name, "attribute-type",
+                "Attribute %s in `%s` is not of type "
+                "ndarray of '%s' (is ndarray of '%s')!"
+                %(name, str(f.name), rule.dtype_names,
+                  element_type.__name__) )
+    return Result()
+
+
+def _decoded(value):
+    """ A string attribute as str, other attributes unchanged """
+    if isinstance(value, bytes):
+        return value.decode()
+    return value
+
+
+def attr_is(name, *values):
+    """ Condition of a rule: the attribute `name` is one of `values` """
+    def condition(attrs):
+        if name not in attrs:
+            return False
+        value = _decoded(attrs[name])
+        return not isinstance(value, np.ndarray) and value in values
+    return condition
+
+
+def attr_is_not(name, *values):
+    """ Condition of a rule: the attribute `name` exists and is none of
+    `values` """
+    def condition(attrs):
+        if name not in attrs:
+            return False
+        value = _decoded(attrs[name])
+        return isinstance(value, np.ndarray) or value not in values
+    return condition
+
+
+def attr_lacks(name, *values):
+    """ Condition of a rule: the attribute `name` is missing or none of
+    `values` (the opposite of attr_is) """
+    has_value = attr_is(name, *values)
+    return lambda attrs: not has_value(attrs)
+
+
+def attr_contains(name, value):
+    """ Condition of a rule: the array attribute `name` contains `value` """
+    value = value.encode()
+    def condition(attrs):
+        return name in attrs and bool(np.any(attrs[name] == value))
+    return condition
+
+
+floats = [np.single, np.double, np.longdouble]
+
+# The attribute requirements of the standard and its extensions:
+#   (scope, extension, request, attribute, types, type_format, condition)
+# The scopes are checked by check_rules on these objects:
+#   root             "/" (attributes that describe the file)
+#   root_provenance  "/" (who wrote the file, with what and when)
+#   base_path        each iteration, e.g. "/data/100/"
+#   meshes           the meshesPath group of an iteration
+#   mesh_record      each mesh record
+#   mesh_component   each component of a mesh record (or scalar record)
+#   species          each particle species
+#   particle_record  each particle record (but particlePatches)
+#   component        each record component
+#   constant         each constant record component
+attribute_rules = [
+    # STANDARD.md
+    ("root", None, "required", "openPMD", np.string_,
+     r"^[0-9]+\.[0-9]+\.[0-9]+$", None),
+    ("root", None, "required", "openPMDextension", np.uint32, None, None),
+    ("root", None, "required", "basePath", np.string_, r"^\/data\/\%T\/$",
+     None),
+    ("root", None, "required", "iterationEncoding", np.string_,
+     r"^groupBased|fileBased$", None),
+    ("root", None, "required", "iterationFormat", np.string_, None, None),
+    #   optional but required for data
+    ("root", None, "optional", "meshesPath", np.string_, r"^.*\/$", None),
+    ("root", None, "optional", "particlesPath", np.string_, r"^.*\/$", None),
+
+    ("root_provenance", None, "recommended", "author", np.string_, None,
+     None),
+    ("root_provenance", None, "recommended", "software", np.string_, None,
+     None),
+    ("root_provenance", None, "recommended", "softwareVersion", np.string_,
+     None, None),
+    ("root_provenance", None, "recommended", "date", np.string_,
+     r"^[0-9]{4}-[0-9]{2}-[0-9]{2} [0-9]{2}:[0-9]{2}:[0-9]{2} "
+     r"[\+|-][0-9]{4}$", None),
+    ("root_provenance", None, "optional", "softwareDependencies",
+     np.string_, None, None),
+    ("root_provenance", None, "optional", "machine", np.string_, None,
+     None),
+    ("root_provenance", None, "optional", "comment", np.string_, None,
+     None),
+
+    ("base_path", None, "required", "time", floats, None, None),
+    ("base_path", None, "required", "dt", floats, None, None),
+    ("base_path", None, "required", "timeUnitSI", np.float64, None, None),
+
+    ("mesh_record", None, "required", "unitDimension", np.ndarray,
+     np.float64, None),
+    ("mesh_record", None, "required", "timeOffset", [np.float32, np.float64],
+     None, None),
+    ("mesh_record", None, "required", "gridSpacing", np.ndarray,
+     [np.float32, np.float64], None),
+    ("mesh_record", None, "required", "gridGlobalOffset", np.ndarray,
+     [np.float32, np.float64], None),
+    ("mesh_record", None, "required", "gridUnitSI", np.float64, None, None),
+    ("mesh_record", None, "required", "dataOrder", np.string_, None, None),
+    ("mesh_record", None, "required", "axisLabels", np.ndarray, np.string_,
+     None),
+    ("mesh_record", None, "required", "geometry", np.string_, None, None),
+    # geometryParameters is required when using thetaMode
+    ("mesh_record", None, "required", "geometryParameters", np.string_, None,
+     attr_is("geometry", "thetaMode")),
+    # otherwise it is optional
+    ("mesh_record", None, "optional", "geometryParameters", np.string_, None,
+     attr_lacks("geometry", "thetaMode")),
+
+    ("mesh_component", None, "required", "position", np.ndarray, floats,
+     None),
+
+    ("component", None, "required", "unitSI", np.float64, None, None),
+    # constant components require "value" and "shape" attributes
+    ("constant", None, "required", "value", None, None, None),
+    ("constant", None, "required", "shape", np.ndarray, np.uint64, None),
+
+    ("particle_record", None, "required", "unitDimension", np.ndarray,
+     np.float64, None),
+    ("particle_record", None, "required", "timeOffset", floats, None, None),
+
+    # EXT_ED-PIC.md
+    ("meshes", "ED-PIC", "required", "fieldSolver", np.string_, None, None),
+    ("meshes", "ED-PIC", "required", "fieldSolverParameters", np.string_,
+     None, attr_is("fieldSolver", "other", "GPSTD")),
+    ("meshes", "ED-PIC", "required", "fieldBoundary", np.ndarray, np.string_,
+     None),
+    ("meshes", "ED-PIC", "required", "fieldBoundaryParameters", np.ndarray,
+     np.string_, attr_contains("fieldBoundary", "other")),
+    ("meshes", "ED-PIC", "required", "particleBoundary", np.ndarray,
+     np.string_, None),
+    ("meshes", "ED-PIC", "required", "particleBoundaryParameters",
+     np.ndarray, np.string_, attr_contains("particleBoundary", "other")),
+    ("meshes", "ED-PIC", "required", "currentSmoothing", np.string_, None,
+     None),
+    ("meshes", "ED-PIC", "required", "currentSmoothingParameters",
+     np.string_, None, attr_is_not("currentSmoothing", "none")),
+    ("meshes", "ED-PIC", "required", "chargeCorrection", np.string_, None,
+     None),
+    ("meshes", "ED-PIC", "required", "chargeCorrectionParameters",
+     np.string_, None, attr_is_not("chargeCorrection", "none")),
+
+    ("mesh_record", "ED-PIC", "required", "fieldSmoothing", np.string_, None,
+     None),
+    ("mesh_record", "ED-PIC", "required", "fieldSmoothingParameters",
+     np.string_, None, attr_is_not("fieldSmoothing", "none")),
+
+    ("species", "ED-PIC", "required", "particleShape", floats, None, None),
+    ("species", "ED-PIC", "required", "currentDeposition", np.string_, None,
+     None),
+    ("species", "ED-PIC", "required", "particlePush", np.string_, None,
+     None),
+    ("species", "ED-PIC", "required", "particleInterpolation", np.string_,
+     None, None),
+    ("species", "ED-PIC", "required", "particleSmoothing", np.string_, None,
+     None),
+    ("species", "ED-PIC", "required", "particleSmoothingParameters",
+     np.string_, None, attr_is_not("particleSmoothing", "none")),
+
+    ("particle_record", "ED-PIC", "required", "weightingPower", np.float64,
+     None, None),
+    ("particle_record", "ED-PIC", "required", "macroWeighted", np.uint32,
+     None, None),
+]
+
+
+def compile_rules(rules):
+    """
+    Compile a rule table like attribute_rules
+
+    Returns
+    -------
+    A dictionary {scope: list of AttrRule}, in table order
+    """
+    compiled = {}
+    for scope, extension, request, name, is_type, type_format, condition \
+        in rules:
+        compiled.setdefault(scope, []).append(
+            AttrRule(scope, extension, request, name, is_type, type_format,
+                     condition))
+    return compiled
+
+
+compiled_rules = compile_rules(attribute_rules)
+
+# the rules per (scope, enabled extensions), filled on first use
+_active_rules = {}
+
+
+def active_rules(scope, extensionStates=None):
+    """
+    The rules of `scope` that apply with the enabled extensions
+
+    Returns
+    -------
+    A tuple of AttrRule
+    """
+    enabled = () if extensionStates is None else \
+        tuple(sorted( name for name, on in extensionStates.items() if on ))
+    key = (scope, enabled)
+    rules = _active_rules.get(key)
+    if rules is None:
+        rules = tuple( rule for rule in compiled_rules[scope]
+                       if rule.extension is None or rule.extension in enabled )
+        _active_rules[key] = rules
+    return rules
+
+
+def check_rules(f, v, scope, extensionStates=None):
+    """
+    Checks the attributes of `f` against all rules of `scope`
+
+    Parameters
+    ----------
+    f : an h5py.File, h5py.Group or h5py.DataSet object
+        The object whose attributes shall be tested
+
+    v : bool
+        Verbose option
+
+    scope : string
+        The scope in attribute_rules
+
+    extensionStates : Dictionary {string:bool} or None
+        Whether an extension is enabled (None: none is)
+
+    Returns
+    -------
+    An array with 2 elements :
+    - The first element is the number of errors encountered
+    - The second element is the number of warnings encountered
+    """
+    result_array = Result()
+    for rule in active_rules(scope, extensionStates):
+        if rule.condition is None or rule.condition(f.attrs):
+            result_array += check_attr(f, v, rule)
+    return result_array
+
 
 def is_scalar_record(r):
     """
@@ -331,7 +1690,7 @@ def is_scalar_record(r):
     bool : true if the record is a scalar record, false if the record
            is either a vector or an other type of tensor record
     """
-    if type(r) is h5.Group :
+    if isinstance(r, (h5.Group, IndexGroup)) :
         # now it could be either a vector/tensor record
         # or a scalar record with a constant component
 
@@ -344,108 +1703,1191 @@ def is_scalar_record(r):
     else :
         return True
 
-def test_component(c, v) :
+def test_component(c, v, data_check=None) :
+    """
+    Checks if a record component defines all required attributes.
+
+    Parameters
+    ----------
+    c : an h5py.Group or h5py.DataSet object
+        the record component that shall be tested
+
+    v : bool
+        Verbose option
+
+    data_check : DataCheck or None
+        Settings of the checks of the component data (None: skip them)
+
+    Returns
+    -------
+    An array with 2 elements :
+    - The first element is the number of errors encountered
+    - The second element is the number of warnings encountered
+    """
+    # Initialize the result array
+    # First element : number of errors
+    # Second element : number of warnings
+    result_array = Result()
+
+    if isinstance(c, (h5.Group, IndexGroup)) :
+        # since this check tests components, this must be a constant
+        # component: requires "value" and "shape" attributes
+        result_array += check_rules(c, v, "constant")
+
+    # default attributes for all components
+    result_array += check_rules(c, v, "component")
+
+    if data_check is not None :
+        result_array += test_data(data_check, test_component_data,
+                                  c, v, data_check)
+
+    return(result_array)
+
+
+def test_data(data_check, function, *args) :
+    """
+    Run the data check `function(*args)`, or queue it if `data_check`
+    defers the data checks, see DataCheck.deferred and check_pending_data
+
+    Returns
+    -------
+    The Result of the check, empty if it is queued
+    """
+    if data_check.pending is None :
+        return(function(*args))
+    data_check.pending.append((function, args))
+    return(Result())
+
+
+def check_pending_data(data_check) :
+    """
+    Run the data checks that were queued by test_data, in order
+
+    Returns
+    -------
+    An array with 2 elements :
+    - The first element is the number of errors encountered
+    - The second element is the number of warnings encountered
+    """
+    result_array = Result()
+    pending, data_check.pending = data_check.pending, []
+    for function, args in pending :
+        result_array += function(*args)
+    return(result_array)
+
+
+def test_component_data(c, v, data_check) :
+    """
+    Checks that all values of a record component are finite (no NaN or Inf).
+
+    Datasets are read in blocks of at most `data_check.block_bytes`, see
+    data_h5.find_non_finite. Constant components are checked from their
+    `value` attribute, without expanding them to their `shape`.
+    In sampling mode (`data_check.sample_bytes`), only a random sample of
+    the chunks is read; the covered fraction is reported in verbose mode.
+
+    Parameters
+    ----------
+    c : an h5py.Group or h5py.DataSet object
+        the record component that shall be tested
+
+    v : bool
+        Verbose option
+
+    data_check : DataCheck
+        Settings of the checks of the component data
+
+    Returns
+    -------
+    An array with 2 elements :
+    - The first element is the number of errors encountered
+    - The second element is the number of warnings encountered
+    """
+    if isinstance(c, (h5.Group, IndexGroup)) :
+        valid, value = get_attr(c, "value")
+        if valid :
+            value = find_non_finite_constant(value)
+            if value is not None :
+                return(report("error", c.name, "data-finite",
+                    "Constant component `%s` has the non-finite value %s!"
+                    %(c.name, value)))
+        return(Result())
+
+    if not has_float_values(c.dtype) :
+        return(Result())
+
+    # an indexed component only holds the metadata: read the data from
+    # the dataset in the file
+    dset = open_object(c)
+    blocks = None
+    if data_check.sample_bytes is not None :
+        blocks, coverage = sample_blocks(dset, data_check)
+        if v :
+            report("note", c.name, "data-coverage",
+                   "Sampled %.3g%% of component `%s` (%d read(s))"
+                   %(100. * coverage, c.name, len(blocks)))
+    bad = find_non_finite(dset, data_check.block_bytes, blocks)
+    if bad is not None :
+        index, value = bad
+        return(report("error", c.name, "data-finite",
+            "Component `%s` has the non-finite value %s at index %s!"
+            %(c.name, value, list(index))))
+    if v :
+        report("note", c.name, "data-finite",
+               "All values of component `%s` are finite." % c.name)
+    return(Result())
+
+
+def read_component(c) :
+    """
+    Read all values of a (small) one-dimensional record component, e.g. of
+    particlePatches
+
+    Constant components are expanded to their `shape`.
+
+    Returns
+    -------
+    A one-dimensional array, or None if `c` is not a one-dimensional
+    dataset or a constant component with `value` and `shape`
+    """
+    shape = component_shape(c)
+    if shape is None or len(shape) != 1 :
+        return(None)
+    if isinstance(c, (h5.Group, IndexGroup)) :
+        valid, value = get_attr(c, "value")
+        if not valid or np.ndim(value) != 0 :
+            return(None)
+        return(np.full(shape, value))
+    return(open_object(c)[()])
+
+
+def component_shape(c) :
+    """
+    The shape of a record component, from the metadata only
+
+    Returns
+    -------
+    A tuple of int: the shape of the dataset, or the `shape` attribute of
+    a constant component (None if it is missing or not integer)
+    """
+    if isinstance(c, (h5.Group, IndexGroup)) :
+        valid, shape = get_attr(c, "shape")
+        if not valid :
+            return(None)
+        shape = np.atleast_1d(shape)
+        if shape.dtype.kind not in "iu" :
+            return(None)
+        return(tuple( int(n) for n in shape ))
+    return(c.shape)
+
+
+def component_shapes(r) :
+    """
+    The shapes of all components of a record, see component_shape
+
+    Returns
+    -------
+    A list of tuples (component name, shape) in file order, with the name
+    "" for scalar records. Components without a shape are left out.
+    """
+    if is_scalar_record(r) :
+        components = [ ("", r) ]
+    else :
+        components = [ (name, r[name]) for name in r.keys() ]
+    shapes = [ (name, component_shape(c)) for name, c in components ]
+    return([ (name, shape) for name, shape in shapes if shape is not None ])
+
+
+def format_shapes(shapes) :
+    """ List the shapes of component_shapes for a message """
+    return(", ".join( "%s: %s" %(name, shape) for name, shape in shapes ))
+
+
+def test_record_shape(r, v) :
+    """
+    Checks that all components of a record have the same shape.
+
+    Only the metadata is used: the shapes of the datasets and the `shape`
+    attributes of constant components. No data is read.
+
+    Parameters
+    ----------
+    r : an h5py.Group or h5py.DataSet object
+        the record that shall be tested
+
+    v : bool
+        Verbose option
+
+    Returns
+    -------
+    An array with 2 elements :
+    - The first element is the number of errors encountered
+    - The second element is the number of warnings encountered
+    """
+    shapes = component_shapes(r)
+    if len(set( shape for _, shape in shapes )) > 1 :
+        return(report("error", r.name, "record-shape",
+            "The components of record `%s` do not have the same shape "
+            "(%s)!" %(r.name, format_shapes(shapes))))
+    return(Result())
+
+
+def test_species_shapes(species, v) :
+    """
+    Checks that all particle records of a species hold the same number of
+    particles, and that all particlePatches records have one value per
+    patch.
+
+    Only the metadata is used, see test_record_shape. Records whose
+    components differ in shape are left to test_record_shape; the other
+    ones are compared to the most common shape.
+
+    Parameters
+    ----------
+    species : an h5py.Group object
+        the particle species that shall be tested
+
+    v : bool
+        Verbose option
+
+    Returns
+    -------
+    An array with 2 elements :
+    - The first element is the number of errors encountered
+    - The second element is the number of warnings encountered
+    """
+    result_array = Result()
+
+    records = []
+    patch_records = []
+    for record_name in species.keys() :
+        record = species[record_name]
+        if record_name == "particlePatches" :
+            patch_records = [ record[name] for name in record.keys() ]
+            for patch_record in patch_records :
+                result_array += test_record_shape(patch_record, v)
+        else :
+            records.append(record)
+
+    for kind, group in (("particle", records),
+                        ("particlePatches", patch_records)) :
+        record_shapes = []
+        for record in group :
+            shapes = set( shape for _, shape in component_shapes(record) )
+            if len(shapes) == 1 :
+                record_shapes.append((record, shapes.pop()))
+        all_shapes = [ shape for _, shape in record_shapes ]
+        if len(all_shapes) == 0 :
+            continue
+        common_shape = max(all_shapes, key=all_shapes.count)
+        for record, shape in record_shapes :
+            if shape != common_shape :
+                result_array += report("error", record.name, "record-shape",
+                    "The %s record `%s` has the shape %s but the other "
+                    "records have the shape %s in species `%s`!"
+                    %(kind, basename(record.name), shape, common_shape,
+                      species.name))
+
+    return(result_array)
+
+
+def unit_si(c) :
+    """ The `unitSI` of a record component, 1.0 if it is missing """
+    valid, value = get_attr(c, "unitSI")
+    return(value if valid else 1.0)
+
+
+def test_particle_patches(species, v, data_check=None) :
+    """
+    Checks that the particlePatches of a species are consistent
+    with its particle records.
+
+    The patches must be stored one after the other (`numParticlesOffset`
+    is the exclusive prefix sum of `numParticles`) and cover all particles.
+    If `data_check` is set, the positions of the particles of each patch
+    must also lie inside of its `offset` and `extent`.
+
+    Parameters
+    ----------
+    species : an h5py.Group object
+        the particle species with valid particlePatches
+
+    v : bool
+        Verbose option
+
+    data_check : DataCheck or None
+        Settings of the checks of the component data (None: skip them)
+
+    Returns
+    -------
+    An array with 2 elements :
+    - The first element is the number of errors encountered
+    - The second element is the number of warnings encountered
+    """
+    patches = species["particlePatches"]
+    num_particles = read_component(patches["numParticles"])
+    num_particles_offset = read_component(patches["numParticlesOffset"])
+    for name, values in (("numParticles", num_particles),
+                         ("numParticlesOffset", num_particles_offset)) :
+        if values is None or values.dtype.kind not in "iu" :
+            return(report("error", patches.name, "particle-patches",
+                "`%s` is not a one-dimensional record component of "
+                "integers in species `%s`!" %(name, species.name)))
+    if num_particles.shape != num_particles_offset.shape :
+        return(report("error", patches.name, "particle-patches",
+            "`numParticles` and `numParticlesOffset` do not have the "
+            "same shape in species `%s`!" % species.name))
+
+    mismatch = exclusive_prefix_sum_mismatch(num_particles,
+                                             num_particles_offset)
+    if mismatch is not None :
+        patch, expected = mismatch
+        return(report("error", patches.name, "particle-patches",
+            "`numParticlesOffset` of patch %d is %d but should be %d (the "
+            "sum of `numParticles` of the patches before) in species `%s`!"
+            %(patch, num_particles_offset[patch], expected, species.name)))
+
+    position = species["position"]
+    components = list(position.keys()) \
+        if isinstance(position, (h5.Group, IndexGroup)) else []
+    if len(components) == 0 :
+        return(report("error", patches.name, "particle-patches",
+            "The particlePatches of species `%s` have no `position` "
+            "components to compare to!" % species.name))
+    num_total = int(np.sum(num_particles, dtype=np.uint64))
+    shape = component_shape(position[components[0]])
+    if shape is None :
+        # missing `shape` attribute, see test_component
+        return(Result())
+    if len(shape) != 1 :
+        return(report("error", patches.name, "particle-patches",
+            "The `position` record of species `%s` is not "
+            "one-dimensional (shape %s)!" %(species.name, shape)))
+    num_records = shape[0]
+    if num_total != num_records :
+        return(report("error", patches.name, "particle-patches",
+            "The patches hold %d particles in total but the records of "
+            "species `%s` hold %d particles!"
+            %(num_total, species.name, num_records)))
+
+    if data_check is None :
+        return(Result())
+    return(test_data(data_check, test_patch_positions, species, v,
+                     data_check, num_particles, num_particles_offset))
+
+
+def test_patch_positions(species, v, data_check, num_particles,
+                         num_particles_offset) :
+    """
+    Checks that the particles of each patch of a species lie inside of
+    the `offset` and `extent` of the patch, see test_particle_patches.
+
+    Returns
+    -------
+    An array with 2 elements :
+    - The first element is the number of errors encountered
+    - The second element is the number of warnings encountered
+    """
+    patches = species["particlePatches"]
+    position = species["position"]
+    position_offset = species["positionOffset"]
+    components = list(position.keys())
+    num_total = int(np.sum(num_particles, dtype=np.uint64))
+    patch_offset = {}
+    patch_extent = {}
+    positions = {}
+    for name in components :
+        if not isinstance(position_offset, (h5.Group, IndexGroup)) or \
+           name not in position_offset :
+            return(report("error", patches.name, "particle-patches",
+                "`positionOffset` has no component `%s` like `position` "
+                "in species `%s`!" %(name, species.name)))
+        for record_name in ("offset", "extent") :
+            c = patches[record_name][name]
+            values = read_component(c)
+            if values is None or values.dtype.kind not in "iuf" or \
+               values.shape != num_particles.shape :
+                return(report("error", patches.name, "particle-patches",
+                    "`%s/%s` is not a one-dimensional numeric record "
+                    "component with one value per patch in species `%s`!"
+                    %(record_name, name, species.name)))
+            if record_name == "offset" :
+                patch_offset[name] = values * unit_si(c)
+            else :
+                patch_extent[name] = values * unit_si(c)
+        readers = []
+        for c in (position[name], position_offset[name]) :
+            if component_shape(c) != (num_total,) :
+                return(report("error", patches.name, "particle-patches",
+                    "`%s` does not hold the %d particles of the patches "
+                    "in species `%s`!" %(c.name, num_total, species.name)))
+            if isinstance(c, (h5.Group, IndexGroup)) :
+                valid, value = get_attr(c, "value")
+                if not valid or np.ndim(value) != 0 or \
+                   np.asarray(value).dtype.kind not in "iuf" :
+                    return(report("error", patches.name,
+                        "particle-patches",
+                        "The constant component `%s` has no numeric "
+                        "`value` in species `%s`!" %(c.name, species.name)))
+                readers.append(component_reader(value=value,
+                                                unit_si=unit_si(c)))
+            elif c.dtype.kind not in "iuf" :
+                return(report("error", patches.name, "particle-patches",
+                    "`%s` does not hold numbers in species `%s`!"
+                    %(c.name, species.name)))
+            else :
+                readers.append(component_reader(open_object(c), None,
+                                                unit_si(c)))
+        positions[name] = tuple(readers)
+
+    sample = None
+    if data_check.sample_bytes is not None :
+        sample, coverage = sample_patches(num_particles,
+            data_check.sample_fraction(patches.file.filename),
+            data_check.random_state(patches.name))
+        if v :
+            report("note", patches.name, "data-coverage",
+                   "Sampled %.3g%% of the particles of species `%s` "
+                   "(%d of %d patches)"
+                   %(100. * coverage, species.name, len(sample),
+                     len(num_particles)))
+
+    outlier = find_patch_outliers(num_particles, num_particles_offset,
+                                  patch_offset, patch_extent, positions,
+                                  data_check.block_bytes, patches=sample)
+    if outlier is not None :
+        patch, name, index, x = outlier
+        low = patch_offset[name][patch]
+        return(report("error", patches.name, "particle-patches",
+            "Particle %d of species `%s` is outside of its patch %d: "
+            "position %s is %g m but the patch spans [%g m, %g m]!"
+            %(index, species.name, patch, name, x, low,
+              low + patch_extent[name][patch])))
+    if v :
+        report("note", patches.name, "particle-patches",
+               "All particles of species `%s` are inside of their patch."
+               % species.name)
+    return(Result())
+
+
+def check_root_attr(f, v):
+    """
+    Scan the root of the file and make sure that all the attributes are present
+
+    Parameters
+    ----------
+    f : an h5py.File object
+        The HDF5 file in which to find the attribute
+        
+    v : bool
+        Verbose option
+
+    Returns
+    -------
+    An array with 2 elements :
+    - The first element is the number of errors encountered
+    - The second element is the number of warnings encountered
+    """
+    # Initialize the result array
+    # First element : number of errors
+    # Second element : number of warnings
+    result_array = Result()
+    
+    # STANDARD.md
+    result_array += check_rules(f, v, "root")
+
+    # groupBased iteration encoding needs to match basePath
+    if result_array[0] == 0 :
+        if f.attrs["iterationEncoding"].decode() == "groupBased" :
+            if f.attrs["iterationFormat"].decode() != f.attrs["basePath"].decode() :
+                result_array += report("error", f.name, "iteration-format",
+                    "for groupBased iterationEncoding the basePath "
+                    "and iterationFormat must match!")
+
+    result_array += check_rules(f, v, "root_provenance")
+
+    return(result_array)
+
+
+def check_iteration_range(file_name, iterations, v, extensionStates,
+                          data_check=None, file_access=None):
+    """
+    Check a range of iterations through a separate, read-only file handle
+
+    This is the unit of work of the worker processes in check_iterations.
+    The meshes and particles of each iteration are always checked and the
+    findings of all checks are kept instead of printed, so that the
+    results can be merged exactly as a serial run would report them.
+
+    Parameters
+    ----------
+    file_name : string
+        The HDF5 file to open
+
+    iterations : list of strings representing integers
+        The iterations to check
+
+    v : bool
+        Verbose option
+
+    extensionStates : Dictionary {string:bool}
+        Whether an extension is enabled
+
+    data_check : DataCheck or None
+        Settings of the checks of the component data (None: skip them)
+
+    file_access : FileAccess or None
+        Settings of the file access (None: the HDF5 defaults)
+
+    Returns
+    -------
+    A list with one tuple per iteration:
+    (iteration, base path Result, base path list of Finding,
+     meshes and particles Result, meshes and particles list of Finding)
+    """
+    f = open_file(file_name, file_access)
+    try:
+        root_attrs = IndexAttrs(f)
+        return [ check_iteration(f, iteration, v, extensionStates, root_attrs,
+                                 data_check)
+                 for iteration in iterations ]
+    finally:
+        f.close()
+
+
+def check_iteration(f, iteration, v, extensionStates, root_attrs=None,
+                    data_check=None):
+    """
+    Check one iteration and keep its findings instead of printing them
+
+    Parameters
+    ----------
+    f : an h5py.File object
+        The HDF5 file in which to find the iteration
+
+    iteration : string representing an integer
+        The iteration to check
+
+    v : bool
+        Verbose option
+
+    extensionStates : Dictionary {string:bool}
+        Whether an extension is enabled
+
+    root_attrs : IndexAttrs or None
+        The attributes of "/", see build_index
+
+    data_check : DataCheck or None
+        Settings of the checks of the component data (None: skip them)
+
+    Returns
+    -------
+    A tuple (iteration, base path Result, base path list of Finding,
+             meshes and particles Result, meshes and particles list of Finding)
+    """
+    active = _findings
+    try:
+        it = build_index(f, "/data/%s/" % iteration, root_attrs)
+        base_findings = Findings(echo=False, keep=True)
+        set_findings(base_findings)
+        base_result = check_base_path(it, iteration, v, extensionStates)
+        deep_findings = Findings(echo=False, keep=True)
+        set_findings(deep_findings)
+        # the data checks are the most expensive ones: run them last
+        deferred = data_check.deferred() if data_check is not None else None
+        deep_result = check_meshes(it, iteration, v, extensionStates,
+                                   deferred)
+        deep_result += check_particles(it, iteration, v, extensionStates,
+                                       deferred)
+        if deferred is not None:
+            deep_result += check_pending_data(deferred)
+    finally:
+        set_findings(active)
+    return (iteration, base_result, base_findings.findings,
+            deep_result, deep_findings.findings)
+
+
+def _check_iteration_range_star(task):
+    """
+    check_iteration_range for a Pool, which passes one argument: a tuple
+    (whether to profile the task, arguments), see _profiled_task
+    """
+    profiled, args = task
+    return _profiled_task(check_iteration_range, args, profiled)
+
+
+def range_size(n_iterations, workers=1):
+    """
+    Number of iterations per range of check_iteration_ranges
+
+    A few ranges per worker balance the load, and ranges of about 64
+    iterations for many iterations bound the memory of the results that
+    are not merged yet.
+    """
+    n_ranges = max(min(n_iterations, 4 * workers), n_iterations // 64, 1)
+    return max(1, (n_iterations + n_ranges - 1) // n_ranges)
+
+
+def iteration_batches(iterations, size):
+    """
+    Split the iterable `iterations` into lists of at most `size` items
+
+    Returns
+    -------
+    A generator of non-empty lists
+    """
+    iterations = iter(iterations)
+    while True:
+        batch = list(islice(iterations, size))
+        if not batch:
+            return
+        yield batch
+
+
+class RangeChecker(object):
+    """
+    Checks ranges of iterations with check_iteration_range, serially or
+    in a Pool of worker processes, and returns their results in the order
+    in which the ranges were submitted
+
+    At most `2 * workers` ranges are queued in the Pool, see ready, so
+    that ranges can be submitted while the iterations are enumerated.
+    """
+    __slots__ = ("file_name", "v", "extensionStates", "workers",
+                 "data_check", "file_access", "pending", "pool")
+
+    def __init__(self, file_name, v, extensionStates, workers=1,
+                 data_check=None, file_access=None):
+        self.file_name = file_name
+        self.v = v
+        self.extensionStates = extensionStates
+        self.workers = workers
+        self.data_check = data_check
+        self.file_access = file_access
+        # submitted ranges: AsyncResults, or tasks for serial checks
+        self.pending = deque()
+        self.pool = None
+
+    def ready(self):
+        """ Whether another range can be submitted without waiting """
+        return len(self.pending) < 2 * self.workers
+
+    def submit(self, iterations):
+        """ Queue the check of the list of iterations `iterations` """
+        task = (self.file_name, iterations, self.v, self.extensionStates,
+                self.data_check, self.file_access)
+        if self.workers > 1:
+            if self.pool is None:
+                sys.stdout.flush()
+                self.pool = multiprocessing.Pool(self.workers)
+            task = self.pool.apply_async(_check_iteration_range_star,
+                                         ((_profile is not None, task),))
+        self.pending.append(task)
+
+    def results(self):
+        """ The list of results of the oldest submitted range """
+        task = self.pending.popleft()
+        if self.pool is None:
+            return check_iteration_range(*task)
+        results, stats = task.get()
+        merge_profile(stats)
+        return results
+
+    def close(self):
+        """ Stop the workers, dropping the ranges that were not merged """
+        if self.pool is None:
+            return
+        if self.pending:
+            # stopped early, e.g. at the error limit
+            self.pool.terminate()
+        else:
+            self.pool.close()
+        self.pool.join()
+        self.pool = None
+        self.pending.clear()
+
+
+def check_iteration_ranges(file_name, iterations, v, extensionStates,
+                           workers=1, data_check=None, file_access=None,
+                           n_iterations=None):
+    """
+    Check iterations with check_iteration_range, in contiguous ranges
+
+    With several workers, each range is checked in a worker process.
+    `iterations` is consumed lazily: only the ranges queued in the workers
+    are held in memory, see RangeChecker.
+
+    Parameters
+    ----------
+    iterations : iterable of strings representing integers
+        The iterations to check
+
+    n_iterations : int or None
+        The number of `iterations`, for the size of the ranges (None:
+        `iterations` is a list)
+
+    Returns
+    -------
+    A generator of the tuples of check_iteration_range, in the order of
+    `iterations`
+    """
+    if n_iterations is None:
+        n_iterations = len(iterations)
+    ranges = iteration_batches(iterations, range_size(n_iterations, workers))
+    checker = RangeChecker(file_name, v, extensionStates, workers,
+                           data_check, file_access)
+    try:
+        for iteration_range in ranges:
+            checker.submit(iteration_range)
+            while not checker.ready():
+                for result in checker.results():
+                    yield result
+        while checker.pending:
+            for result in checker.results():
+                yield result
+    finally:
+        checker.close()
+
+
+def mpi_iteration_results(mpi, h5_file, iterations, v, extensionStates,
+                          root_attrs, data_check=None):
+    """
+    Check the iterations on all MPI ranks, each rank its share of them
+
+    Parameters
+    ----------
+    mpi : MpiContext
+        The ranks and the schedule of the iterations
+
+    h5_file : an h5py.File object
+        The file in which to find the iterations, opened by each rank
+
+    iterations : list of strings representing integers
+        The iterations to check
+
+    v, extensionStates, data_check :
+        See check_iterations
+
+    root_attrs : IndexAttrs
+        The attributes of "/", see build_index
+
+    Returns
+    -------
+    A generator of the tuples of check_iteration_range, in the order of
+    `iterations`, on rank 0; empty on the other ranks
+    """
+    checked = [ (index, check_iteration(h5_file, iterations[index], v,
+                                        extensionStates, root_attrs,
+                                        data_check))
+                for index in mpi.tasks(len(iterations)) ]
+    for result in mpi.gather_ordered(checked):
+        yield result
+
+
+def cached_iteration_results(h5_file, iterations, v, extensionStates,
+                             workers=1, cache=None, file_access=None,
+                             n_iterations=None):
+    """
+    Results of check_iteration_range, reused from `cache` for all
+    iterations whose metadata did not change since they were cached
+
+    `iterations` is consumed lazily, in batches: the iterations of one
+    batch are fingerprinted and those that changed are submitted to a
+    RangeChecker while the results of the batch before are merged. The
+    cached iterations are loaded one shard at a time, see
+    CachedIterations. The data of the components is not checked: its
+    changes are not covered by the fingerprints.
+
+    Parameters
+    ----------
+    h5_file : an h5py.File object
+        The file in which to find the iterations
+
+    iterations : iterable of strings representing integers
+        The iterations to check
+
+    v, extensionStates, workers, file_access :
+        See check_iterations
+
+    cache : ResultCache
+        The cache to read and update
+
+    n_iterations : int or None
+        The number of `iterations`, see check_iteration_ranges
+
+    Returns
+    -------
+    A generator of the tuples of check_iteration_range, in the order of
+    `iterations`
+    """
+    if n_iterations is None:
+        n_iterations = len(iterations)
+    cached = CachedIterations(cache,
+                              cache.file_key(h5_file, [v, extensionStates]))
+    size = range_size(n_iterations, workers)
+    checker = RangeChecker(h5_file.filename, v, extensionStates, workers,
+                           None, file_access)
+
+    def submit(batch):
+        """ Fingerprint a batch and submit the iterations that changed """
+        fingerprints = [ object_fingerprint(h5_file["/data/%s/" % iteration])
+                         for iteration in batch ]
+        todo = [ iteration
+                 for iteration, fingerprint in zip(batch, fingerprints)
+                 if (cached.get(iteration) or [None])[0] != fingerprint ]
+        for iteration_range in iteration_batches(todo, size):
+            checker.submit(iteration_range)
+        return (batch, fingerprints)
+
+    # batches of a few ranges per worker, one batch ahead of the merge
+    batches = iteration_batches(iterations, 2 * workers * size)
+    submitted = deque()
+    try:
+        for batch in islice(batches, 1):
+            submitted.append(submit(batch))
+        while submitted:
+            batch, fingerprints = submitted.popleft()
+            for next_batch in islice(batches, 1):
+                submitted.append(submit(next_batch))
+            checked = deque()
+            for iteration, fingerprint in zip(batch, fingerprints):
+                entry = cached.get(iteration)
+                if entry is not None and entry[0] == fingerprint:
+                    _, base_result, base_findings, deep_result, \
+                        deep_findings = entry
+                    yield (iteration, Result(*base_result),
+                           [ Finding(*finding) for finding in base_findings ],
+                           Result(*deep_result),
+                           [ Finding(*finding) for finding in deep_findings ])
+                else:
+                    if not checked:
+                        checked.extend(checker.results())
+                    result = checked.popleft()
+                    _, base_result, base_findings, deep_result, \
+                        deep_findings = result
+                    entry = [ fingerprint, list(base_result),
+                              [ [finding.severity, finding.path,
+                                 finding.rule, finding.message]
+                                for finding in base_findings ],
+                              list(deep_result),
+                              [ [finding.severity, finding.path,
+                                 finding.rule, finding.message]
+                                for finding in deep_findings ] ]
+                    yield result
+                # the iterations that are not visited, e.g. outside of an
+                # IterationSelection, keep their entries
+                cached.set(iteration, entry)
+    finally:
+        # stopped early, e.g. at the error limit: stop the workers now
+        checker.close()
+    cached.flush()
+
+
+# names of the iterations in /data/: unsigned integers
+iteration_name = re.compile(r"^[0-9]+\Z")
+
+
+def _sorted_by_name(name):
+    """
+    Whether the iteration `name` is kept as a name when sorting the
+    iterations: it is zero-padded or too large for an int64
+    """
+    return len(name) > 18 or (len(name) > 1 and name[0] == "0")
+
+
+def iteration_order(group, batch_size=None, block=65536, keep=None):
+    """
+    Enumerate the iterations of the group `group` (e.g. /data/) in
+    numeric order, iteration 999 before 1000
+
+    The links of `group` are visited one by one and each name is matched
+    once against iteration_name. The iterations are packed into int64 arrays
+    of `block` numbers and sorted with numpy, instead of being kept as a
+    list of names. With `batch_size`, at most this many iterations are
+    sorted at once and each sorted batch is spilled to a temporary file;
+    the batches are then streamed back and merged, so that the memory does
+    not grow with the number of iterations.
+
+    Parameters
+    ----------
+    group : an h5py.Group object
+        The group whose links are the iterations
+
+    batch_size : int or None
+        Sort the iterations in batches of this size (None: all at once)
+
+    block : int
+        Number of iterations that are packed or converted to names at
+        once
+
+    keep : callable or None
+        Only enumerate the iterations T with keep(T) (None: all). All
+        names are still matched and counted.
+
+    Returns
+    -------
+    A tuple (number of iterations, generator of the iteration names)
+
+    Raises
+    ------
+    ValueError : for the first name that is not an integer
+    """
+    # the state of the listing, in a dict for the callback of iterate
+    state = {"numbers": [], "packed": [], "n_packed": 0, "n_iterations": 0,
+             "error": None}
+    names = []
+    batches = []
+
+    def add(name):
+        """ Add one link: returns a value to stop the iteration """
+        try:
+            name = name.decode("utf-8", "surrogateescape")
+            if not iteration_name.match(name):
+                state["error"] = ValueError(name)
+                return 1
+            state["n_iterations"] += 1
+            if keep is not None and not keep(int(name)):
+                return None
+            if _sorted_by_name(name):
+                names.append(name)
+                return None
+            numbers = state["numbers"]
+            numbers.append(int(name))
+            if len(numbers) == block:
+                state["packed"].append(np.array(numbers, dtype=np.int64))
+                state["n_packed"] += block
+                state["numbers"] = numbers = []
+            if batch_size is not None and \
+               state["n_packed"] + len(numbers) >= batch_size:
+                batches.append(_spill(state["packed"] + [numbers]))
+                state.update(numbers=[], packed=[], n_packed=0)
+        except Exception as e:
+            state["error"] = e
+            return 1
+        return None
+
+    # h5py's Group iteration lists all names first: visit the links one
+    # by one instead
+    group.id.links.iterate(add)
+    packed, numbers = state["packed"], state["numbers"]
+    try:
+        if state["error"] is not None:
+            raise state["error"]
+        if batches and (packed or numbers):
+            batches.append(_spill(packed + [numbers]))
+            packed, numbers = [], []
+    except Exception:
+        for batch in batches:
+            batch.close()
+        raise
+    names.sort(key=lambda name: (int(name), name))
+    streams = [ _read_batch(batch) for batch in batches ]
+    if packed or numbers:
+        numbers = np.concatenate(packed + [np.array(numbers,
+                                                    dtype=np.int64)])
+        del packed[:]
+        numbers.sort()
+        streams.append(_sorted_numbers(numbers, block))
+    if names:
+        streams.append((int(name), name) for name in names)
+    return (state["n_iterations"], _merged_iterations(streams, batches))
+
+
+def _spill(arrays):
+    """ Sort the iterations in `arrays` into a new temporary file """
+    batch = tempfile.TemporaryFile()
+    np.sort(np.concatenate([ np.asarray(array, dtype=np.int64)
+                             for array in arrays ])).tofile(batch)
+    return batch
+
+
+def _sorted_numbers(numbers, block):
+    """ The (iteration, "") of a sorted array, converted in blocks """
+    for start in range(0, len(numbers), block):
+        for number in numbers[start:start+block].tolist():
+            yield (number, "")
+
+
+def _read_batch(batch, block=4096):
+    """
+    The (iteration, "") of a spilled batch, read back in blocks: small
+    ones, since all batches are read back at the same time
+    """
+    batch.seek(0)
+    while True:
+        numbers = np.fromfile(batch, dtype=np.int64, count=block)
+        if len(numbers) == 0:
+            return
+        for number in numbers.tolist():
+            yield (number, "")
+
+
+def _merged_iterations(streams, batches):
+    """ The names of the iterations of iteration_order, in order """
+    try:
+        for number, name in heapq.merge(*streams):
+            yield name or str(number)
+    finally:
+        for batch in batches:
+            batch.close()
+
+
+class IterationSelection(object):
     """
-    Checks if a record component defines all required attributes.
+    Which iterations of a file to check, for partial validations
+
+    The iterations are selected by their number, in this order:
+
+    - `start`, `stop`, `step`: the iterations T with start <= T < stop
+      and (T - start) % step == 0, like range(start, stop, step)
+    - `last`: of these, the `last` highest ones
+    - `sample`: of these, `sample` iterations evenly spread between the
+      first and the last one (both included)
 
     Parameters
     ----------
-    c : an h5py.Group or h5py.DataSet object
-        the record component that shall be tested
+    start, step : int
+        First iteration and step of the range
 
-    v : bool
-        Verbose option
+    stop : int or None
+        End of the range, excluded (None: no end)
 
-    Returns
-    -------
-    An array with 2 elements :
-    - The first element is the number of errors encountered
-    - The second element is the number of warnings encountered
+    last, sample : int or None
+        Numbers of iterations (None: all)
+
+    Raises
+    ------
+    ValueError : for a negative start, a step or a number below 1
     """
-    # Initialize the result array
-    # First element : number of errors
-    # Second element : number of warnings
-    result_array = np.array([0,0])
+    __slots__ = ("start", "stop", "step", "last", "sample")
 
-    if type(c) is h5.Group :
-        # since this check tests components, this must be a constant
-        # component: requires "value" and "shape" attributes
-        result_array += test_attr(c, v, "required", "value") # type can be arbitrary
-        result_array += test_attr(c, v, "required", "shape", np.ndarray, np.uint64)
+    def __init__(self, start=0, stop=None, step=1, last=None, sample=None):
+        if start < 0 or step < 1 or (stop is not None and stop < 0) or \
+           (last is not None and last < 1) or \
+           (sample is not None and sample < 1):
+            raise ValueError("Invalid iteration selection")
+        self.start = start
+        self.stop = stop
+        self.step = step
+        self.last = last
+        self.sample = sample
 
-    # default attributes for all components
-    result_array += test_attr(c, v, "required", "unitSI", np.float64)
+    def is_ranged(self):
+        """ Whether the selection restricts the range of iterations """
+        return self.start > 0 or self.stop is not None or self.step > 1
 
-    return(result_array)
+    def in_range(self, iteration):
+        """ Whether the iteration number `iteration` is in the range """
+        return iteration >= self.start and \
+            (self.stop is None or iteration < self.stop) and \
+            (iteration - self.start) % self.step == 0
 
+    def describe(self):
+        """ The selection in the syntax of the command line options """
+        options = []
+        if self.is_ranged():
+            options.append("--iterations %d:%s:%d"
+                           % (self.start, "" if self.stop is None
+                              else self.stop, self.step))
+        if self.last is not None:
+            options.append("--last %d" % self.last)
+        if self.sample is not None:
+            options.append("--sample %d" % self.sample)
+        return " ".join(options) or "all"
 
-def check_root_attr(f, v):
-    """
-    Scan the root of the file and make sure that all the attributes are present
+    def select(self, group, sort_batch=None):
+        """
+        Select the iterations in the group `group` (e.g. /data/)
 
-    Parameters
-    ----------
-    f : an h5py.File object
-        The HDF5 file in which to find the attribute
-        
-    v : bool
-        Verbose option
+        The names are enumerated and checked with iteration_order, like
+        for a check of all iterations, so that zero-padded names match by
+        their number and invalid names are found. No iteration group is
+        opened, and only the iterations in the range are kept in memory.
+
+        Returns
+        -------
+        A tuple (number of iterations in `group`, list of the names of the
+        selected iterations in numeric order)
+
+        Raises
+        ------
+        ValueError : for the first name that is not an integer
+        """
+        if self.is_ranged():
+            n_iterations, iterations = iteration_order(group, sort_batch,
+                                                       keep=self.in_range)
+        else:
+            n_iterations, iterations = iteration_order(group, sort_batch)
+        known_count = not self.is_ranged()
+        if self.last is not None:
+            iterations = deque(iterations, maxlen=self.last)
+            known_count = False
+        if self.sample is None:
+            return (n_iterations, list(iterations))
+        if not known_count:
+            iterations = list(iterations)
+        positions = spread(n_iterations if known_count
+                           else len(iterations), self.sample)
+        return (n_iterations, [ iteration for position, iteration in
+                                enumerate(iterations)
+                                if position in positions ])
+
+
+def spread(n, k):
+    """
+    The positions of `k` of `n` items, evenly spread between the first and
+    the last item (both included; the last one for k=1)
 
     Returns
     -------
-    An array with 2 elements :
-    - The first element is the number of errors encountered
-    - The second element is the number of warnings encountered
+    A set of int
     """
-    # Initialize the result array
-    # First element : number of errors
-    # Second element : number of warnings
-    result_array = np.array([0,0])
-    
-    # STANDARD.md
-    #   required
-    result_array += test_attr(f, v, "required", "openPMD", np.string_, "^[0-9]+\.[0-9]+\.[0-9]+$")
-    result_array += test_attr(f, v, "required", "openPMDextension", np.uint32)
-    result_array += test_attr(f, v, "required", "basePath", np.string_, "^\/data\/\%T\/$")
-    result_array += test_attr(f, v, "required", "iterationEncoding", np.string_, "^groupBased|fileBased$")
-    result_array += test_attr(f, v, "required", "iterationFormat", np.string_)
+    if k >= n:
+        return set(range(n))
+    if k == 1:
+        return set([n - 1])
+    return set( position * (n - 1) // (k - 1) for position in range(k) )
 
-    #   optional but required for data
-    result_array += test_attr(f, v, "optional", "meshesPath", np.string_, "^.*\/$")
-    result_array += test_attr(f, v, "optional", "particlesPath", np.string_, "^.*\/$")
 
-    # groupBased iteration encoding needs to match basePath
-    if result_array[0] == 0 :
-        if f.attrs["iterationEncoding"].decode() == "groupBased" :
-            if f.attrs["iterationFormat"].decode() != f.attrs["basePath"].decode() :
-                print("Error: for groupBased iterationEncoding the basePath "
-                      "and iterationFormat must match!")
-                result_array += np.array([1,0])
-
-    #   recommended
-    result_array += test_attr(f, v, "recommended", "author", np.string_)
-    result_array += test_attr(f, v, "recommended", "software", np.string_)
-    result_array += test_attr(f, v, "recommended",
-                              "softwareVersion", np.string_)
-    result_array += test_attr(f, v, "recommended", "date", np.string_,
-      "^[0-9]{4}-[0-9]{2}-[0-9]{2} [0-9]{2}:[0-9]{2}:[0-9]{2} [\+|-][0-9]{4}$")
-
-    #   optional
-    result_array += test_attr(f, v, "optional", "softwareDependencies", np.string_)
-    result_array += test_attr(f, v, "optional", "machine", np.string_)
-    result_array += test_attr(f, v, "optional", "comment", np.string_)
+def describe_iterations(iterations, max_runs=20):
+    """
+    The iterations `iterations` (names in numeric order) as short text
 
-    return(result_array)
+    Runs of at least 3 iterations with the same step are written as
+    `first-last` (step 1) or `first-last/step`, e.g. "0-900/100, 1000".
+    Of more than `max_runs` runs, only the first and last ones are written.
+    """
+    runs = []
+    numbers = [ int(iteration) for iteration in iterations ]
+    i = 0
+    while i < len(numbers):
+        j = i + 1
+        if j + 1 < len(numbers):
+            step = numbers[j] - numbers[i]
+            while j + 1 < len(numbers) and numbers[j + 1] - numbers[j] == step:
+                j += 1
+        if j - i >= 2:
+            runs.append("%d-%d" % (numbers[i], numbers[j]) +
+                        ("/%d" % step if step != 1 else ""))
+            i = j + 1
+        else:
+            runs.append(str(numbers[i]))
+            i += 1
+    if len(runs) > max_runs:
+        runs = runs[:max_runs // 2] + ["..."] + runs[-(max_runs // 2):]
+    return ", ".join(runs)
 
 
-def check_iterations(f, v, extensionStates) :
+def check_iterations(f, v, extensionStates, workers=1, cache=None,
+                     data_check=None, mpi=None, file_access=None,
+                     sort_batch=None, selection=None) :
     """
     Scan all the iterations present in the file, checking both
     the meshes and the particles
 
     Parameters
     ----------
-    f : an h5py.File object
+    f : an h5py.File object or the IndexGroup of its root group
         The HDF5 file in which to find the attribute
         
     v : bool
@@ -454,46 +2896,144 @@ def check_iterations(f, v, extensionStates) :
     extensionStates : Dictionary {string:bool}
         Whether an extension is enabled
 
+    workers : int
+        Number of worker processes that check the iterations.
+        The output is the same as for a serial check (workers=1).
+
+    cache : ResultCache or None
+        Reuse the results of iterations whose metadata did not change
+        since the last check of this file (ignored with `data_check`)
+
+    data_check : DataCheck or None
+        Settings of the checks of the component data (None: skip them)
+
+    mpi : MpiContext or None
+        Split the iterations between the MPI ranks (ignores `workers` and
+        `cache`). The results are only merged on rank 0.
+
+    file_access : FileAccess or None
+        Settings of the file access of the worker processes (None: the
+        HDF5 defaults)
+
+    sort_batch : int or None
+        Sort the iterations in batches of this size to bound the memory,
+        see iteration_order (None: all at once). The serial, worker and
+        cache paths consume the iterations lazily, but MPI ranks list
+        them all.
+
+    selection : IterationSelection or None
+        Only check these iterations (None: all of them). The selection is
+        reported, and the summary of the active Findings collector is
+        marked as partial if iterations were left out.
+
     Returns
     -------
     An array with 2 elements :
     - The first element is the number of errors encountered
     - The second element is the number of warnings encountered
     """
+    if isinstance(f, IndexNode):
+        h5_file, root_attrs = f.file, f.attrs
+    else:
+        h5_file, root_attrs = f, IndexAttrs(f)
+    if data_check is not None:
+        # the fingerprints of the cache do not cover the data
+        cache = None
 
-    # Find all the iterations
+    # Find all the iterations, in numeric order, and check that they are
+    # indeed encoded as integers
     format_error = False
     try :
-        list_iterations = list(f['/data/'].keys())
-    except KeyError :
+        if selection is None :
+            n_iterations, iterations = iteration_order(h5_file['/data/'],
+                                                       sort_batch)
+        else :
+            n_iterations, selected = selection.select(h5_file['/data/'],
+                                                      sort_batch)
+            iterations = ( iteration for iteration in selected )
+    except (KeyError, ValueError) :
         format_error = True
-    else :
-        # Check that these iterations are indeed encoded as integers
-        for iteration in list_iterations :
-            for character in iteration : # go through the string
-                if not (character in string.digits) :
-                    format_error = True                    
     # Detect any error and interrupt execution if one is found
     if format_error == True :
-        print("Error: it seems that the path of the data within the HDF5 file "
-              "is not of the form '/data/%T/', where %T corresponds to an "
-              "actual integer.")
-        return(np.array([1, 0]))
+        return(report("error", "/data/", "iteration-name",
+            "it seems that the path of the data within the HDF5 file "
+            "is not of the form '/data/%T/', where %T corresponds to an "
+            "actual integer."))
     else :
-        print("Found %d iteration(s)" % len(list_iterations) )
+        report("note", "/data/", "iterations",
+               "Found %d iteration(s)" % n_iterations )
+        if selection is not None :
+            report("note", "/data/", "iterations-selected",
+                   "Selected %d of %d iteration(s) with %s: %s"
+                   %( len(selected), n_iterations, selection.describe(),
+                      describe_iterations(selected) or "none" ))
+            if len(selected) < n_iterations :
+                _findings.partial = "checked %d of %d iterations" \
+                    %( len(selected), n_iterations )
 
     # Initialize the result array
     # First element : number of errors
     # Second element : number of warnings
-    result_array = np.array([ 0, 0]) 
-        
+    result_array = Result()
+
+    if mpi is not None or cache is not None or workers > 1 :
+        # The iterations are checked in worker processes or MPI ranks and/or
+        # taken from the cache: merge their results in order, as a serial
+        # check would
+        n_checked = n_iterations if selection is None else len(selected)
+        if mpi is not None :
+            # every rank needs the index of each iteration
+            results = mpi_iteration_results(mpi, h5_file, list(iterations),
+                                            v, extensionStates, root_attrs,
+                                            data_check)
+        elif cache is not None :
+            results = cached_iteration_results(h5_file, iterations, v,
+                                               extensionStates, workers,
+                                               cache, file_access,
+                                               n_checked)
+        else :
+            results = check_iteration_ranges(h5_file.filename, iterations,
+                                             v, extensionStates, workers,
+                                             data_check, file_access,
+                                             n_checked)
+        try :
+            for iteration, base_result, base_findings, \
+                deep_result, deep_findings in results :
+                _findings.replay(base_findings)
+                result_array += base_result
+                # Go deeper only if there is no error at this point
+                if result_array[0] == 0 :
+                    _findings.replay(deep_findings)
+                    result_array += deep_result
+        finally :
+            # stopped early, e.g. at the error limit: stop the workers now
+            # and remove spilled batches
+            results.close()
+            iterations.close()
+        return(result_array)
+
     # Loop over the iterations and check the meshes and the particles 
-    for iteration in list_iterations :
-        result_array += check_base_path(f, iteration, v, extensionStates)
-        # Go deeper only if there is no error at this point
-        if result_array[0] == 0 :
-            result_array += check_meshes(f, iteration, v, extensionStates)
-            result_array += check_particles(f, iteration, v, extensionStates)
+    try :
+        for iteration in iterations :
+            # Index one iteration at a time: its attributes are evicted as
+            # soon as the loop moves on to the next iteration
+            it = build_index(h5_file, "/data/%s/" % iteration, root_attrs)
+            result_array += check_base_path(it, iteration, v,
+                                            extensionStates)
+            # Go deeper only if there is no error at this point
+            if result_array[0] == 0 :
+                # the data checks are the most expensive ones: run them last
+                deferred = data_check.deferred() \
+                    if data_check is not None else None
+                result_array += check_meshes(it, iteration, v,
+                                             extensionStates, deferred)
+                result_array += check_particles(it, iteration, v,
+                                                extensionStates, deferred)
+                if deferred is not None :
+                    result_array += check_pending_data(deferred)
+    finally :
+        # stopped early, e.g. at the error limit: remove spilled batches
+        iterations.close()
 
     return(result_array)
     
@@ -524,20 +3064,18 @@ def check_base_path(f, iteration, v, extensionStates):
     # Initialize the result array
     # First element : number of errors
     # Second element : number of warnings
-    result_array = np.array([ 0, 0])  
+    result_array = Result()
 
     # Find the path to the data
     base_path = ("/data/%s/" % iteration).encode('ascii')
     bp = f[base_path]
 
     # Check for the attributes of the STANDARD.md
-    result_array += test_attr(bp, v, "required", "time", [np.single, np.double, np.longdouble])
-    result_array += test_attr(bp, v, "required", "dt", [np.single, np.double, np.longdouble])
-    result_array += test_attr(bp, v, "required", "timeUnitSI", np.float64)
+    result_array += check_rules(bp, v, "base_path", extensionStates)
 
     return(result_array)
     
-def check_meshes(f, iteration, v, extensionStates):
+def check_meshes(f, iteration, v, extensionStates, data_check=None):
     """
     Scan all the meshes corresponding to one iteration
 
@@ -554,6 +3092,9 @@ def check_meshes(f, iteration, v, extensionStates):
         
     extensionStates : Dictionary {string:bool}
         Whether an extension is enabled
+
+    data_check : DataCheck or None
+        Settings of the checks of the component data (None: skip them)
     
     Returns
     -------
@@ -564,7 +3105,7 @@ def check_meshes(f, iteration, v, extensionStates):
     # Initialize the result array
     # First element : number of errors
     # Second element : number of warnings
-    result_array = np.array([ 0, 0]) 
+    result_array = Result()
 
     # Find the path to the data
     base_path = "/data/%s/" % iteration
@@ -574,25 +3115,26 @@ def check_meshes(f, iteration, v, extensionStates):
     else:
         meshes_path = None
         if v:
-            print("`meshesPath` attribute is missing in '/' "
-                  "(will not search for mesh records)")
+            report("note", f.name, "meshes-path",
+                   "`meshesPath` attribute is missing in '/' "
+                   "(will not search for mesh records)")
 
     if meshes_path:
         if join_path( base_path, meshes_path) != ( base_path + meshes_path ):
-            print("Error: `basePath`+`meshesPath` seems to be malformed "
-                "(is `basePath` absolute and ends on a `/` ?)")
-            return( np.array([1, 0]) )
+            return( report("error", f.name, "meshes-path",
+                "`basePath`+`meshesPath` seems to be malformed "
+                "(is `basePath` absolute and ends on a `/` ?)") )
         else:
             full_meshes_path = (base_path + meshes_path).encode('ascii')
             # if set, a directory must exist with this name
             if not full_meshes_path in f:
-                print("Error: `basePath`+`meshesPath` are set but path '{0}' "
-                      "does not exist in file!".format(full_meshes_path))
-                return( np.array([1, 0]) )
+                return( report("error", f.name, "meshes-path",
+                    "`basePath`+`meshesPath` are set but path '{0}' "
+                    "does not exist in file!".format(full_meshes_path)) )
             # Find all the meshes
             list_meshes = list(f[full_meshes_path].keys())
-        print( "Iteration %s : found %d meshes"
-            %( iteration, len(list_meshes) ) )
+        report("note", base_path, "meshes", "Iteration %s : found %d meshes"
+               %( iteration, len(list_meshes) ) )
     else:
         list_meshes = []
 
@@ -603,101 +3145,31 @@ def check_meshes(f, iteration, v, extensionStates):
         result_array += test_record(f[full_meshes_path], field_name)
 
         # General attributes of the record
-        result_array += test_attr(field, v, "required",
-                                  "unitDimension", np.ndarray, np.float64)
-        result_array += test_attr(field, v, "required",
-                                  "timeOffset", [np.float32, np.float64])
-        result_array += test_attr(field, v, "required",
-                                  "gridSpacing", np.ndarray, [np.float32, np.float64])
-        result_array += test_attr(field, v, "required",
-                                  "gridGlobalOffset", np.ndarray, [np.float32, np.float64])
-        result_array += test_attr(field, v, "required",
-                                  "gridUnitSI", np.float64)
-        result_array += test_attr(field, v, "required",
-                                  "dataOrder", np.string_)
-        result_array += test_attr(field, v, "required",
-                                  "axisLabels", np.ndarray, np.string_)
-        # Specific check for geometry
-        geometry_test = test_attr(field, v, "required", "geometry", np.string_)
-        result_array += geometry_test
-        # geometryParameters is required when using thetaMode
-        if geometry_test[0] == 0 and field.attrs["geometry"] == b"thetaMode" :
-            result_array += test_attr(field, v, "required",
-                                            "geometryParameters", np.string_)
-        # otherwise it is optional
-        else :
-            result_array += test_attr(field, v, "optional",
-                                            "geometryParameters", np.string_)
-         
+        result_array += check_rules(field, v, "mesh_record", extensionStates)
+
         # Attributes of the record's components
         if is_scalar_record(field) :   # If the record is a scalar field
-            result_array += test_component(field, v)
-            result_array += test_attr(field, v,
-                                "required", "position", np.ndarray, [np.single, np.double, np.longdouble])
+            result_array += test_component(field, v, data_check)
+            result_array += check_rules(field, v, "mesh_component",
+                                        extensionStates)
         else:                          # If the record is a vector field
             # Loop over the components
             for component_name in list(field.keys()) :
                 component = field[component_name]
-                result_array += test_component(component, v)
-                result_array += test_attr(component, v,
-                                "required", "position", np.ndarray, [np.single, np.double, np.longdouble])
-
-    # Check for the attributes of the PIC extension,
-    # if asked to do so by the user 
-    if extensionStates['ED-PIC'] and len(list_meshes) > 0:
-        # Check the attributes associated with the field solver
-        result_array += test_attr(f[full_meshes_path], v, "required",
-                                  "fieldSolver", np.string_)
-        valid, field_solver = get_attr(f[full_meshes_path], "fieldSolver")
-        if (valid == True) and (field_solver in ["other", "GPSTD"]) :
-            result_array += test_attr(f[full_meshes_path], v, "required",
-                                      "fieldSolverParameters", np.string_)
-
-        # Check for the attributes associated with the field boundaries
-        result_array += test_attr(f[full_meshes_path], v, "required",
-                                "fieldBoundary", np.ndarray, np.string_)
-        valid, field_boundary = get_attr(f[full_meshes_path], "fieldBoundary")
-        if (valid == True) and (np.any(field_boundary == b"other")) :
-            result_array += test_attr(f[full_meshes_path], v, "required",
-                        "fieldBoundaryParameters", np.ndarray, np.string_)
-
-        # Check for the attributes associated with the field boundaries
-        result_array += test_attr(f[full_meshes_path], v, "required",
-                                "particleBoundary", np.ndarray, np.string_)
-        valid, particle_boundary = get_attr(f[full_meshes_path], "particleBoundary")
-        if (valid == True) and (np.any(particle_boundary == b"other")) :
-            result_array += test_attr(f[full_meshes_path], v, "required",
-                    "particleBoundaryParameters", np.ndarray, np.string_)
-
-        # Check the attributes associated with the current smoothing
-        result_array += test_attr(f[full_meshes_path], v, "required",
-                                  "currentSmoothing", np.string_)
-        valid, current_smoothing = get_attr(f[full_meshes_path], "currentSmoothing")
-        if (valid == True) and (current_smoothing != b"none") :
-            result_array += test_attr(f[full_meshes_path], v, "required",
-                        "currentSmoothingParameters", np.string_)
-    
-        # Check the attributes associated with the charge conservation
-        result_array += test_attr(f[full_meshes_path], v, "required",
-                                  "chargeCorrection", np.string_)
-        valid, charge_correction = get_attr(f[full_meshes_path], "chargeCorrection")
-        if valid == True and charge_correction != b"none":
-            result_array += test_attr(f[full_meshes_path], v, "required",
-                        "chargeCorrectionParameters", np.string_)
-
-        # Check for the attributes of each record
-        for field_name in list_meshes :
-            field = f[full_meshes_path + field_name.encode('ascii')]
-            result_array + test_attr(field, v, "required",
-                                     "fieldSmoothing", np.string_)
-            valid, field_smoothing = get_attr(field, "fieldSmoothing")
-            if (valid == True) and (field_smoothing != b"none") :
-                result_array += test_attr(field,v, "required",
-                                    "fieldSmoothingParameters", np.string_)
+                result_array += test_component(component, v, data_check)
+                result_array += check_rules(component, v, "mesh_component",
+                                            extensionStates)
+            result_array += test_record_shape(field, v)
+
+    # Check for the attributes of the meshes path, e.g. of the PIC
+    # extension if asked to do so by the user
+    if len(list_meshes) > 0:
+        result_array += check_rules(f[full_meshes_path], v, "meshes",
+                                    extensionStates)
     return(result_array)
 
 
-def check_particles(f, iteration, v, extensionStates) :
+def check_particles(f, iteration, v, extensionStates, data_check=None) :
     """
     Scan all the particle data corresponding to one iteration
 
@@ -714,6 +3186,9 @@ def check_particles(f, iteration, v, extensionStates) :
         
     extensionStates : Dictionary {string:bool}
         Whether an extension is enabled
+
+    data_check : DataCheck or None
+        Settings of the checks of the component data (None: skip them)
     
     Returns
     -------
@@ -724,7 +3199,7 @@ def check_particles(f, iteration, v, extensionStates) :
     # Initialize the result array
     # First element : number of errors
     # Second element : number of warnings
-    result_array = np.array([ 0, 0]) 
+    result_array = Result()
 
     # Find the path to the data
     base_path = "/data/%s/" % iteration
@@ -735,30 +3210,32 @@ def check_particles(f, iteration, v, extensionStates) :
     else:
         particles_path = None
         if v:
-            print("`particlesPath` attribute is missing in '/' "
-                  "(will not search for particle records)")
+            report("note", f.name, "particles-path",
+                   "`particlesPath` attribute is missing in '/' "
+                   "(will not search for particle records)")
 
     if particles_path:
         if join_path( base_path, particles_path) !=  \
             ( base_path + particles_path ) :
-            print("Error: `basePath`+`particlesPath` seems to be malformed "
-                "(is `basePath` absolute and ends on a `/` ?)")
-            return(np.array([1, 0]))
+            return(report("error", f.name, "particles-path",
+                "`basePath`+`particlesPath` seems to be malformed "
+                "(is `basePath` absolute and ends on a `/` ?)"))
         else:
             full_particle_path = (base_path + particles_path).encode('ascii')
             # if set, a directory must exist with this name
             if not full_particle_path in f:
-                print("Error: `basePath`+`particlesPath` are set but path "
-                      "'{0}' does not exist in file!".format(
-                      full_particle_path))
-                return(np.array([1, 0]))
+                return(report("error", f.name, "particles-path",
+                    "`basePath`+`particlesPath` are set but path "
+                    "'{0}' does not exist in file!".format(
+                    full_particle_path)))
             # Find all the particle species
             list_species = list(f[full_particle_path].keys())
     else:
         list_species = []
 
-    print( "Iteration %s : found %d particle species"
-        %( iteration, len(list_species) ) )
+    report("note", base_path, "particles",
+           "Iteration %s : found %d particle species"
+           %( iteration, len(list_species) ) )
 
     # Go through all the particle species
     for species_name in list_species :
@@ -777,13 +3254,14 @@ def check_particles(f, iteration, v, extensionStates) :
             position_dimensions = len(species["position"].keys())
             positionOffset_dimensions = len(species["positionOffset"].keys())
             if position_dimensions != positionOffset_dimensions :
-                print("Error: `position` (ndim=%s) and `positionOffset` " \
-                      "(ndim=%s) do not have the same dimensions in " \
-                      "species `%s`!" \
-                      %(str(position_dimensions), \
+                result_array += report("error", species.name,
+                      "position-dimensions",
+                      "`position` (ndim=%s) and `positionOffset` "
+                      "(ndim=%s) do not have the same dimensions in "
+                      "species `%s`!"
+                      %(str(position_dimensions),
                         str(positionOffset_dimensions),
                         species.name) )
-                result_array += np.array([ 1, 0])
 
         # Check the particlePatches record of the particles
         patch_test = test_key(species, v, "recommended", "particlePatches")
@@ -808,9 +3286,14 @@ def check_particles(f, iteration, v, extensionStates) :
                                               component_name)
                     if result_array[0] == 0 :
                         dset_offset = offset[component_name]
-                        result_array += test_component(dset_offset, v)
+                        result_array += test_component(dset_offset, v,
+                                                         data_check)
                         dset_extent = extent[component_name]
-                        result_array += test_component(dset_extent, v)
+                        result_array += test_component(dset_extent, v,
+                                                         data_check)
+                if result_array[0] == 0 :
+                    result_array += test_particle_patches(species, v,
+                                                          data_check)
 
         # Check the records required by the PIC extension
         if extensionStates['ED-PIC'] :
@@ -822,74 +3305,58 @@ def check_particles(f, iteration, v, extensionStates) :
             result_array += test_key(species, v, "optional", "protonNumber")
             result_array += test_key(species, v, "optional", "neutronNumber")
 
-        # Check the attributes associated with the PIC extension
-        if extensionStates['ED-PIC'] :
-            result_array += test_attr(species, v, "required",
-                                      "particleShape", [np.single, np.double, np.longdouble])
-            result_array += test_attr(species, v, "required",
-                                      "currentDeposition", np.string_)
-            result_array += test_attr(species, v, "required",
-                                      "particlePush", np.string_)
-            result_array += test_attr(species, v, "required",
-                                      "particleInterpolation", np.string_)
-
-            # Check for the attributes associated with the particle smoothing
-            result_array += test_attr(species, v, "required",
-                                      "particleSmoothing", np.string_)
-            valid, particle_smoothing = get_attr(species, "particleSmoothing")
-            if valid == True and particle_smoothing != b"none":
-                result_array += test_attr(species, v, "required",
-                                "particleSmoothingParameters", np.string_)
+        # Check the attributes of the species, e.g. of the PIC extension
+        result_array += check_rules(species, v, "species", extensionStates)
+
+        # All records hold the same number of particles
+        result_array += test_species_shapes(species, v)
 
         # Check attributes of each record of the particle
         for record in list(species.keys()) :
             # all records (but particlePatches) require units
             if record != "particlePatches":
-                result_array += test_attr(species[record], v,
-                        "required", "unitDimension", np.ndarray, np.float64)
-                result_array += test_attr(species[record], v, "required",
-                                          "timeOffset", [np.single, np.double, np.longdouble])
-                if extensionStates['ED-PIC'] :
-                    result_array += test_attr(species[record], v, "required",
-                                              "weightingPower", np.float64)
-                    result_array += test_attr(species[record], v, "required",
-                                              "macroWeighted", np.uint32)
+                result_array += check_rules(species[record], v,
+                                            "particle_record", extensionStates)
                 # Attributes of the components
                 if is_scalar_record( species[record] ) : # Scalar record
                     dset = species[record]
-                    result_array += test_component(dset, v)
+                    result_array += test_component(dset, v, data_check)
                 else : # Vector record
                     # Loop over the components
                     for component_name in list(species[record].keys()):
                         dset = species[ join_path(record, component_name) ]
-                        result_array += test_component(dset, v)
+                        result_array += test_component(dset, v, data_check)
+                    result_array += test_record_shape(species[record], v)
 
             # weighting's attributes are fixed
             if extensionStates['ED-PIC'] and record == "weighting" and result_array[0] == 0:
                 valid, unitSI = get_attr(species[record], "unitSI")
                 if valid:
                     if not np.isclose(unitSI, 1.0):
-                        print("Error: `unitSI` attribute of `weighting` "
+                        result_array += report("error", species[record].name,
+                              "weighting",
+                              "`unitSI` attribute of `weighting` "
                               "record must be `1.0` in species `{0}`! "
                               "Its value is: {1}"
                               .format(species.name, unitSI))
-                        result_array += np.array([1, 0])
 
                 valid, weightingPower = get_attr(species[record], "weightingPower")
                 if not valid or not np.isclose(weightingPower, 1.0):
-                    print("Error: `weightingPower` attribute of `weighting` "
+                    result_array += report("error", species[record].name,
+                          "weighting",
+                          "`weightingPower` attribute of `weighting` "
                           "record must be `1.0` in species `{0}`! "
                           "Its value is: {1}"
                           .format(species.name, weightingPower))
-                    result_array += np.array([1, 0])
 
                 valid, macroWeighted = get_attr(species[record], "macroWeighted")
                 if not valid or not macroWeighted == 1:
-                    print("Error: `macroWeighted` attribute of `weighting` "
+                    result_array += report("error", species[record].name,
+                          "weighting",
+                          "`macroWeighted` attribute of `weighting` "
                           "record must be `1` in species `{0}`! "
                           "Its value is: {1}"
                           .format(species.name, macroWeighted))
-                    result_array += np.array([1, 0])
 
                 valid, unitDimension = get_attr(species[record], "unitDimension")
                 if valid:
@@ -898,44 +3365,749 @@ def check_particles(f, iteration, v, extensionStates) :
                     valid = valid and \
                             np.allclose(unitDimension, np.zeros((7, )))
                 if not valid:
-                    print("Error: `unitDimension` attribute of `weighting` "
+                    result_array += report("error", species[record].name,
+                          "weighting",
+                          "`unitDimension` attribute of `weighting` "
                           "record must be `[0, 0, 0, 0, 0, 0, 0]` in species `{0}`! "
                           "Its value is: {1}"
                           .format(species.name, unitDimension))
-                    result_array += np.array([1, 0])
 
     return(result_array)
 
 
-def check_file(file_name, verbose=False, force_extension_pic=False):
-    f = open_file(file_name)
+def open_file_swmr(file_name, file_access=None):
+    """
+    Open a file for reading while another process may still write to it
+
+    Uses the HDF5 single-writer/multiple-reader (SWMR) read mode if the
+    file supports it and a plain read-only handle otherwise.
+    """
+    file_access = file_access or FileAccess()
+    try:
+        return file_access.open(file_name, swmr=True)
+    except (IOError, OSError, ValueError):
+        return file_access.open(file_name)
+
+
+def check_root(f, v, force_extension_pic=False):
+    """
+    Check the root attributes and extensions of a file and keep the
+    findings instead of printing them
+
+    Parameters
+    ----------
+    f : an h5py.File object
+        The HDF5 file to check
+
+    v : bool
+        Verbose option
+
+    force_extension_pic : bool
+        Whether the ED-PIC extension is required
+
+    Returns
+    -------
+    A tuple (Result, list of Finding, extensionStates)
+    """
+    active = _findings
+    findings = Findings(echo=False, keep=True)
+    set_findings(findings)
+    try:
+        root = build_index(f, None)
+        result_array = check_root_attr(root, v)
+        extensionStates = get_extensions(root, v)
+        if force_extension_pic and not extensionStates["ED-PIC"]:
+            result_array += report("error", "/", "extension",
+                                   "Extension `ED-PIC` not found in file!")
+    finally:
+        set_findings(active)
+    return (result_array, findings.findings, extensionStates)
+
+
+def follow_file(file_name, verbose=False, force_extension_pic=False,
+                poll_interval=1.0, idle_timeout=None, data_check=None,
+                file_access=None):
+    """
+    Check the iterations of a file while a running simulation writes them
+
+    The file is opened in SWMR read mode at every poll, since groups that
+    are created after a reader opened the file only become visible after
+    reopening it. Each new iteration in `/data/` is checked exactly once
+    and its findings are reported right away, with the latency since it
+    appeared. An iteration with errors (or that cannot be read yet) is
+    retried at the next poll as long as it is the newest one, since it
+    might still be written; once a newer iteration appears or the file is
+    idle, it is reported as it is. Contrary to check_iterations, an error
+    in one iteration does not skip the meshes and particles of the later
+    ones.
+
+    Likewise, the root attributes are checked again at each poll until
+    they pass, since the writer might still add them: their findings are
+    reported once they pass, or as they are in the last pass after the
+    file was idle (or when the follow mode is interrupted). Until then,
+    the iterations are checked with the extensions found at the latest
+    poll.
+
+    Parameters
+    ----------
+    file_name : string
+        The HDF5 file to follow
+
+    verbose : bool
+        Verbose option
+
+    force_extension_pic : bool
+        Whether the ED-PIC extension is required
+
+    poll_interval : float
+        Seconds between two polls of the file
+
+    idle_timeout : float or None
+        Stop after no new iteration appeared for this many seconds
+        (None: follow until interrupted)
+
+    data_check : DataCheck or None
+        Settings of the checks of the component data (None: skip them)
+
+    file_access : FileAccess or None
+        Settings of the file access (None: the HDF5 defaults)
+
+    Returns
+    -------
+    A Result, which can be used like an array with 2 elements :
+    - The first element is the number of errors encountered
+    - The second element is the number of warnings encountered
+    """
+    result_array = Result()
+    extensionStates = None
+    # the latest findings of the root attributes, until they are reported
+    root_pending = (Result(), [])
+    checked = set()
+    first_seen = {}
+    last_new = time.time()
+    final = False
+    report("note", "/", "follow", "Following '%s' (polling every %g s)"
+           % (file_name, poll_interval))
+    try:
+        while True:
+            try:
+                f = open_file_swmr(file_name, file_access)
+            except (IOError, OSError):
+                # not created yet or locked by the writer
+                f = None
+            if f is not None:
+                try:
+                    if root_pending is not None:
+                        try:
+                            root_result, root_findings, extensionStates = \
+                                check_root(f, verbose, force_extension_pic)
+                        except (KeyError, IOError, OSError) as e:
+                            root_result = Result(1, 0)
+                            root_findings = [ Finding("error", "/",
+                                "root-read", "The root attributes can not "
+                                "be read: %s" % e) ]
+                        root_pending = (root_result, root_findings)
+                        if root_result[0] == 0 or final:
+                            _findings.replay(root_findings)
+                            result_array += root_result
+                            _findings.flush()
+                            root_pending = None
+                    root_attrs = IndexAttrs(f)
+                    # none while the root can not be read yet
+                    names = list(f["/data/"].keys()) \
+                        if "/data/" in f and extensionStates is not None \
+                        else []
+                    new = []
+                    for name in names:
+                        if name in checked:
+                            continue
+                        if not iteration_name.match(name):
+                            result_array += report("error", "/data/",
+                                "iteration-name",
+                                "it seems that the path of the data within "
+                                "the HDF5 file is not of the form "
+                                "'/data/%%T/', where %%T corresponds to an "
+                                "actual integer: '%s'" % name)
+                            checked.add(name)
+                            continue
+                        new.append(name)
+                        if name not in first_seen:
+                            first_seen[name] = time.time()
+                            last_new = first_seen[name]
+                    new.sort(key=int)
 
-    # root attributes at "/"
-    result_array = np.array([0, 0])
-    result_array += check_root_attr(f, verbose)
+                    for iteration in new:
+                        # a newer iteration means the writer moved on
+                        complete = final or iteration != new[-1]
+                        try:
+                            _, base_result, base_findings, deep_result, \
+                                deep_findings = check_iteration(
+                                    f, iteration, verbose, extensionStates,
+                                    root_attrs, data_check)
+                        except (KeyError, IOError, OSError) as e:
+                            if not complete:
+                                continue
+                            base_result = Result()
+                            base_findings = [ Finding("error",
+                                "/data/%s/" % iteration, "iteration-read",
+                                "Iteration %s can not be read: %s"
+                                % (iteration, e)) ]
+                            deep_result, deep_findings = Result(), []
+                        if not complete and \
+                           (base_result[0] or deep_result[0]):
+                            continue
 
-    extensionStates = get_extensions(f, verbose)
-    if force_extension_pic and not extensionStates["ED-PIC"] :
-        print("Error: Extension `ED-PIC` not found in file!")
-        result_array += np.array([1, 0])
+                        _findings.replay(base_findings)
+                        result_array += base_result
+                        # Go deeper only if there is no error at this point
+                        if base_result[0] == 0:
+                            _findings.replay(deep_findings)
+                            result_array += deep_result
+                        report("note", "/data/%s/" % iteration, "latency",
+                               "Iteration %s : checked %.3f s after it "
+                               "appeared" % (iteration,
+                                             time.time() - first_seen[iteration]))
+                        _findings.flush()
+                        checked.add(iteration)
+                        del first_seen[iteration]
+                finally:
+                    f.close()
 
-    # Go through all the iterations, checking both the particles
-    # and the meshes
-    result_array += check_iterations(f, verbose, extensionStates)
+            if final:
+                break
+            if idle_timeout is not None and \
+               time.time() - last_new >= idle_timeout:
+                # one last pass that reports pending iterations as they are
+                final = True
+                continue
+            time.sleep(poll_interval)
+    except KeyboardInterrupt:
+        if root_pending is not None:
+            _findings.replay(root_pending[1])
+            result_array += root_pending[0]
+        report("note", "/", "follow", "Stopped following '%s'" % file_name)
 
     return result_array
 
 
+def check_file(file_name, verbose=False, force_extension_pic=False,
+               workers=1, findings=None, cache=False, follow=False,
+               poll_interval=1.0, idle_timeout=None, data_check=False,
+               max_errors=None, mpi=None, file_access=None, sort_batch=None,
+               iterations=None, last=None, sample=None):
+    """
+    Check an HDF5 file for compliance with the openPMD standard
+
+    Parameters
+    ----------
+    file_name : string
+        The HDF5 file to check
+
+    verbose : bool
+        Verbose option
+
+    force_extension_pic : bool
+        Whether the ED-PIC extension is required
+
+    workers : int
+        Number of worker processes that check the iterations
+
+    findings : Findings or None
+        The collector for the findings of this file (default: print them)
+
+    cache : bool or ResultCache
+        Reuse the results of the iterations whose metadata did not change
+        since the last check of this file (True: use the default
+        ResultCache). Ignored with `data_check`: the cache does not cover
+        the data.
+
+    follow : bool
+        Check the iterations while a running simulation writes them, see
+        follow_file (ignores `workers` and `cache`)
+
+    poll_interval, idle_timeout : float
+        Options of the follow mode, see follow_file
+
+    data_check : bool or DataCheck
+        Also check that the data of all record components is finite
+        (True: use the default DataCheck settings)
+
+    max_errors : int or None
+        Stop the checks after this many errors (None: check everything).
+        The report of the active Findings collector is then marked as
+        truncated.
+
+    mpi : MpiContext or None
+        Split the iterations between the MPI ranks, see check_iterations
+        (ignores `workers`, `cache` and `follow`). Only the Result of rank
+        0 covers all iterations.
+
+    file_access : FileAccess or None
+        Settings of the HDF5 file access property list of all opens of the
+        file, e.g. a larger metadata cache (None: the HDF5 defaults)
+
+    sort_batch : int or None
+        Sort the iterations in batches of this size, see check_iterations
+
+    iterations : slice or None
+        Only check the iterations in this range of iteration numbers,
+        e.g. slice(0, 1000, 100) (None: all), see IterationSelection
+
+    last, sample : int or None
+        Of these, only check the last `last` iterations, and of these
+        `sample` iterations evenly spread between the first and the last
+        one (None: all). Ignored in follow mode.
+
+    Returns
+    -------
+    A Result, which can be used like an array with 2 elements :
+    - The first element is the number of errors encountered
+    - The second element is the number of warnings encountered
+    """
+    if data_check is True:
+        data_check = DataCheck()
+    elif data_check is False:
+        data_check = None
+    if follow and mpi is None:
+        if findings is not None:
+            findings = set_findings(findings)
+        budget = ErrorBudget(max_errors)
+        try:
+            with budget:
+                result_array = follow_file(file_name, verbose,
+                                           force_extension_pic,
+                                           poll_interval, idle_timeout,
+                                           data_check, file_access)
+        finally:
+            if findings is not None:
+                set_findings(findings)
+        return budget.result() if budget.exhausted else result_array
+
+    selection = None
+    if iterations is not None or last is not None or sample is not None:
+        if iterations is None:
+            iterations = slice(None)
+        selection = IterationSelection(
+            iterations.start or 0, iterations.stop,
+            1 if iterations.step is None else iterations.step, last, sample)
+
+    h5_file = open_file(file_name, file_access)
+    if cache is True and mpi is None:
+        cache = ResultCache()
+    if cache is False or mpi is not None or data_check is not None:
+        cache = None
+    if findings is not None:
+        findings = set_findings(findings)
+    # all checks below run on in-memory indexes: the root attributes here
+    # and then one iteration at a time
+    budget = ErrorBudget(max_errors)
+    try:
+        with budget:
+            f = build_index(h5_file, None)
+            if data_check is not None and \
+               data_check.sample_bytes is not None :
+                report("note", "/", "data-coverage",
+                       "Sampling the data for a budget of %d of %d bytes "
+                       "(seed %d): %.3g%% of the stored bytes of each "
+                       "dataset, in random chunks"
+                       %( data_check.sample_bytes,
+                          os.path.getsize(file_name), data_check.seed,
+                          100. * data_check.sample_fraction(file_name) ))
+
+            # root attributes at "/"
+            result_array = Result()
+            result_array += check_root_attr(f, verbose)
+
+            extensionStates = get_extensions(f, verbose)
+            if force_extension_pic and not extensionStates["ED-PIC"] :
+                result_array += report("error", f.name, "extension",
+                                       "Extension `ED-PIC` not found in file!")
+
+            # Go through all the iterations, checking both the particles
+            # and the meshes
+            result_array += check_iterations(f, verbose, extensionStates,
+                                             workers, cache, data_check, mpi,
+                                             file_access, sort_batch,
+                                             selection)
+    finally:
+        h5_file.close()
+        if findings is not None:
+            set_findings(findings)
+
+    return budget.result() if budget.exhausted else result_array
+
+
+def check_file_captured(file_name, verbose=False, force_extension_pic=False,
+                        cache=False, data_check=False, file_access=None):
+    """
+    Check one file and keep its findings instead of printing them
+
+    Returns
+    -------
+    A tuple (Result, list of Finding) for check_file
+    """
+    findings = Findings(echo=False, keep=True)
+    result_array = check_file(file_name, verbose, force_extension_pic,
+                              findings=findings, cache=cache,
+                              data_check=data_check,
+                              file_access=file_access)
+    return(result_array, findings.findings)
+
+
+def _check_file_captured_star(task):
+    """
+    check_file_captured for Pool.imap, which passes one argument: a tuple
+    (whether to profile the task, arguments), see _profiled_task
+    """
+    profiled, args = task
+    return _profiled_task(check_file_captured, args, profiled)
+
+
+def check_series(series_name, verbose=False, force_extension_pic=False,
+                 workers=1, cache=False, data_check=False, max_errors=None,
+                 mpi=None, file_access=None):
+    """
+    Check all files of a fileBased iteration series
+
+    The files are checked in a pool of worker processes. The report of each
+    file is printed in the order of the iterations, followed by the errors
+    and warnings found in this file.
+
+    Parameters
+    ----------
+    series_name : string
+        A directory or a file name pattern with `%T`, see expand_series
+
+    verbose : bool
+        Verbose option
+
+    force_extension_pic : bool
+        Whether the ED-PIC extension is required in all files
+
+    workers : int
+        Number of worker processes that check the files
+
+    cache : bool or ResultCache
+        Reuse the results of unchanged iterations, see check_file
+
+    data_check : bool or DataCheck
+        Also check the data of all record components, see check_file
+
+    max_errors : int or None
+        Stop the checks after this many errors in all files, see check_file
+
+    mpi : MpiContext or None
+        Split the files between the MPI ranks (ignores `workers`). The
+        results are only merged on rank 0.
+
+    file_access : FileAccess or None
+        Settings of the file access, see check_file
+
+    Returns
+    -------
+    An array with 2 elements :
+    - The first element is the number of errors encountered in all files
+    - The second element is the number of warnings encountered in all files
+    """
+    budget = ErrorBudget(max_errors)
+    with budget:
+        result_array = _check_series_files(series_name, verbose,
+                                           force_extension_pic, workers,
+                                           cache, data_check, mpi,
+                                           file_access)
+    return(budget.result() if budget.exhausted else result_array)
+
+
+def _check_series_files(series_name, verbose, force_extension_pic, workers,
+                        cache, data_check, mpi=None, file_access=None):
+    """ check_series without an error limit """
+    result_array = Result()
+    file_names = []
+    for file_name in expand_series(series_name):
+        if h5.is_hdf5(file_name):
+            file_names.append(file_name)
+        else:
+            result_array += report("error", file_name, "file",
+                "File '%s' of the series is not an HDF5 file!" % file_name)
+    if len(file_names) == 0:
+        return(result_array + report("error", series_name, "file",
+            "Found no files for the series '%s'!" % series_name))
+    report("note", series_name, "files", "Found %d file(s) in series '%s'"
+           % (len(file_names), series_name))
+
+    tasks = [ (file_name, verbose, force_extension_pic, cache, data_check,
+               file_access)
+              for file_name in file_names ]
+    if mpi is not None:
+        pool = None
+        checked = [ (index, _check_file_captured_star((False, tasks[index])))
+                    for index in mpi.tasks(len(tasks)) ]
+        results = mpi.gather_ordered(checked)
+    elif workers > 1:
+        sys.stdout.flush()
+        pool = multiprocessing.Pool(min(workers, len(tasks)))
+        results = pool.imap(_check_file_captured_star,
+                            [ (_profile is not None, task) for task in tasks ])
+    else:
+        pool = None
+        results = map(_check_file_captured_star,
+                      [ (False, task) for task in tasks ])
+    completed = False
+    try:
+        for file_name, ((file_result, findings), stats) in \
+                zip(file_names, results):
+            merge_profile(stats)
+            _findings.begin_file(file_name)
+            _findings.replay(findings)
+            _findings.end_file(file_name, file_result)
+            result_array += file_result
+        completed = True
+    finally:
+        if pool is not None:
+            # stopped early, e.g. at the error limit: drop pending files
+            if completed:
+                pool.close()
+            else:
+                pool.terminate()
+            pool.join()
+
+    return(result_array)
+
+
+def shard_key(file_name, root=None):
+    """
+    The path of `file_name` relative to the directory `root` (None: the
+    current directory), with symbolic links resolved and "/" separators
+
+    Different spellings of the same file, e.g. `./a.h5` and `a.h5` or an
+    absolute path and a relative one, have the same key.
+    """
+    path = os.path.realpath(file_name)
+    try:
+        path = os.path.relpath(path, os.path.realpath(root or os.curdir))
+    except ValueError:
+        # e.g. on another drive than `root` on Windows
+        pass
+    return path.replace(os.sep, "/")
+
+
+def in_shard(file_name, shard, root=None):
+    """
+    Whether `file_name` belongs to the shard `(i, N)`
+
+    The partition only depends on the path of the file relative to `root`,
+    see shard_key, so that several nodes can split the same archive
+    without coordination, whatever order they list the files in and
+    wherever the archive is mounted on them.
+    """
+    i, n = shard
+    return zlib.crc32(shard_key(file_name, root).encode("utf-8")) % n == i
+
+
+def _check_batch_file(args):
+    """
+    Check one file of a batch in a worker process
+
+    Unreadable or malformed files are reported as errors instead of
+    stopping the batch.
+    """
+    file_name, verbose, force_extension_pic, data_check, file_access = args
+    if not (os.path.isfile(file_name) and h5.is_hdf5(file_name)):
+        return(file_name, Result(1, 0), [ Finding("error", file_name, "file",
+               "File '%s' is not an HDF5 file!" % file_name) ])
+    try:
+        result_array, findings = check_file_captured(file_name, verbose,
+                                                     force_extension_pic,
+                                                     data_check=data_check,
+                                                     file_access=file_access)
+    except Exception as e:
+        return(file_name, Result(1, 0), [ Finding("error", file_name, "file",
+               "Checking file '%s' failed: %s" % (file_name, e)) ])
+    return(file_name, result_array, findings)
+
+
+def check_batch(file_names, verbose=False, force_extension_pic=False,
+                workers=None, shard=None, details=False, data_check=False,
+                max_errors=None, file_access=None, roots=None):
+    """
+    Check many files in one long-lived process
+
+    The files are checked in a bounded pool of worker processes, which pay
+    the interpreter start-up and imports only once. One summary line is
+    printed per file, in input order, followed by an aggregated summary.
+
+    Parameters
+    ----------
+    file_names : list of strings
+        The files to check
+
+    verbose : bool
+        Verbose option
+
+    force_extension_pic : bool
+        Whether the ED-PIC extension is required in all files
+
+    workers : int or None
+        Number of worker processes (None: one per core)
+
+    shard : tuple (i, N) or None
+        Only check the files of the i-th out of N deterministic shards,
+        see in_shard
+
+    details : bool
+        Whether to print the full report of files with errors or warnings
+
+    data_check : bool or DataCheck
+        Also check the data of all record components, see check_file
+
+    max_errors : int or None
+        Stop after the first file with which the errors of all files reach
+        this number (None: check all files)
+
+    file_access : FileAccess or None
+        Settings of the file access, see check_file
+
+    roots : list of strings or None
+        For each file, the directory that it is sharded relative to
+        (None: the current directory for all files)
+
+    Returns
+    -------
+    An array with 2 elements :
+    - The first element is the number of errors encountered in all files
+    - The second element is the number of warnings encountered in all files
+    """
+    if shard is not None:
+        if roots is None:
+            roots = [ None ] * len(file_names)
+        file_names = [ f for f, root in zip(file_names, roots)
+                       if in_shard(f, shard, root) ]
+    if workers is None:
+        workers = multiprocessing.cpu_count()
+
+    result_array = Result()
+    n_files_with_errors = 0
+    n_files_with_warnings = 0
+    tasks = ( (file_name, verbose, force_extension_pic, data_check,
+               file_access)
+              for file_name in file_names )
+    if workers > 1 and len(file_names) > 1:
+        sys.stdout.flush()
+        # recycle workers from time to time to bound their memory
+        pool = multiprocessing.Pool(min(workers, len(file_names)),
+                                    maxtasksperchild=1000)
+        results = pool.imap(_check_batch_file, tasks, chunksize=4)
+    else:
+        pool = None
+        results = map(_check_batch_file, tasks)
+    n_files = 0
+    completed = False
+    try:
+        for file_name, file_result, findings in results:
+            if details and (file_result[0] or file_result[1]):
+                _findings.begin_file(file_name)
+                _findings.replay(findings)
+            _findings.end_file(file_name, file_result)
+            result_array += file_result
+            n_files += 1
+            if file_result[0]:
+                n_files_with_errors += 1
+            elif file_result[1]:
+                n_files_with_warnings += 1
+            if max_errors is not None and result_array[0] >= max_errors:
+                _findings.truncated = True
+                break
+        else:
+            completed = True
+    finally:
+        if pool is not None:
+            # stopped early at the error limit: drop pending files
+            if completed:
+                pool.close()
+            else:
+                pool.terminate()
+            pool.join()
+
+    report("note", "", "files",
+           "Checked %d file(s): %d with errors, %d with warnings only."
+           %( n_files, n_files_with_errors, n_files_with_warnings))
+    return(result_array)
+
+
+def batch_main():
+    file_names, verbose, force_extension_pic, options = \
+        parse_batch_cmd(sys.argv[1:])
+    set_output_format(options.pop("output_format", "text"))
+    result_array = check_batch(file_names, verbose, force_extension_pic,
+                               **options)
+
+    # results
+    _findings.summary(result_array)
+
+    # return code: non-zero is Unix-style for errors occurred
+    sys.exit(min(int(result_array[0]), 255))
+
+
 def main():
-    file_name, verbose, force_extension_pic = parse_cmd(sys.argv[1:])
-    result_array = check_file(file_name, verbose, force_extension_pic)
+    file_name, verbose, force_extension_pic, options = parse_cmd(sys.argv[1:])
+    set_output_format(options.pop("output_format", "text"), file_name)
+    profile_json = options.pop("profile_json", None)
+    mpi = options.pop("mpi", None)
+    if mpi is not None:
+        mpi = mpi_context(mpi)
+    if mpi is not None:
+        options["mpi"] = mpi
+        if mpi.rank != 0:
+            # rank 0 reports the findings of all ranks
+            set_findings(Findings(echo=False))
+    if options.pop("profile", False):
+        set_profile(Profile())
+    try:
+        if is_series(file_name) and not options.get("follow"):
+            if "iterations" in options or "last" in options or \
+               "sample" in options:
+                print("Options --iterations, --last and --sample select "
+                      "iterations of one file, not of a series!")
+                sys.exit(2)
+            # each file of a series holds few iterations
+            options.pop("sort_batch", None)
+            result_array = check_series(file_name, verbose,
+                                        force_extension_pic, **options)
+        else:
+            result_array = check_file(file_name, verbose,
+                                      force_extension_pic, **options)
+    except Exception:
+        if mpi is not None and mpi.size > 1:
+            # do not leave the other ranks waiting for this one
+            import traceback
+            traceback.print_exc()
+            mpi.abort()
+        raise
+    finally:
+        profile = set_profile(None)
+
+    if profile is not None and mpi is not None:
+        # the profile of all ranks, on rank 0
+        all_stats = mpi.comm.gather(profile.stats, root=0)
+        if mpi.rank == 0:
+            for stats in all_stats[1:]:
+                profile.merge(stats)
+        else:
+            profile = None
 
     # results
-    print("Result: %d Errors and %d Warnings."
-          %( result_array[0], result_array[1]))
+    _findings.summary(result_array)
+    if profile is not None:
+        profile.print_table()
+        if profile_json is not None:
+            profile.write_json(profile_json)
 
     # return code: non-zero is Unix-style for errors occurred
-    sys.exit(int(result_array[0]))
+    # (capped, since exit codes are taken modulo 256)
+    errors = int(result_array[0])
+    if mpi is not None:
+        errors = mpi.bcast(errors)
+    sys.exit(min(errors, 255))
 
 
 if __name__ == "__main__":
@@ -0,0 +1,311 @@
+#!/usr/bin/env python
+#
+# Copyright (c) 2015-2017 Axel Huebl, Remi Lehe
+#
+# Permission to use, copy, modify, and/or distribute this software for any
+# purpose with or without fee is hereby granted, provided that the above
+# copyright notice and this permission notice appear in all copies.
+#
+# THE SOFTWARE IS PROVIDED "AS IS" AND THE AUTHOR DISCLAIMS ALL WARRANTIES
+# WITH REGARD TO THIS SOFTWARE INCLUDING ALL IMPLIED WARRANTIES OF
+# MERCHANTABILITY AND FITNESS. IN NO EVENT SHALL THE AUTHOR BE LIABLE FOR
+# ANY SPECIAL, DIRECT, INDIRECT, OR CONSEQUENTIAL DAMAGES OR ANY DAMAGES
+# WHATSOEVER RESULTING FROM LOSS OF USE, DATA OR PROFITS, WHETHER IN AN
+# ACTION OF CONTRACT, NEGLIGENCE OR OTHER TORTIOUS ACTION, ARISING OUT OF
+# OR IN CONNECTION WITH THE USE OR PERFORMANCE OF THIS SOFTWARE.
+#
+"""
+Thin client of the validation daemon (see daemon_h5)
+
+Sends one check request over the Unix socket of the daemon and prints the
+report like openPMD_check_h5. Only the standard library is imported, so
+that a check costs little more than the start of the interpreter. If the
+daemon cannot be reached or does not answer the request, the file is
+checked in the client process instead, so that the exit status is always
+the number of errors, as for openPMD_check_h5.
+
+The protocol is one JSON object per line in each direction. A request
+
+    {"command": "check", "file": <absolute path>,
+     "options": {"verbose": ..., "EDPIC": ..., "check_data": ...,
+                 "sample_bytes": ..., "seed": ..., "max_errors": ...,
+                 "cache": ...}}
+
+is answered by
+
+    {"type": "result", "file": ..., "errors": ..., "warnings": ...,
+     "truncated": ..., "partial": ...,
+     "findings": [{"severity": ..., "path": ..., "rule": ...,
+                   "message": ..., "text": ...}, ...]}
+
+or by {"type": "error", "message": ...}. The commands "ping" and
+"shutdown" take no other fields.
+
+Only the user who runs the daemon may answer the requests of its client:
+the client refuses sockets of other users, and sockets in directories
+where other users could replace them, see check_socket.
+"""
+
+import getopt
+import json
+import os
+import socket
+import stat
+import sys
+import tempfile
+
+from .options_h5 import parse_bytes
+
+
+def default_socket_path():
+    """
+    The per-user socket of the daemon: in $XDG_RUNTIME_DIR, or else in a
+    private directory in the temporary directory, see private_directory
+    """
+    directory = os.environ.get("XDG_RUNTIME_DIR")
+    if directory:
+        return os.path.join(directory,
+                            "openpmd_validator-%d.sock" % os.getuid())
+    return os.path.join(tempfile.gettempdir(),
+                        "openpmd_validator-%d" % os.getuid(), "daemon.sock")
+
+
+def check_directory(directory):
+    """
+    Check that other users cannot add or replace files in `directory`:
+    it belongs to the current user or root, and it is not writable by
+    others unless it is sticky (like /tmp)
+
+    Raises
+    ------
+    IOError : if they can
+    """
+    info = os.stat(directory)
+    if info.st_uid not in (0, os.getuid()) or \
+       (info.st_mode & (stat.S_IWGRP | stat.S_IWOTH) and
+        not info.st_mode & stat.S_ISVTX):
+        raise IOError("Other users can write to the directory '%s'"
+                      % directory)
+
+
+def private_directory(directory):
+    """
+    Create the directory `directory` with access for the current user
+    only, or check that it exists with these permissions
+
+    Raises
+    ------
+    IOError : if it belongs to another user or others can access it
+    """
+    try:
+        os.mkdir(directory, 0o700)
+    except OSError:
+        if not os.path.isdir(directory):
+            raise
+    info = os.lstat(directory)
+    if not stat.S_ISDIR(info.st_mode) or info.st_uid != os.getuid() or \
+       info.st_mode & 0o077:
+        raise IOError("The directory '%s' is not private to the current "
+                      "user" % directory)
+
+
+def check_socket(socket_path):
+    """
+    Check that the socket `socket_path` belongs to the current user and
+    that other users cannot replace it, see check_directory
+
+    Raises
+    ------
+    IOError or OSError : if it does not exist or is not safe to use
+    """
+    info = os.lstat(socket_path)
+    if not stat.S_ISSOCK(info.st_mode) or info.st_uid != os.getuid():
+        raise IOError("'%s' is not a socket of the current user"
+                      % socket_path)
+    check_directory(os.path.dirname(os.path.abspath(socket_path)))
+
+
+def send_request(message, socket_path=None, timeout=None):
+    """
+    Send one request (a dict) to the daemon and wait for its response
+
+    Returns
+    -------
+    The response, a dict
+    """
+    socket_path = socket_path or default_socket_path()
+    check_socket(socket_path)
+    client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    client.settimeout(timeout)
+    try:
+        client.connect(socket_path)
+        client.sendall((json.dumps(message) + "\n").encode("utf-8"))
+        stream = client.makefile("rb")
+        try:
+            line = stream.readline()
+        finally:
+            stream.close()
+    finally:
+        client.close()
+    if not line:
+        raise IOError("The daemon closed the connection")
+    return json.loads(line.decode("utf-8"))
+
+
+def help():
+    """ Print usage information for this file """
+    print('This is the client of the openPMD check daemon for HDF5 files.\n')
+    print('Usage:\n  openPMD_check_h5_client -i <fileName> [-v] [--EDPIC]')
+    print('\n  -i, --file <fileName>  the HDF5 file to check')
+    print('  --socket <path>  the socket of the daemon (default: %s)'
+          % default_socket_path())
+    print('  --format <text|jsonl>  report as text (default) or as one JSON '
+          'object per line')
+    print('  --cache         reuse the results of iterations whose metadata '
+          'did not change\n                  since the last check (not '
+          'with --check-data)')
+    print('  --check-data    also check the data of all record components')
+    print('  --sample-bytes <N>  check a random sample of the data of at most '
+          'N bytes,\n                  implies --check-data')
+    print('  --seed <N>      seed of the random sample (default: 0)')
+    print('  --max-errors <N>  stop the checks after N errors')
+    print('  --fail-fast     stop the checks at the first error')
+    print('  --ping          check that the daemon is running')
+    print('  --shutdown      stop the daemon')
+    print('\nIf the daemon cannot check the file, it is checked in this '
+          'process instead.\nThe exit status is the number of errors (at '
+          'most 255), or 1 if --ping or\n--shutdown get no answer.')
+    sys.exit()
+
+
+def parse_cmd(argv):
+    """
+    Parse the command line arguments
+
+    Returns
+    -------
+    A tuple (request, socket path, report format)
+    """
+    request = {"command": "check", "file": "", "options": {}}
+    options = request["options"]
+    socket_path = None
+    output_format = "text"
+    try:
+        opts, args = getopt.getopt(argv, "hvi:",
+                                   ["file=", "EDPIC", "socket=", "format=",
+                                    "cache", "check-data",
+                                    "sample-bytes=", "seed=", "max-errors=",
+                                    "fail-fast", "ping", "shutdown"])
+    except getopt.GetoptError:
+        help()
+    try:
+        for opt, arg in opts:
+            if opt == "-h":
+                help()
+            elif opt == "-v":
+                options["verbose"] = True
+            elif opt == "--EDPIC":
+                options["EDPIC"] = True
+            elif opt in ("-i", "--file"):
+                request["file"] = os.path.abspath(arg)
+            elif opt == "--socket":
+                socket_path = arg
+            elif opt == "--format":
+                if arg not in ("text", "jsonl"):
+                    raise ValueError(arg)
+                output_format = arg
+            elif opt == "--cache":
+                options["cache"] = True
+            elif opt == "--check-data":
+                options["check_data"] = True
+            elif opt == "--sample-bytes":
+                options["sample_bytes"] = parse_bytes(arg)
+            elif opt == "--seed":
+                options["seed"] = int(arg)
+            elif opt == "--max-errors":
+                options["max_errors"] = int(arg)
+                if options["max_errors"] < 1:
+                    raise ValueError(arg)
+            elif opt == "--fail-fast":
+                options["max_errors"] = 1
+            elif opt in ("--ping", "--shutdown"):
+                request = {"command": opt[2:]}
+    except ValueError:
+        print("Invalid value for option %s!" % opt)
+        help()
+    if request["command"] == "check" and not request["file"]:
+        print("No file to check given!")
+        help()
+    return(request, socket_path, output_format)
+
+
+def print_report(response, output_format):
+    """ Print the response to a check request like openPMD_check_h5 """
+    if output_format == "jsonl":
+        for finding in response["findings"]:
+            print(json.dumps({"type": "finding", "file": response["file"],
+                              "severity": finding["severity"],
+                              "path": finding["path"],
+                              "rule": finding["rule"],
+                              "message": finding["message"]}))
+        print(json.dumps({"type": "summary", "errors": response["errors"],
+                          "warnings": response["warnings"],
+                          "truncated": response["truncated"],
+                          "partial": response.get("partial")}))
+        return
+    for finding in response["findings"]:
+        print(finding["text"])
+    print("Result: %d Errors and %d Warnings%s%s."
+          %( response["errors"], response["warnings"],
+             " (truncated: stopped at the error limit)"
+             if response["truncated"] else "",
+             " (partial: %s)" % response["partial"]
+             if response.get("partial") is not None else ""))
+
+
+def check_in_process(request):
+    """
+    Check the file of a check request in this process, as the daemon would
+
+    This loads h5py and the checks, see daemon_h5.check_request.
+
+    Returns
+    -------
+    The response, a dict
+    """
+    from .daemon_h5 import check_request
+    return check_request(request["file"], request["options"])
+
+
+def main():
+    request, socket_path, output_format = parse_cmd(sys.argv[1:])
+    try:
+        response = send_request(request, socket_path)
+        if response.get("type") == "error":
+            problem = "Error of the daemon: %s" % response["message"]
+            response = None
+    except (IOError, OSError, ValueError) as e:
+        problem = "Could not reach the daemon at '%s' (%s): start it with " \
+                  "openPMD_check_h5_daemon" \
+                  % (socket_path or default_socket_path(), e)
+        response = None
+
+    if response is None:
+        if request["command"] != "check":
+            sys.stderr.write(problem + "\n")
+            sys.exit(1)
+        # an exit status of its own would be mistaken for a number of
+        # errors: check the file here instead
+        sys.stderr.write(problem + "\nChecking the file in this process.\n")
+        response = check_in_process(request)
+    if request["command"] != "check":
+        print(response.get("message", "ok"))
+        return
+    print_report(response, output_format)
+
+    # return code: non-zero is Unix-style for errors occurred
+    sys.exit(min(int(response["errors"]), 255))
+
+
+if __name__ == "__main__":
+    main()
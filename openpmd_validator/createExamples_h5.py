@@ -19,8 +19,121 @@ import h5py as h5
 import numpy as np
 import datetime
 from dateutil.tz import tzlocal
-import sys
+import sys, getopt, os.path
 import socket
+import multiprocessing
+import time
+import zlib
+
+from .options_h5 import parse_bytes
+
+
+# bytes of data generated and written at once: the memory needed to write
+# a dataset does not grow with its size
+block_bytes = 16 * 1024**2
+
+
+class RandomData(object):
+    """
+    Random values in [0, 1) of a given shape that are only generated when
+    they are sliced, row by row along the first axis
+
+    This stands in for an array of simulation data: slicing it returns a
+    numpy array, but the whole array is never held in memory. The values
+    are drawn in the order in which the rows are read, from a generator
+    seeded with `seed`.
+    """
+
+    def __init__(self, shape, dtype=np.float64, seed=0):
+        self.shape = tuple(shape)
+        self.dtype = np.dtype(dtype)
+        self._random = np.random.RandomState(seed)
+
+    def __getitem__(self, index):
+        if not isinstance(index, tuple):
+            index = (index,)
+        start, stop, step = index[0].indices(self.shape[0])
+        shape = (len(range(start, stop, step)),) + self.shape[1:]
+        data = self._random.random_sample(shape)
+        if self.dtype.kind == "c":
+            data = data + 1.j * self._random.random_sample(shape)
+        return data[(slice(None),) + index[1:]]
+
+
+def chunk_shape(shape, itemsize, chunk_bytes):
+    """
+    A chunk shape of at most `chunk_bytes` for a dataset of `shape`:
+    as many full rows as fit, or parts of a single row
+    """
+    chunk = list(shape)
+    for axis in range(len(shape)):
+        row_bytes = itemsize * int(np.prod(chunk[axis+1:]))
+        rows = chunk_bytes // row_bytes
+        if rows >= 1:
+            chunk[axis] = min(chunk[axis], rows)
+            break
+        chunk[axis] = 1
+    return tuple(chunk)
+
+
+def create_dataset(group, name, shape, dtype, storage=None):
+    """
+    Create an empty dataset
+
+    Parameters
+    ----------
+    group : an h5py.Group object
+        The group in which to create the dataset
+
+    name : string
+        The name of the dataset
+
+    shape : tuple of ints
+        The shape of the dataset
+
+    dtype : a numpy dtype
+        The type of the dataset
+
+    storage : dict or None
+        The storage layout: "chunks" (None: contiguous, True: chosen by
+        h5py, or an int: the size of the chunks in bytes), "compression"
+        and "compression_opts" (see h5py.Group.create_dataset)
+
+    Returns
+    -------
+    The h5py.Dataset object
+    """
+    options = {}
+    if storage and int(np.prod(shape)) > 0:
+        chunks = storage.get("chunks")
+        if chunks is True:
+            options["chunks"] = True
+        elif chunks:
+            options["chunks"] = chunk_shape(shape, np.dtype(dtype).itemsize,
+                                            chunks)
+        if storage.get("compression"):
+            options["compression"] = storage["compression"]
+            options["compression_opts"] = storage.get("compression_opts")
+    return group.create_dataset(name, shape, dtype=dtype, **options)
+
+
+def row_blocks(dset, axis=0):
+    """
+    Split the dataset `dset` along `axis` into blocks of about
+    `block_bytes`, aligned to its chunks
+
+    Returns
+    -------
+    A generator of the (start, stop) rows of the blocks
+    """
+    shape = dset.shape
+    row_bytes = dset.dtype.itemsize * int(np.prod(shape[axis+1:]))
+    rows = max(1, block_bytes // max(1, row_bytes))
+    if dset.chunks is not None:
+        chunk_rows = dset.chunks[axis]
+        rows = max(chunk_rows, rows // chunk_rows * chunk_rows)
+    for start in range(0, shape[axis], rows):
+        yield start, min(start + rows, shape[axis])
 
 
 def get_basePath(f, iteration):
@@ -58,7 +171,7 @@ def setup_base_path(f, iteration):
     bp = f[ base_path ]
 
     # Required attributes
-    bp.attrs["time"] = 0.  # Value expressed in femtoseconds
+    bp.attrs["time"] = 0.5 * iteration  # Value expressed in femtoseconds
     bp.attrs["dt"] = 0.5   # Value expressed in femtoseconds
     bp.attrs["timeUnitSI"] = np.float64(1.e-15) # Conversion factor
 
@@ -78,7 +191,8 @@ def get_software_dependencies():
         "h5py@{0}".format( h5.__version__)
     )
 
-def setup_root_attr(f):
+def setup_root_attr(f, iteration_encoding="groupBased",
+                    iteration_format="/data/%T/"):
     """
     Write the root metadata for this file
 
@@ -86,6 +200,14 @@ def setup_root_attr(f):
     ---------
     f : an h5py.File object
         The file in which to write the data
+
+    iteration_encoding : string
+        Either "groupBased" (all iterations in this file) or "fileBased"
+        (one file per iteration)
+
+    iteration_format : string
+        For groupBased encoding the basePath, for fileBased encoding the
+        pattern of the file names, e.g. "data_%T.h5"
     """
 
     # extensions list
@@ -97,8 +219,8 @@ def setup_root_attr(f):
     f.attrs["basePath"] = np.string_("/data/%T/")
     f.attrs["meshesPath"] = np.string_("meshes/")
     f.attrs["particlesPath"] = np.string_("particles/")
-    f.attrs["iterationEncoding"] = np.string_("groupBased")
-    f.attrs["iterationFormat"] = np.string_("/data/%T/")
+    f.attrs["iterationEncoding"] = np.string_(iteration_encoding)
+    f.attrs["iterationFormat"] = np.string_(iteration_format)
 
     # Recommended attributes
     f.attrs["author"] = np.string_("Axel Huebl <a.huebl@hzdr.de>")
@@ -113,7 +235,7 @@ def setup_root_attr(f):
     f.attrs["comment"] = np.string_("This is a dummy file for test purposes.")
 
 
-def write_rho_cylindrical(meshes, mode0, mode1):
+def write_rho_cylindrical(meshes, mode0, mode1, storage=None):
     """
     Write the metadata and the data associated with the scalar field rho,
     using the cylindrical representation (with azimuthal decomposition
@@ -131,12 +253,17 @@ def write_rho_cylindrical(meshes, mode0, mode1):
     mode1 : a 2darray of complexs
         The values of rho in the azimuthal mode 1, on the r-z grid
         (The first axis corresponds to r, and the second axis corresponds to z)
+
+    storage : dict or None
+        The chunking and compression of the dataset, see create_dataset
+
+    The arrays can also be RandomData: they are read in blocks of rows.
     """
     # Path to the rho meshes, within the h5py file
     full_rho_path = np.string_("rho")
-    meshes.create_dataset( full_rho_path, (3, mode0.shape[0], mode0.shape[1]), \
-                           dtype=np.float32)
-    rho = meshes[full_rho_path]
+    rho = create_dataset( meshes, full_rho_path,
+                          (3, mode0.shape[0], mode0.shape[1]),
+                          np.float32, storage )
     rho.attrs["comment"] = np.string_(
         "Density of electrons in azimuthal decomposition")
 
@@ -166,17 +293,22 @@ def write_rho_cylindrical(meshes, mode0, mode1):
     # Add specific information for PIC simulations
     add_EDPIC_attr_meshes(rho)
 
-    # Fill the array with the field data
+    # Fill the array with the field data, block by block along r
     if mode0.shape != mode1.shape :
         raise ValueError("`mode0` and `mode1` should have the same shape")
-    rho[0,:,:] = mode0[:,:] # Store the mode 0 first
-    rho[1,:,:] = mode1[:,:].real # Then store the real part of mode 1
-    rho[2,:,:] = mode1[:,:].imag # Then store the imaginary part of mode 1
-
-def write_b_2d_cartesian(meshes, data_ez):
+    for start, stop in row_blocks(rho, axis=1):
+        # Store the mode 0 first
+        rho[0,start:stop,:] = mode0[start:stop,:]
+        # Then store the real and imaginary parts of mode 1
+        data_mode1 = mode1[start:stop,:]
+        rho[1,start:stop,:] = data_mode1.real
+        rho[2,start:stop,:] = data_mode1.imag
+
+def write_b_2d_cartesian(meshes, data_ez, storage=None):
     """
     Write the metadata and the data associated with the vector field B,
-    using a 2d Cartesian representation.
+    using a Cartesian representation (2d in the default example, the
+    dimensionality is the one of `data_ez`).
     In this special case, the components of the vector field B.x and B.y
     shall be constant.
 
@@ -187,24 +319,28 @@ def write_b_2d_cartesian(meshes, data_ez):
     data_ez : 2darray of reals
         The values of the component B.z on the 2d x-y grid
         (The first axis corresponds to x, and the second axis corresponds to y)
+        The array can also be RandomData: it is read in blocks of rows.
+    storage : dict or None
+        The chunking and compression of the dataset, see create_dataset
     """
     # Path to the E field, within the h5py file
     full_b_path_name = b"B"
     meshes.create_group(full_b_path_name)
     B = meshes[full_b_path_name]
+    ndim = len(data_ez.shape)
 
     # Create the dataset (2d cartesian grid)
     B.create_group(b"x")
     B.create_group(b"y")
-    B.create_dataset(b"z", data_ez.shape, dtype=np.float32)
+    create_dataset(B, b"z", data_ez.shape, np.float32, storage)
 
     # Write the common metadata for the group
     B.attrs["geometry"] = np.string_("cartesian")
-    B.attrs["gridSpacing"] = np.array([1.0, 1.0], dtype=np.float32)   # dx, dy
-    B.attrs["gridGlobalOffset"] = np.array([0.0, 0.0], dtype=np.float32)  
+    B.attrs["gridSpacing"] = np.ones(ndim, dtype=np.float32)   # dx, dy
+    B.attrs["gridGlobalOffset"] = np.zeros(ndim, dtype=np.float32)
     B.attrs["gridUnitSI"] = np.float64(1.0)
     B.attrs["dataOrder"] = np.string_("C")
-    B.attrs["axisLabels"] = np.array([b"x",b"y"])
+    B.attrs["axisLabels"] = np.array([b"x",b"y",b"z"][:ndim])
     B.attrs["unitDimension"] = \
        np.array([0.0, 1.0, -2.0, -1.0, 0.0, 0.0, 0.0 ], dtype=np.float64)
        #          L    M     T     I  theta  N    J
@@ -218,9 +354,9 @@ def write_b_2d_cartesian(meshes, data_ez):
 
     # Write attribute that is specific to each dataset:
     # - Staggered position within a cell
-    B["x"].attrs["position"] = np.array([0.0, 0.0], dtype=np.float32)
-    B["y"].attrs["position"] = np.array([0.0, 0.0], dtype=np.float32)
-    B["z"].attrs["position"] = np.array([0.5, 0.5], dtype=np.float32)
+    B["x"].attrs["position"] = np.zeros(ndim, dtype=np.float32)
+    B["y"].attrs["position"] = np.zeros(ndim, dtype=np.float32)
+    B["z"].attrs["position"] = np.full(ndim, 0.5, dtype=np.float32)
     # - Conversion factor to SI units
     B["x"].attrs["unitSI"] = np.float64(3.3)
     B["y"].attrs["unitSI"] = np.float64(3.3)
@@ -234,12 +370,14 @@ def write_b_2d_cartesian(meshes, data_ez):
     B["x"].attrs["shape"] = np.array(data_ez.shape, dtype=np.uint64)
     B["y"].attrs["value"] = np.float64(0.0)
     B["y"].attrs["shape"] = np.array(data_ez.shape, dtype=np.uint64)
-    B["z"][:,:] =  data_ez[:,:]
+    for start, stop in row_blocks(B["z"]):
+        B["z"][start:stop] = data_ez[start:stop]
 
-def write_e_2d_cartesian(meshes, data_ex, data_ey, data_ez ):
+def write_e_2d_cartesian(meshes, data_ex, data_ey, data_ez, storage=None):
     """
     Write the metadata and the data associated with the vector field E,
-    using a 2d Cartesian representation
+    using a Cartesian representation (2d in the default example, the
+    dimensionality is the one of the data)
 
     Parameters
     ----------
@@ -249,24 +387,29 @@ def write_e_2d_cartesian(meshes, data_ex, data_ey, data_ez ):
     data_ex, data_ey, data_ez : 2darray of reals
         The values of the components E.x, E.y, E.z on the 2d x-y grid
         (The first axis corresponds to x, and the second axis corresponds to y)
+        The arrays can also be RandomData: they are read in blocks of rows.
+
+    storage : dict or None
+        The chunking and compression of the datasets, see create_dataset
     """
     # Path to the E field, within the h5py file
     full_e_path_name = b"E"
     meshes.create_group(full_e_path_name)
     E = meshes[full_e_path_name]
+    ndim = len(data_ez.shape)
 
     # Create the dataset (2d cartesian grid)
-    E.create_dataset(b"x", data_ex.shape, dtype=np.float32)
-    E.create_dataset(b"y", data_ey.shape, dtype=np.float32)
-    E.create_dataset(b"z", data_ez.shape, dtype=np.float32)
+    create_dataset(E, b"x", data_ex.shape, np.float32, storage)
+    create_dataset(E, b"y", data_ey.shape, np.float32, storage)
+    create_dataset(E, b"z", data_ez.shape, np.float32, storage)
 
     # Write the common metadata for the group
     E.attrs["geometry"] = np.string_("cartesian")
-    E.attrs["gridSpacing"] = np.array([1.0, 1.0], dtype=np.float32)  # dx, dy
-    E.attrs["gridGlobalOffset"] = np.array([0.0, 0.0], dtype=np.float32)  
+    E.attrs["gridSpacing"] = np.ones(ndim, dtype=np.float32)  # dx, dy
+    E.attrs["gridGlobalOffset"] = np.zeros(ndim, dtype=np.float32)
     E.attrs["gridUnitSI"] = np.float64(1.0)
     E.attrs["dataOrder"] = np.string_("C")
-    E.attrs["axisLabels"] = np.array([b"x",b"y"])
+    E.attrs["axisLabels"] = np.array([b"x",b"y",b"z"][:ndim])
     E.attrs["unitDimension"] = \
        np.array([1.0, 1.0, -3.0, -1.0, 0.0, 0.0, 0.0 ], dtype=np.float64)
        #          L    M     T     I  theta  N    J
@@ -281,18 +424,20 @@ def write_e_2d_cartesian(meshes, data_ex, data_ey, data_ez ):
 
     # Write attribute that is specific to each dataset:
     # - Staggered position within a cell
-    E["x"].attrs["position"] = np.array([0.0, 0.5], dtype=np.float32)
-    E["y"].attrs["position"] = np.array([0.5, 0.0], dtype=np.float32)
-    E["z"].attrs["position"] = np.array([0.0, 0.0], dtype=np.float32)
+    E["x"].attrs["position"] = np.array([0.0, 0.5, 0.0][:ndim],
+                                        dtype=np.float32)
+    E["y"].attrs["position"] = np.array([0.5, 0.0, 0.0][:ndim],
+                                        dtype=np.float32)
+    E["z"].attrs["position"] = np.zeros(ndim, dtype=np.float32)
     # - Conversion factor to SI units
     E["x"].attrs["unitSI"] = np.float64(1.0e9)
     E["y"].attrs["unitSI"] = np.float64(1.0e9)
     E["z"].attrs["unitSI"] = np.float64(1.0e9)
     
     # Fill the array with the field data
-    E["x"][:,:] =  data_ex[:,:]
-    E["y"][:,:] =  data_ey[:,:]
-    E["z"][:,:] =  data_ez[:,:]
+    for name, data in ((b"x", data_ex), (b"y", data_ey), (b"z", data_ez)):
+        for start, stop in row_blocks(E[name]):
+            E[name][start:stop] = data[start:stop]
 
 
 def add_EDPIC_attr_meshes(field):
@@ -333,7 +478,28 @@ def add_EDPIC_attr_particles(particle):
     #     np.string_("period=1;numPasses=2;compensator=false")
 
 
-def write_meshes(f, iteration):
+def write_meshes(f, iteration, cells=(32, 64), storage=None, seed=0):
+    """
+    Write the field records rho, E and B of an iteration
+
+    Parameters
+    ----------
+    f : an h5py.File object
+        The file in which to write the data
+
+    iteration : int
+        The iteration number for this output
+
+    cells : tuple of ints
+        The number of cells of the grid along each axis (1 to 3 axes).
+        rho is written on the r-z grid of the first and last axis.
+
+    storage : dict or None
+        The chunking and compression of the datasets, see create_dataset
+
+    seed : int
+        Seed of the random data
+    """
     full_meshes_path = get_basePath(f, iteration) + f.attrs["meshesPath"]
     f.create_group(full_meshes_path)
     meshes = f[full_meshes_path]
@@ -350,30 +516,58 @@ def write_meshes(f, iteration):
     meshes.attrs["chargeCorrection"] = np.string_("none")
 
     # (Here the data is randomly generated, but in an actual simulation,
-    # this would be replaced by the simulation data.)
+    # this would be replaced by the simulation data. It is generated while
+    # it is written, one block at a time.)
+    cells = tuple(cells)
 
     # - Write rho
     # Mode 0 : real values, mode 1 : complex values
-    data_rho0 = np.random.rand(32,64)
-    data_rho1 = np.random.rand(32,64) + 1.j*np.random.rand(32,64)
-    write_rho_cylindrical(meshes, data_rho0, data_rho1)
+    rz_cells = (cells[0], cells[-1])
+    data_rho0 = RandomData(rz_cells, seed=[seed, iteration, 0])
+    data_rho1 = RandomData(rz_cells, np.complex128, seed=[seed, iteration, 1])
+    write_rho_cylindrical(meshes, data_rho0, data_rho1, storage)
 
     # - Write E
-    data_ex = np.random.rand(32,64)
-    data_ey = np.random.rand(32,64)
-    data_ez = np.random.rand(32,64)
-    write_e_2d_cartesian( meshes, data_ex, data_ey, data_ez )
+    data_ex = RandomData(cells, seed=[seed, iteration, 2])
+    data_ey = RandomData(cells, seed=[seed, iteration, 3])
+    data_ez = RandomData(cells, seed=[seed, iteration, 4])
+    write_e_2d_cartesian( meshes, data_ex, data_ey, data_ez, storage )
 
     # - Write B
-    data_bz = np.random.rand(32,64)
-    write_b_2d_cartesian( meshes, data_bz )
+    data_bz = RandomData(cells, seed=[seed, iteration, 5])
+    write_b_2d_cartesian( meshes, data_bz, storage )
+
+def write_particles(f, iteration, num_particles=128, name="electrons",
+                    storage=None, seed=0):
+    """
+    Write a particle species of an iteration
+
+    Parameters
+    ----------
+    f : an h5py.File object
+        The file in which to write the data
+
+    iteration : int
+        The iteration number for this output
+
+    num_particles : int
+        The number of particles of the species
 
-def write_particles(f, iteration):
+    name : string
+        The name of the species
+
+    storage : dict or None
+        The chunking and compression of the datasets, see create_dataset
+
+    seed : int
+        Seed of the random data
+    """
     fullParticlesPath = get_basePath(f, iteration) + f.attrs["particlesPath"]
-    f.create_group(fullParticlesPath + b"electrons")
-    electrons = f[fullParticlesPath + b"electrons"]
+    name = np.string_(name)
+    f.create_group(fullParticlesPath + name)
+    electrons = f[fullParticlesPath + name]
 
-    globalNumParticles = 128 # example number of all particles
+    globalNumParticles = num_particles # example number of all particles
 
     electrons.attrs["comment"] = np.string_("My first electron species")
 
@@ -422,9 +616,8 @@ def write_particles(f, iteration):
        #          L    M    T    I  theta  N    J
 
     # scalar particle records (non-const/individual per particle)
-    electrons.create_dataset(b"weighting", (globalNumParticles,),
-                             dtype=np.float32)
-    weighting = electrons["weighting"]
+    weighting = create_dataset(electrons, b"weighting", (globalNumParticles,),
+                               np.float32, storage)
     # macroWeighted: True(1) by definition
     # weightingPower == 1: since this is the identity of weighting,
     #                      it scales linearly with itself
@@ -440,9 +633,9 @@ def write_particles(f, iteration):
     # Position of each particle
     electrons.create_group(b"position")
     position = electrons["position"]
-    position.create_dataset("x", (globalNumParticles,), dtype=np.float32)
-    position.create_dataset("y", (globalNumParticles,), dtype=np.float32)
-    position.create_dataset("z", (globalNumParticles,), dtype=np.float32)
+    for axis in ("x", "y", "z"):
+        create_dataset(position, axis, (globalNumParticles,), np.float32,
+                       storage)
     # Conversion factor to SI units
     position["x"].attrs["unitSI"] = np.float64(1.e-9)
     position["y"].attrs["unitSI"] = np.float64(1.e-9)
@@ -491,9 +684,9 @@ def write_particles(f, iteration):
     # Momentum of each particle
     electrons.create_group(b"momentum")
     momentum = electrons["momentum"]
-    momentum.create_dataset("x", (globalNumParticles,), dtype=np.float32)
-    momentum.create_dataset("y", (globalNumParticles,), dtype=np.float32)
-    momentum.create_dataset("z", (globalNumParticles,), dtype=np.float32)
+    for axis in ("x", "y", "z"):
+        create_dataset(momentum, axis, (globalNumParticles,), np.float32,
+                       storage)
     # Conversion factor to SI units
     momentum["x"].attrs["unitSI"] = np.float64(1.60217657e-19)
     momentum["y"].attrs["unitSI"] = np.float64(1.60217657e-19)
@@ -538,7 +731,7 @@ def write_particles(f, iteration):
     # domain decomposition shall be 1D along x (but positions are still 3D)
     # we can therefor make the other components constant
     particlePatches["offset/y"].attrs["value"] = np.float32(0.0)   # full size
-    particlePatches["offset/z"].attrs["value"] = np.float32(0.0)   # full size
+    particlePatches["offset/z"].attrs["value"] = np.float32(100.0) # positionOffset
     particlePatches["offset/y"].attrs["shape"] = np.array([mpi_size], dtype=np.uint64)
     particlePatches["offset/z"].attrs["shape"] = np.array([mpi_size], dtype=np.uint64)
 
@@ -547,39 +740,262 @@ def write_particles(f, iteration):
     particlePatches["extent/y"].attrs["shape"] = np.array([mpi_size], dtype=np.uint64)
     particlePatches["extent/z"].attrs["shape"] = np.array([mpi_size], dtype=np.uint64)
 
+    # the first ranks hold one particle more if they cannot be split evenly
+    num_per_rank, num_left = divmod(globalNumParticles, mpi_size)
     for rank in np.arange(mpi_size):
         # each MPI rank would write its part independently
         # numParticles: number of particles in this patch
-        particlePatches['numParticles'][rank] = globalNumParticles / mpi_size
+        particlePatches['numParticles'][rank] = \
+            num_per_rank + (1 if rank < num_left else 0)
         # numParticlesOffset: offset within the one-dimensional records where
         #                     the first particle in this patch is stored
-        particlePatches['numParticlesOffset'][rank] = rank*globalNumParticles / mpi_size
+        particlePatches['numParticlesOffset'][rank] = \
+            rank * num_per_rank + min(rank, num_left)
         # offset and extent in the grid
         # example: 1D domain decompositon of 3D simulation along the first axis
         # 1st dimension spatial offset
         particlePatches['offset/x'][rank] = rank * grid_layout[0] / mpi_size
         particlePatches['extent/x'][rank] = grid_layout[0] / mpi_size
 
+    # the particles of a patch must lie inside of its offset and extent:
+    # spread them evenly along x in their patch
+    patch_first = particlePatches['numParticlesOffset'][()]
+    patch_num = particlePatches['numParticles'][()]
+    patch_offset = particlePatches['offset/x'][()]
+    patch_extent = particlePatches['extent/x'][()]
+    for start, stop in row_blocks(position['x']):
+        index = np.arange(start, stop)
+        # empty patches have the same first particle as the next patch
+        patch = np.searchsorted(patch_first, index, side="right") - 1
+        position['x'][start:stop] = patch_offset[patch] + \
+            patch_extent[patch] * (index - patch_first[patch] + 0.5) / \
+            patch_num[patch]
+
+    # (random) data of the other records, generated while it is written:
+    # y and z lie inside of the constant patch extents, and z is relative
+    # to the positionOffset
+    species_seed = zlib.crc32(name) & 0xffffffff
+    records = [ (weighting, 1.0, 0.0), (position['y'], 128.0, 0.0),
+                (position['z'], 1.0, 0.0), (momentum['x'], 1.0, -0.5),
+                (momentum['y'], 1.0, -0.5), (momentum['z'], 1.0, -0.5) ]
+    for i, (dset, scale, shift) in enumerate(records):
+        data = RandomData(dset.shape,
+                          seed=[seed, iteration, species_seed, i])
+        for start, stop in row_blocks(dset):
+            dset[start:stop] = scale * data[start:stop] + shift
+
+
+def species_name(index):
+    """ The name of the species `index` of the examples """
+    return "electrons" if index == 0 else "species%d" % index
+
+
+def write_file(file_name, iterations, iteration_encoding, iteration_format,
+               cells, particles, species, storage, seed):
+    """
+    Write one example file with the `iterations`, see write_example
 
-def main():
-    # Open an exemple file
-    f = h5.File("example.h5", "w")
+    The random data of each iteration only depends on `seed` and on the
+    iteration, not on the file or on the order in which files are written.
+    """
+    f = h5.File(file_name, "w")
 
-    # Setup the root attributes for iteration 0
-    setup_root_attr(f)
+    # Setup the root attributes
+    setup_root_attr(f, iteration_encoding, iteration_format)
 
-    # Setup basepath
-    setup_base_path(f, iteration=0)
-    
-    # Write the field records
-    write_meshes(f, iteration=0)
+    for iteration in iterations:
+        # Setup basepath
+        setup_base_path(f, iteration)
+
+        # Write the field records
+        write_meshes(f, iteration, cells, storage, seed)
 
-    # Write the particle records
-    write_particles(f, iteration=0)
+        # Write the particle records
+        for index in range(species):
+            write_particles(f, iteration, particles, species_name(index),
+                            storage, seed)
 
     # Close the file
     f.close()
-    print("File example.h5 created!")
+    return file_name
+
+
+def _write_file_star(args):
+    """ write_file for Pool.imap_unordered, which passes one argument """
+    return write_file(*args)
+
+
+def write_example(file_name="example.h5", iterations=1, cells=(32, 64),
+                  particles=128, species=1, storage=None,
+                  iteration_encoding="groupBased", seed=0, workers=1):
+    """
+    Write an example file, or an example series of files
+
+    The data is written in blocks of `block_bytes`, so that the memory
+    needed does not depend on the size of the files. The files of a
+    fileBased series can be written in parallel, and are the same whatever
+    the number of workers.
+
+    Parameters
+    ----------
+    file_name : string
+        The file to write. For fileBased encoding, a file name pattern in
+        which `%T` stands for the iteration (`_%T` is inserted before the
+        extension if it is missing).
+
+    iterations : int
+        The number of iterations
+
+    cells : tuple of ints
+        The number of cells of the meshes along each axis (1 to 3 axes)
+
+    particles : int
+        The number of particles of each species
+
+    species : int
+        The number of particle species
+
+    storage : dict or None
+        The chunking and compression of the datasets, see create_dataset
+
+    iteration_encoding : string
+        Either "groupBased" (all iterations in one file) or "fileBased"
+        (one file per iteration)
+
+    seed : int
+        Seed of the random data
+
+    workers : int
+        Number of worker processes that write the files of a fileBased
+        series (a groupBased file is always written by one process)
+
+    Returns
+    -------
+    The list of the names of the files written
+    """
+    if iteration_encoding == "fileBased":
+        if "%T" not in file_name:
+            root, extension = os.path.splitext(file_name)
+            file_name = root + "_%T" + extension
+        iteration_format = os.path.basename(file_name)
+        files = [ (file_name.replace("%T", str(iteration)), [iteration])
+                  for iteration in range(iterations) ]
+    elif iteration_encoding == "groupBased":
+        iteration_format = "/data/%T/"
+        files = [ (file_name, range(iterations)) ]
+    else:
+        raise ValueError("Unknown iterationEncoding '%s'"
+                         % iteration_encoding)
+
+    tasks = [ (name, file_iterations, iteration_encoding, iteration_format,
+               cells, particles, species, storage, seed)
+              for name, file_iterations in files ]
+    if workers > 1 and len(tasks) > 1:
+        pool = multiprocessing.Pool(min(workers, len(tasks)))
+        try:
+            # the files are independent: write them in any order
+            for _ in pool.imap_unordered(_write_file_star, tasks):
+                pass
+        finally:
+            pool.close()
+            pool.join()
+    else:
+        for task in tasks:
+            write_file(*task)
+    return [ name for name, _ in files ]
+
+
+def help():
+    """ Print usage information for this file """
+    print('Write openPMD example files with random data\n')
+    print('Usage:\n  openPMD_createExamples_h5 [-o <fileName>] [options]')
+    print('\n  -o, --output <fileName>  the file to write (default: '
+          'example.h5)')
+    print('  --iterations <N>  number of iterations (default: 1)')
+    print('  --cells <NxM...>  cells of the meshes along 1 to 3 axes '
+          '(default: 32x64)')
+    print('  --particles <N>   particles per species (default: 128)')
+    print('  --species <N>     number of particle species (default: 1)')
+    print('  --chunks <auto|none|bytes>  chunks chosen by h5py, no chunks '
+          '(default) or\n                    chunks of at most bytes '
+          '(suffixes k, M, G and T allowed)')
+    print('  --compression <gzip[:level]|lzf|none>  compression of the '
+          'chunks, implies\n                    --chunks auto if no chunks '
+          'are set')
+    print('  --encoding <groupBased|fileBased>  one file for all iterations '
+          '(default) or\n                    one file per iteration, '
+          'named after a pattern with %T')
+    print('  --seed <N>        seed of the random data (default: 0)')
+    print('  -j, --jobs <N>    write the files of a fileBased series in N '
+          'worker processes')
+    sys.exit()
+
+
+def parse_cmd(argv):
+    """ Parse the command line arguments """
+    file_name = "example.h5"
+    options = {}
+    storage = {}
+    try:
+        opts, args = getopt.getopt(argv, "ho:j:",
+                                   ["output=", "iterations=", "cells=",
+                                    "particles=", "species=", "chunks=",
+                                    "compression=", "encoding=", "seed=",
+                                    "jobs="])
+    except getopt.GetoptError:
+        help()
+    try:
+        for opt, arg in opts:
+            if opt == "-h":
+                help()
+            elif opt in ("-o", "--output"):
+                file_name = arg
+            elif opt in ("--iterations", "--particles", "--species",
+                         "--seed"):
+                options[opt[2:]] = int(arg)
+            elif opt in ("-j", "--jobs"):
+                options["workers"] = int(arg)
+            elif opt == "--cells":
+                options["cells"] = tuple( int(n) for n in arg.split("x") )
+                if not 1 <= len(options["cells"]) <= 3:
+                    raise ValueError(arg)
+            elif opt == "--chunks":
+                if arg == "auto":
+                    storage["chunks"] = True
+                elif arg == "none":
+                    storage["chunks"] = None
+                else:
+                    storage["chunks"] = parse_bytes(arg)
+            elif opt == "--compression":
+                compression, _, level = arg.partition(":")
+                if compression != "none":
+                    storage["compression"] = compression
+                    if level:
+                        storage["compression_opts"] = int(level)
+            elif opt == "--encoding":
+                if arg not in ("groupBased", "fileBased"):
+                    raise ValueError(arg)
+                options["iteration_encoding"] = arg
+    except ValueError:
+        print("Invalid value for option %s!" % opt)
+        help()
+    if storage.get("compression") and "chunks" not in storage:
+        storage["chunks"] = True
+    if storage:
+        options["storage"] = storage
+    return(file_name, options)
+
+
+def main():
+    file_name, options = parse_cmd(sys.argv[1:])
+    start = time.time()
+    file_names = write_example(file_name, **options)
+    seconds = time.time() - start
+    for name in file_names:
+        print("File %s created!" % name)
+    size = sum( os.path.getsize(name) for name in file_names ) / 1.e6
+    print("Wrote %.1f MB in %.2f s (%.1f MB/s)"
+          % (size, seconds, size / max(seconds, 1.e-9)))
 
 
 if __name__ == "__main__":
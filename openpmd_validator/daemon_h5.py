@@ -0,0 +1,311 @@
+#!/usr/bin/env python
+#
+# Copyright (c) 2015-2017 Axel Huebl, Remi Lehe
+#
+# Permission to use, copy, modify, and/or distribute this software for any
+# purpose with or without fee is hereby granted, provided that the above
+# copyright notice and this permission notice appear in all copies.
+#
+# THE SOFTWARE IS PROVIDED "AS IS" AND THE AUTHOR DISCLAIMS ALL WARRANTIES
+# WITH REGARD TO THIS SOFTWARE INCLUDING ALL IMPLIED WARRANTIES OF
+# MERCHANTABILITY AND FITNESS. IN NO EVENT SHALL THE AUTHOR BE LIABLE FOR
+# ANY SPECIAL, DIRECT, INDIRECT, OR CONSEQUENTIAL DAMAGES OR ANY DAMAGES
+# WHATSOEVER RESULTING FROM LOSS OF USE, DATA OR PROFITS, WHETHER IN AN
+# ACTION OF CONTRACT, NEGLIGENCE OR OTHER TORTIOUS ACTION, ARISING OUT OF
+# OR IN CONNECTION WITH THE USE OR PERFORMANCE OF THIS SOFTWARE.
+#
+"""
+Validation daemon: checks files on request over a Unix socket
+
+The daemon imports h5py, numpy and the checks once and forks a bounded
+pool of worker processes, so that a request does not pay for starting an
+interpreter. Each connection is served by a thread that passes its
+requests to the pool, one at a time; concurrent connections are checked in
+parallel up to the number of workers. A check that does not finish within
+a timeout, e.g. because its worker died, is answered with an error. See
+client_h5 for the protocol.
+"""
+
+import getopt
+import json
+import multiprocessing
+import os
+import signal
+import socket
+import sys
+import threading
+try:
+    import socketserver
+except ImportError:
+    import SocketServer as socketserver
+
+import h5py as h5
+
+from .check_h5 import Finding, Findings, Result, check_file
+from .client_h5 import check_directory, default_socket_path, \
+    private_directory
+from .data_h5 import DataCheck
+
+
+# the options of a check request, see client_h5
+request_options = ("verbose", "EDPIC", "check_data", "sample_bytes", "seed",
+                   "max_errors", "cache")
+
+# seconds after which a check request is answered with an error
+default_timeout = 3600.
+
+
+def check_request(file_name, options):
+    """
+    Check one file for a request, in a worker process
+
+    Unreadable or malformed files are reported as errors instead of
+    stopping the worker.
+
+    Returns
+    -------
+    The response, a dict
+    """
+    findings = Findings(echo=False, keep=True)
+    if not (os.path.isfile(file_name) and h5.is_hdf5(file_name)):
+        return check_response(file_name, Result(1, 0), [
+            Finding("error", file_name, "file",
+                    "File '%s' is not an HDF5 file!" % file_name) ])
+    data_check = bool(options.get("check_data"))
+    if "sample_bytes" in options or "seed" in options:
+        data_check = DataCheck(sample_bytes=options.get("sample_bytes"),
+                               seed=options.get("seed", 0))
+    try:
+        result_array = check_file(file_name,
+                                  bool(options.get("verbose")),
+                                  bool(options.get("EDPIC")),
+                                  findings=findings,
+                                  cache=bool(options.get("cache")),
+                                  data_check=data_check,
+                                  max_errors=options.get("max_errors"))
+    except Exception as e:
+        return check_response(file_name, Result(1, 0), [
+            Finding("error", file_name, "file",
+                    "Checking file '%s' failed: %s" % (file_name, e)) ])
+    return check_response(file_name, result_array, findings.findings,
+                          findings.truncated, findings.partial)
+
+
+def check_response(file_name, result_array, findings, truncated=False,
+                   partial=None):
+    """ The response to a check request, see client_h5 """
+    return {"type": "result", "file": file_name,
+            "errors": int(result_array[0]),
+            "warnings": int(result_array[1]),
+            "truncated": truncated, "partial": partial,
+            "findings": [ {"severity": finding.severity,
+                           "path": finding.path, "rule": finding.rule,
+                           "message": finding.message,
+                           "text": str(finding)}
+                          for finding in findings ]}
+
+
+class RequestHandler(socketserver.StreamRequestHandler):
+    """ Serves the requests of one connection, one per line """
+
+    def handle(self):
+        for line in self.rfile:
+            try:
+                request = json.loads(line.decode("utf-8"))
+            except ValueError:
+                request = None
+            response = self.server.respond(request)
+            self.wfile.write((json.dumps(response) + "\n").encode("utf-8"))
+            self.wfile.flush()
+            if response["type"] == "shutdown":
+                # shutdown() waits for serve_forever: not from its thread
+                threading.Thread(target=self.server.shutdown).start()
+                return
+
+
+class ValidationServer(socketserver.ThreadingMixIn,
+                       socketserver.UnixStreamServer):
+    """
+    A Unix socket server that passes check requests to a Pool, and waits
+    at most `timeout` seconds for each
+    """
+    daemon_threads = True
+
+    def __init__(self, socket_path, workers, timeout=default_timeout):
+        self.timeout = timeout
+        # fork the workers first, so that they do not inherit the socket;
+        # recycle them from time to time to bound their memory
+        self.pool = multiprocessing.Pool(workers, maxtasksperchild=1000)
+        # only the owner may connect
+        umask = os.umask(0o077)
+        try:
+            socketserver.UnixStreamServer.__init__(self, socket_path,
+                                                   RequestHandler)
+        except Exception:
+            self.pool.terminate()
+            raise
+        finally:
+            os.umask(umask)
+
+    def respond(self, request):
+        """ The response to one request (a dict, None if malformed) """
+        if not isinstance(request, dict):
+            return {"type": "error", "message": "Malformed request"}
+        command = request.get("command", "check")
+        if command == "ping":
+            return {"type": "pong", "message": "ok"}
+        elif command == "shutdown":
+            return {"type": "shutdown", "message": "shutting down"}
+        elif command != "check":
+            return {"type": "error",
+                    "message": "Unknown command '%s'" % command}
+        options = request.get("options", {})
+        unknown = [ name for name in options if name not in request_options ]
+        if unknown or not request.get("file"):
+            return {"type": "error",
+                    "message": "Invalid request: needs a file and the "
+                               "options %s" % ", ".join(request_options)}
+        # a worker that dies loses its task: do not wait forever
+        result = self.pool.apply_async(check_request,
+                                       (request["file"], options))
+        try:
+            return result.get(self.timeout)
+        except multiprocessing.TimeoutError:
+            return {"type": "error",
+                    "message": "The check of '%s' did not finish within "
+                               "%g s" % (request["file"], self.timeout)}
+
+    def server_close(self):
+        socketserver.UnixStreamServer.server_close(self)
+        self.pool.terminate()
+        self.pool.join()
+
+
+def remove_stale_socket(socket_path):
+    """
+    Remove the socket file of a daemon that is no longer running
+
+    Returns
+    -------
+    False if a daemon is listening on `socket_path`
+    """
+    if not os.path.exists(socket_path):
+        return True
+    client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        client.connect(socket_path)
+    except (IOError, OSError):
+        os.remove(socket_path)
+        return True
+    finally:
+        client.close()
+    return False
+
+
+def serve(socket_path=None, workers=None, timeout=default_timeout):
+    """
+    Run the daemon until it receives a shutdown request, SIGTERM or SIGINT
+
+    Parameters
+    ----------
+    socket_path : string or None
+        The Unix socket to listen on (default: see default_socket_path).
+        Its directory must not be writable by other users, see
+        client_h5.check_directory.
+
+    workers : int or None
+        Number of worker processes (None: one per core)
+
+    timeout : float
+        Seconds after which a check is answered with an error
+
+    Raises
+    ------
+    RuntimeError : if the socket cannot be used safely, or a daemon is
+    already listening on it
+    """
+    try:
+        if socket_path is None:
+            socket_path = default_socket_path()
+            if not os.environ.get("XDG_RUNTIME_DIR"):
+                private_directory(os.path.dirname(socket_path))
+        check_directory(os.path.dirname(os.path.abspath(socket_path)))
+        stale = remove_stale_socket(socket_path)
+    except (IOError, OSError) as e:
+        raise RuntimeError(str(e))
+    if not stale:
+        raise RuntimeError("A daemon is already listening on '%s'"
+                           % socket_path)
+    server = ValidationServer(socket_path,
+                              workers or multiprocessing.cpu_count(),
+                              timeout)
+
+    def stop(signum, frame):
+        threading.Thread(target=server.shutdown).start()
+    signal.signal(signal.SIGTERM, stop)
+
+    print("Listening on '%s'" % socket_path)
+    sys.stdout.flush()
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
+
+
+def help():
+    """ Print usage information for this file """
+    print('This is the openPMD check daemon for HDF5 files.\n')
+    print('Usage:\n  openPMD_check_h5_daemon [--socket <path>] [-j <N>]')
+    print('\n  --socket <path>  the socket to listen on (default: %s)'
+          % default_socket_path())
+    print('  -j, --jobs <N>  check up to N files at once in worker processes '
+          '(default: one per core)')
+    print('  --timeout <s>   answer a check with an error after s seconds, '
+          'e.g. if its\n                  worker died (default: %g)'
+          % default_timeout)
+    print('\nThe files are checked with openPMD_check_h5_client.')
+    sys.exit()
+
+
+def main():
+    socket_path = None
+    workers = None
+    timeout = default_timeout
+    try:
+        opts, args = getopt.getopt(sys.argv[1:], "hj:",
+                                   ["socket=", "jobs=", "timeout="])
+    except getopt.GetoptError:
+        help()
+    for opt, arg in opts:
+        if opt == "-h":
+            help()
+        elif opt == "--socket":
+            socket_path = arg
+        elif opt in ("-j", "--jobs"):
+            try:
+                workers = int(arg)
+            except ValueError:
+                print("Number of jobs '%s' is not an integer!" % arg)
+                help()
+        elif opt == "--timeout":
+            try:
+                timeout = float(arg)
+                if not timeout > 0:
+                    raise ValueError(arg)
+            except ValueError:
+                print("Timeout '%s' is not a positive number of seconds!"
+                      % arg)
+                help()
+    try:
+        serve(socket_path, workers, timeout)
+    except RuntimeError as e:
+        print(e)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,527 @@
+#!/usr/bin/env python
+#
+# Copyright (c) 2015-2017 Axel Huebl, Remi Lehe
+#
+# Permission to use, copy, modify, and/or distribute this software for any
+# purpose with or without fee is hereby granted, provided that the above
+# copyright notice and this permission notice appear in all copies.
+#
+# THE SOFTWARE IS PROVIDED "AS IS" AND THE AUTHOR DISCLAIMS ALL WARRANTIES
+# WITH REGARD TO THIS SOFTWARE INCLUDING ALL IMPLIED WARRANTIES OF
+# MERCHANTABILITY AND FITNESS. IN NO EVENT SHALL THE AUTHOR BE LIABLE FOR
+# ANY SPECIAL, DIRECT, INDIRECT, OR CONSEQUENTIAL DAMAGES OR ANY DAMAGES
+# WHATSOEVER RESULTING FROM LOSS OF USE, DATA OR PROFITS, WHETHER IN AN
+# ACTION OF CONTRACT, NEGLIGENCE OR OTHER TORTIOUS ACTION, ARISING OUT OF
+# OR IN CONNECTION WITH THE USE OR PERFORMANCE OF THIS SOFTWARE.
+#
+"""
+Data-level checks of record components
+
+Contrary to the metadata checks in check_h5, these read the data of the
+datasets. Datasets are streamed in blocks that are aligned to their HDF5
+chunk layout, so that memory is bounded by one block and every chunk is
+read (and decompressed) only once.
+
+In sampling mode, only a seeded random subset of the chunks of each
+dataset is read: each dataset gets the same share of its stored bytes, so
+that at most the byte budget is read from the whole file, and chunks are
+drawn without replacement until that share is used up. The sampled chunks
+are read in the order of their offsets in the file.
+"""
+
+import numpy as np
+import os
+import zlib
+from itertools import product
+
+
+# granularity of the samples of contiguous datasets
+contiguous_sample_bytes = 64 * 1024
+
+
+class DataCheck(object):
+    """
+    Settings of the opt-in data-level checks
+
+    Parameters
+    ----------
+    block_bytes : int
+        Upper bound of the size of the blocks in which datasets are read
+        (a block holds at least one chunk)
+
+    sample_bytes : int or None
+        Only read a random sample of the data of at most this many bytes
+        per file (None: read all data)
+
+    seed : int
+        Seed of the random samples
+    """
+
+    def __init__(self, block_bytes=64 * 1024**2, sample_bytes=None, seed=0):
+        self.block_bytes = block_bytes
+        self.sample_bytes = sample_bytes
+        self.seed = seed
+        # queued data checks, see deferred
+        self.pending = None
+
+    def deferred(self):
+        """
+        A copy of these settings that queues the data checks in `pending`
+        instead of running them right away, so that they can run after the
+        cheaper metadata checks
+        """
+        copy = DataCheck(self.block_bytes, self.sample_bytes, self.seed)
+        copy.pending = []
+        return copy
+
+    def sample_fraction(self, file_name):
+        """
+        The share of the stored bytes of each dataset in `file_name` that
+        is sampled, so that at most `sample_bytes` are read in total
+        """
+        file_size = os.path.getsize(file_name)
+        if file_size == 0:
+            return 1.0
+        return min(1.0, float(self.sample_bytes) / file_size)
+
+    def random_state(self, name):
+        """ A random generator that only depends on the seed and `name` """
+        return np.random.RandomState(
+            (zlib.crc32(name.encode("utf-8")) ^ self.seed) & 0xffffffff)
+
+
+def block_shape(shape, chunks, itemsize, block_bytes):
+    """
+    Shape of the blocks in which a dataset is read
+
+    A block is a whole number of chunks (of elements, for contiguous
+    datasets) along each axis, grown from the last axis to the first one
+    as long as it fits into `block_bytes`.
+
+    Parameters
+    ----------
+    shape : tuple of int
+        The shape of the dataset
+
+    chunks : tuple of int or None
+        The chunk shape of the dataset (None for contiguous datasets)
+
+    itemsize : int
+        The size of one element in bytes
+
+    block_bytes : int
+        Upper bound of the size of a block
+
+    Returns
+    -------
+    A tuple of int
+    """
+    if chunks is None:
+        # contiguous layout: blocks are contiguous in the file, since the
+        # last axes are complete before an axis grows
+        chunks = (1,) * len(shape)
+    block = list(chunks)
+    for axis in reversed(range(len(shape))):
+        other = itemsize * int(np.prod(block)) // block[axis]
+        n_chunks = max(1, block_bytes // (other * chunks[axis]))
+        block[axis] = min(shape[axis], chunks[axis] * n_chunks)
+        if block[axis] < shape[axis]:
+            break
+    return tuple(block)
+
+
+def iter_blocks(shape, block):
+    """
+    Slices of all blocks of a dataset, in C order of the blocks
+
+    Returns
+    -------
+    A generator of tuples (offset, slices)
+    """
+    for offset in product(*[ range(0, n, b) for n, b in zip(shape, block) ]):
+        yield offset, tuple( slice(o, min(o + b, n))
+                             for o, b, n in zip(offset, block, shape) )
+
+
+def stored_chunks(dset, block_bytes):
+    """
+    The chunks of a dataset that are stored in the file
+
+    Contiguous datasets are divided into blocks of rows of at most
+    `contiguous_sample_bytes` (or `block_bytes`, if smaller), which are
+    treated like chunks.
+
+    Returns
+    -------
+    A list of tuples (file offset, stored bytes, element offset, shape)
+    """
+    itemsize = dset.dtype.itemsize
+    if dset.chunks is None:
+        base = dset.id.get_offset()
+        if base is None:
+            # not allocated yet: only fill values
+            return []
+        block = block_shape(dset.shape, None, itemsize,
+                            min(block_bytes, contiguous_sample_bytes))
+        strides = np.cumprod((dset.shape[1:] + (1,))[::-1])[::-1]
+        chunks = []
+        for offset, slices in iter_blocks(dset.shape, block):
+            shape = tuple( s.stop - s.start for s in slices )
+            start = int(np.dot(offset, strides)) * itemsize
+            chunks.append((base + start, int(np.prod(shape)) * itemsize,
+                           offset, shape))
+        return chunks
+
+    chunks = []
+
+    def add(info):
+        shape = tuple( min(c, n - o) for c, n, o
+                       in zip(dset.chunks, dset.shape, info.chunk_offset) )
+        chunks.append((info.byte_offset, info.size, info.chunk_offset,
+                       shape))
+
+    try:
+        dset.id.chunk_iter(add)
+    except (AttributeError, NotImplementedError):
+        # HDF5 before 1.12.3: one query per chunk
+        for i in range(dset.id.get_num_chunks()):
+            add(dset.id.get_chunk_info(i))
+    return chunks
+
+
+def coalesce_chunks(chunks, block_bytes):
+    """
+    Merge chunks that are neighbors along the first axis into one read
+
+    Parameters
+    ----------
+    chunks : list of tuples
+        Chunks of stored_chunks, sorted by their file offset
+
+    block_bytes : int
+        Upper bound of the size of a merged read
+
+    Returns
+    -------
+    A list of tuples (element offset, slices) for iter_blocks
+    """
+    reads = []
+    for _, size, offset, shape in chunks:
+        if reads:
+            last_offset, last_shape, last_size = reads[-1]
+            if last_offset[1:] == offset[1:] and last_shape[1:] == shape[1:] \
+               and last_offset[0] + last_shape[0] == offset[0] \
+               and last_size + size <= block_bytes:
+                reads[-1] = (last_offset,
+                             (last_shape[0] + shape[0],) + shape[1:],
+                             last_size + size)
+                continue
+        reads.append((tuple(offset), tuple(shape), size))
+    return [ (offset, tuple( slice(o, o + n) for o, n in zip(offset, shape) ))
+             for offset, shape, _ in reads ]
+
+
+def sample_indices(sizes, budget, random_state):
+    """
+    Draw items at random and without replacement, as long as their total
+    size fits into `budget`
+
+    Items that do not fit into the rest of the budget are skipped.
+
+    Returns
+    -------
+    A tuple (sorted list of the indices of the drawn items, index of the
+    first skipped item or None)
+    """
+    picked = []
+    skipped = None
+    used = 0
+    for i in random_state.permutation(len(sizes)):
+        i = int(i)
+        if used + sizes[i] <= budget:
+            picked.append(i)
+            used += sizes[i]
+        elif skipped is None:
+            skipped = i
+    return sorted(picked), skipped
+
+
+def cut_chunk(chunk, max_bytes, itemsize):
+    """
+    The part of a chunk that starts at its offset and fits into `max_bytes`:
+    as many whole rows along the first axis as fit, otherwise part of the
+    first row, and so on
+
+    Parameters
+    ----------
+    chunk : tuple
+        A chunk of stored_chunks, of an uncompressed dataset
+
+    Returns
+    -------
+    A tuple like the ones of stored_chunks, or None if not even one element
+    fits
+    """
+    file_offset, _, offset, shape = chunk
+    for axis in range(len(shape)):
+        row_bytes = itemsize * int(np.prod(shape[axis + 1:]))
+        n = min(shape[axis], max_bytes // row_bytes)
+        if n > 0:
+            return (file_offset, n * row_bytes, offset,
+                    (1,) * axis + (n,) + tuple(shape[axis + 1:]))
+    return None
+
+
+def sample_blocks(dset, data_check):
+    """
+    Pick a seeded random sample of the chunks of a dataset
+
+    The chunks are drawn without replacement until the share
+    DataCheck.sample_fraction of the stored bytes of the dataset is used
+    up, see sample_indices. For uncompressed datasets, the rest of the
+    budget goes to a slice of the first chunk that did not fit (HDF5 may
+    still read such a chunk as a whole through its chunk cache). The
+    sample is sorted by the offsets of the chunks in the file and
+    coalesced.
+
+    Parameters
+    ----------
+    dset : an h5py.Dataset object
+        The dataset to sample
+
+    data_check : DataCheck
+        The settings of the sample
+
+    Returns
+    -------
+    A tuple (list of (element offset, slices) for find_non_finite,
+    fraction of the elements that are covered)
+    """
+    if dset.shape is None or dset.shape == () or dset.size == 0:
+        return [], 1.0
+    chunks = stored_chunks(dset, data_check.block_bytes)
+    sizes = [ size for _, size, _, _ in chunks ]
+    budget = int(data_check.sample_fraction(dset.file.filename) *
+                 sum(sizes))
+    picked, skipped = sample_indices(
+        sizes, budget, data_check.random_state(dset.name))
+    sample = [ chunks[i] for i in picked ]
+    if skipped is not None and \
+       dset.id.get_create_plist().get_nfilters() == 0:
+        cut = cut_chunk(chunks[skipped],
+                        budget - sum( sizes[i] for i in picked ),
+                        dset.dtype.itemsize)
+        if cut is not None:
+            sample.append(cut)
+    sample.sort()
+    covered = sum( int(np.prod(shape)) for _, _, _, shape in sample )
+    return (coalesce_chunks(sample, data_check.block_bytes),
+            float(covered) / dset.size)
+
+
+def sample_patches(num_particles, fraction, random_state):
+    """
+    Pick a random sample of particle patches with at most `fraction` of
+    all particles: non-empty patches are drawn without replacement as long
+    as they fit, see sample_indices
+
+    Returns
+    -------
+    A tuple (sorted list of patch indices, fraction of the particles that
+    are covered)
+    """
+    num_particles = np.asarray(num_particles, dtype=np.uint64)
+    total = int(np.sum(num_particles, dtype=np.uint64))
+    if total == 0:
+        return list(range(len(num_particles))), 1.0
+    non_empty = np.flatnonzero(num_particles)
+    picked, _ = sample_indices(
+        [ int(num_particles[i]) for i in non_empty ],
+        int(fraction * total), random_state)
+    sample = [ int(non_empty[i]) for i in picked ]
+    used = int(np.sum(num_particles[sample], dtype=np.uint64))
+    return sample, float(used) / total
+
+
+def has_float_values(dtype):
+    """ Whether values of `dtype` can be NaN or infinite """
+    return dtype.kind in "fc"
+
+
+def find_non_finite(dset, block_bytes, blocks=None):
+    """
+    Scan a dataset for NaN and infinite values
+
+    The blocks are read in C order of their offsets. Since the elements of
+    a block never precede its offset in C order, the scan stops at the
+    first block that starts after the first non-finite value found so far.
+
+    Parameters
+    ----------
+    dset : an h5py.Dataset object
+        The dataset to scan
+
+    block_bytes : int
+        Upper bound of the size of the blocks that are read
+
+    blocks : list of tuples (element offset, slices) or None
+        Only scan these blocks, e.g. of sample_blocks (None: all blocks)
+
+    Returns
+    -------
+    None if all values are finite, otherwise a tuple (index, value) of the
+    non-finite value with the smallest index in C order (among the scanned
+    blocks)
+    """
+    if not has_float_values(dset.dtype) or dset.shape is None or \
+       dset.size == 0:
+        return None
+    if dset.shape == ():
+        value = dset[()]
+        return None if np.isfinite(value) else ((), value)
+
+    if blocks is None:
+        block = block_shape(dset.shape, dset.chunks, dset.dtype.itemsize,
+                            block_bytes)
+        blocks = iter_blocks(dset.shape, block)
+    else:
+        # e.g. coalesced reads, sorted by their offsets in the file
+        blocks = sorted(blocks, key=lambda block: tuple(block[0]))
+    first = None
+    for offset, slices in blocks:
+        if first is not None and tuple(offset) > first[0]:
+            break
+        data = dset[slices]
+        finite = np.isfinite(data)
+        if not finite.all():
+            # the first one in C order of the block is also the first one
+            # of the block in C order of the dataset
+            local = np.unravel_index(np.argmin(finite), data.shape)
+            index = tuple( int(o + i) for o, i in zip(offset, local) )
+            if first is None or index < first[0]:
+                first = index, data[local]
+    return first
+
+
+def find_non_finite_constant(value):
+    """
+    Check the `value` attribute of a constant record component
+
+    The component is not expanded to its `shape`: all its values are
+    finite if and only if `value` is.
+
+    Returns
+    -------
+    None if `value` is finite (or not a floating point value), otherwise
+    the value
+    """
+    value = np.asarray(value)
+    if not has_float_values(value.dtype) or np.isfinite(value).all():
+        return None
+    return value
+
+
+def exclusive_prefix_sum_mismatch(num_particles, num_particles_offset):
+    """
+    Check that `num_particles_offset` is the exclusive prefix sum of
+    `num_particles`, i.e. that the patches are stored one after the other
+
+    Returns
+    -------
+    None if it is, otherwise a tuple (patch, expected offset) of the first
+    patch with a wrong offset
+    """
+    num_particles = np.asarray(num_particles, dtype=np.uint64)
+    expected = np.zeros(len(num_particles), dtype=np.uint64)
+    np.cumsum(num_particles[:-1], out=expected[1:])
+    bad = np.flatnonzero(expected != np.asarray(num_particles_offset))
+    if len(bad) == 0:
+        return None
+    return int(bad[0]), int(expected[bad[0]])
+
+
+def component_reader(dset=None, value=None, unit_si=1.0):
+    """
+    Reader of slices of a one-dimensional record component, in SI units
+
+    Parameters
+    ----------
+    dset : an h5py.Dataset object or None
+        The dataset of the component
+
+    value : number
+        The value of a constant component (for dset=None)
+
+    unit_si : float
+        The `unitSI` of the component
+
+    Returns
+    -------
+    A function read(start, stop) that returns the values of the particles
+    start to stop (a scalar for constant components)
+    """
+    if dset is None:
+        value = np.float64(value) * unit_si
+        return lambda start, stop: value
+    return lambda start, stop: dset[start:stop] * np.float64(unit_si)
+
+
+def find_patch_outliers(num_particles, num_particles_offset,
+                        patch_offset, patch_extent, positions, block_bytes,
+                        rtol=1.e-6, patches=None):
+    """
+    Check that the particles of each patch are inside of its box
+
+    The particles are streamed patch by patch, in blocks of at most
+    `block_bytes` per position component.
+
+    Parameters
+    ----------
+    num_particles, num_particles_offset : arrays of int
+        The particles of patch `p` are the particles
+        num_particles_offset[p] to num_particles_offset[p] + num_particles[p]
+
+    patch_offset, patch_extent : dictionaries {string: array of float}
+        The box of each patch per position component, in SI units
+
+    positions : dictionary {string: (reader, reader)}
+        The component_reader of `position` and `positionOffset` per
+        position component
+
+    block_bytes : int
+        Upper bound of the size of the blocks that are read
+
+    rtol : float
+        Tolerance relative to the coordinates of the box, for rounding
+
+    patches : list of int or None
+        Only check these patches, e.g. of sample_patches (None: all)
+
+    Returns
+    -------
+    None if all particles are inside of their patch, otherwise a tuple
+    (patch, component, particle index, position in SI units) of the first
+    particle outside
+    """
+    block_length = max(1, block_bytes // 16)
+    if patches is None:
+        patches = range(len(num_particles))
+    for patch in patches:
+        start = int(num_particles_offset[patch])
+        stop = start + int(num_particles[patch])
+        for block_start in range(start, stop, block_length):
+            block_stop = min(block_start + block_length, stop)
+            for name, (position, position_offset) in positions.items():
+                low = patch_offset[name][patch]
+                high = low + patch_extent[name][patch]
+                tolerance = rtol * max(abs(low), abs(high))
+                x = position(block_start, block_stop) + \
+                    position_offset(block_start, block_stop)
+                outside = (x < low - tolerance) | (x > high + tolerance)
+                if np.any(outside):
+                    i = int(np.argmax(np.broadcast_to(
+                        outside, (block_stop - block_start,))))
+                    return (patch, name, block_start + i,
+                            float(np.broadcast_to(
+                                x, (block_stop - block_start,))[i]))
+    return None
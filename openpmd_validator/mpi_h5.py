@@ -0,0 +1,114 @@
+#!/usr/bin/env python
+#
+# Copyright (c) 2015-2017 Axel Huebl, Remi Lehe
+#
+# Permission to use, copy, modify, and/or distribute this software for any
+# purpose with or without fee is hereby granted, provided that the above
+# copyright notice and this permission notice appear in all copies.
+#
+# THE SOFTWARE IS PROVIDED "AS IS" AND THE AUTHOR DISCLAIMS ALL WARRANTIES
+# WITH REGARD TO THIS SOFTWARE INCLUDING ALL IMPLIED WARRANTIES OF
+# MERCHANTABILITY AND FITNESS. IN NO EVENT SHALL THE AUTHOR BE LIABLE FOR
+# ANY SPECIAL, DIRECT, INDIRECT, OR CONSEQUENTIAL DAMAGES OR ANY DAMAGES
+# WHATSOEVER RESULTING FROM LOSS OF USE, DATA OR PROFITS, WHETHER IN AN
+# ACTION OF CONTRACT, NEGLIGENCE OR OTHER TORTIOUS ACTION, ARISING OUT OF
+# OR IN CONNECTION WITH THE USE OR PERFORMANCE OF THIS SOFTWARE.
+#
+"""
+MPI-parallel checks with mpi4py (optional)
+
+All ranks run the same checks of the root group, then split the iterations
+of a file (or the files of a series) between them, either statically
+(round-robin) or dynamically: with work stealing, each rank takes the next
+unchecked task from a shared counter on rank 0. The results are gathered
+on rank 0, which reports them in the order of a serial check.
+
+mpi4py is only imported when MPI is requested, see mpi_context.
+"""
+
+import sys
+
+import numpy as np
+
+
+schedules = ("static", "dynamic")
+
+
+class MpiContext(object):
+    """ A communicator and the schedule of the tasks between its ranks """
+
+    def __init__(self, comm, schedule="static"):
+        if schedule not in schedules:
+            raise ValueError("Unknown MPI schedule '%s'" % schedule)
+        self.comm = comm
+        self.schedule = schedule
+        self.rank = comm.Get_rank()
+        self.size = comm.Get_size()
+
+    def tasks(self, n_tasks):
+        """
+        The indices of the tasks 0 ... `n_tasks`-1 that this rank runs.
+        Collective: all ranks must consume the generator to its end.
+        """
+        if self.schedule == "static" or self.size == 1:
+            for index in range(self.rank, n_tasks, self.size):
+                yield index
+            return
+
+        from mpi4py import MPI
+        # the counter of the next task lives on rank 0; every rank exposes
+        # a buffer of the same size, for simplicity
+        counter = np.zeros(1, dtype=np.int64)
+        window = MPI.Win.Create(counter, counter.itemsize, comm=self.comm)
+        one = np.ones(1, dtype=np.int64)
+        index = np.zeros(1, dtype=np.int64)
+        try:
+            while True:
+                window.Lock(0, MPI.LOCK_SHARED)
+                window.Fetch_and_op(one, index, 0, 0, MPI.SUM)
+                window.Unlock(0)
+                if index[0] >= n_tasks:
+                    break
+                yield int(index[0])
+        finally:
+            window.Free()
+
+    def gather_ordered(self, items):
+        """
+        Gather the (task index, result) pairs of all ranks on rank 0
+
+        Returns
+        -------
+        On rank 0, the results of all ranks in the order of the tasks;
+        an empty list on the other ranks
+        """
+        gathered = self.comm.gather(items, root=0)
+        if self.rank != 0:
+            return []
+        ordered = sorted((pair for items in gathered for pair in items),
+                         key=lambda pair: pair[0])
+        return [ result for _, result in ordered ]
+
+    def bcast(self, value):
+        """ The `value` of rank 0, on all ranks """
+        return self.comm.bcast(value, root=0)
+
+    def abort(self, code=1):
+        """ Stop all ranks, e.g. when one of them failed """
+        self.comm.Abort(code)
+
+
+def mpi_context(schedule="static"):
+    """
+    The MpiContext of all ranks (MPI.COMM_WORLD)
+
+    Returns
+    -------
+    None if mpi4py is not installed: the checks then run serially
+    """
+    try:
+        from mpi4py import MPI
+    except ImportError:
+        sys.stderr.write("mpi4py is not installed: checking serially\n")
+        return None
+    return MpiContext(MPI.COMM_WORLD, schedule)
@@ -0,0 +1,41 @@
+#!/usr/bin/env python
+#
+# Copyright (c) 2015-2017 Axel Huebl, Remi Lehe
+#
+# Permission to use, copy, modify, and/or distribute this software for any
+# purpose with or without fee is hereby granted, provided that the above
+# copyright notice and this permission notice appear in all copies.
+#
+# THE SOFTWARE IS PROVIDED "AS IS" AND THE AUTHOR DISCLAIMS ALL WARRANTIES
+# WITH REGARD TO THIS SOFTWARE INCLUDING ALL IMPLIED WARRANTIES OF
+# MERCHANTABILITY AND FITNESS. IN NO EVENT SHALL THE AUTHOR BE LIABLE FOR
+# ANY SPECIAL, DIRECT, INDIRECT, OR CONSEQUENTIAL DAMAGES OR ANY DAMAGES
+# WHATSOEVER RESULTING FROM LOSS OF USE, DATA OR PROFITS, WHETHER IN AN
+# ACTION OF CONTRACT, NEGLIGENCE OR OTHER TORTIOUS ACTION, ARISING OUT OF
+# OR IN CONNECTION WITH THE USE OR PERFORMANCE OF THIS SOFTWARE.
+#
+"""
+Parsers of the command line options that the tools share
+
+Only the standard library is imported, so that the thin client (see
+client_h5) can use them without loading the checks.
+"""
+
+
+def parse_bytes(arg):
+    """
+    Parse a number of bytes with an optional suffix k, M, G or T (powers
+    of 1024), e.g. 1.5G
+
+    Raises
+    ------
+    ValueError : if `arg` is not a non-negative, finite number of bytes
+    """
+    factor = 1
+    if len(arg) > 1 and arg[-1] in "kMGT":
+        factor = 1024**("kMGT".index(arg[-1]) + 1)
+        arg = arg[:-1]
+    value = float(arg) * factor
+    if not 0 <= value < float("inf"):
+        raise ValueError(arg)
+    return int(value)
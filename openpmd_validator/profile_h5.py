@@ -0,0 +1,154 @@
+#!/usr/bin/env python
+#
+# Copyright (c) 2015-2017 Axel Huebl, Remi Lehe
+#
+# Permission to use, copy, modify, and/or distribute this software for any
+# purpose with or without fee is hereby granted, provided that the above
+# copyright notice and this permission notice appear in all copies.
+#
+# THE SOFTWARE IS PROVIDED "AS IS" AND THE AUTHOR DISCLAIMS ALL WARRANTIES
+# WITH REGARD TO THIS SOFTWARE INCLUDING ALL IMPLIED WARRANTIES OF
+# MERCHANTABILITY AND FITNESS. IN NO EVENT SHALL THE AUTHOR BE LIABLE FOR
+# ANY SPECIAL, DIRECT, INDIRECT, OR CONSEQUENTIAL DAMAGES OR ANY DAMAGES
+# WHATSOEVER RESULTING FROM LOSS OF USE, DATA OR PROFITS, WHETHER IN AN
+# ACTION OF CONTRACT, NEGLIGENCE OR OTHER TORTIOUS ACTION, ARISING OUT OF
+# OR IN CONNECTION WITH THE USE OR PERFORMANCE OF THIS SOFTWARE.
+#
+"""
+Profile of the checks: calls, HDF5 operations and wall time per function
+
+The checks are not instrumented by default. Profile.instrument replaces
+selected functions of a module by counting wrappers for the time of a run,
+and Profile.restore puts the original functions back, so that the checks
+pay nothing when profiling is off.
+
+The time, HDF5 object opens and attribute reads of a function include those
+of the profiled functions it calls; its self time does not.
+"""
+
+import json
+import sys
+import time
+
+
+# a monotonic, high resolution clock where available
+clock = getattr(time, "perf_counter", time.time)
+
+# columns of the statistics of a function
+columns = ("calls", "seconds", "self_seconds", "opens", "attribute_reads")
+
+
+class Profile(object):
+    """
+    Statistics of the profiled functions of a run
+
+    `stats` maps the name of each function to a list with the values of
+    `columns`.
+    """
+
+    def __init__(self):
+        self.stats = {}
+        self.wall_seconds = 0.
+        # one [nested seconds, opens, attribute reads] entry per active call
+        self._stack = []
+        self._originals = []
+        self._start = None
+
+    def wrap(self, name, function):
+        """ A wrapper of `function` that adds its calls to `name` """
+        stack = self._stack
+
+        def profiled(*args, **kwargs):
+            frame = [0., 0, 0]
+            stack.append(frame)
+            start = clock()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                seconds = clock() - start
+                stack.pop()
+                entry = self.stats.get(name)
+                if entry is None:
+                    entry = self.stats[name] = [0, 0., 0., 0, 0]
+                entry[0] += 1
+                entry[1] += seconds
+                entry[2] += seconds - frame[0]
+                entry[3] += frame[1]
+                entry[4] += frame[2]
+                if stack:
+                    parent = stack[-1]
+                    parent[0] += seconds
+                    parent[1] += frame[1]
+                    parent[2] += frame[2]
+
+        profiled.__name__ = getattr(function, "__name__", name)
+        profiled.__doc__ = function.__doc__
+        return profiled
+
+    def instrument(self, namespace, names):
+        """
+        Replace the functions `names` of the module dictionary `namespace`
+        (e.g. `globals()`) by profiled wrappers, until restore is called
+        """
+        for name in names:
+            self._originals.append((namespace, name, namespace[name]))
+            namespace[name] = self.wrap(name, namespace[name])
+        self._start = clock()
+
+    def restore(self):
+        """ Put back the functions replaced by instrument """
+        for namespace, name, function in reversed(self._originals):
+            namespace[name] = function
+        self._originals = []
+        if self._start is not None:
+            self.wall_seconds += clock() - self._start
+            self._start = None
+
+    def count(self, opens=0, attribute_reads=0):
+        """ Add HDF5 operations to the innermost active profiled call """
+        if self._stack:
+            frame = self._stack[-1]
+            frame[1] += opens
+            frame[2] += attribute_reads
+
+    def merge(self, stats):
+        """ Add the `stats` of another Profile, e.g. of a worker process """
+        for name, values in stats.items():
+            entry = self.stats.get(name)
+            if entry is None:
+                self.stats[name] = list(values)
+            else:
+                for i, value in enumerate(values):
+                    entry[i] += value
+
+    def table(self):
+        """ The statistics as lines of text, by decreasing time """
+        lines = [ "%-24s %9s %11s %11s %9s %11s"
+                  % ("function", "calls", "time [s]", "self [s]", "opens",
+                     "attr reads") ]
+        for name, (calls, seconds, self_seconds, opens, attribute_reads) in \
+                sorted(self.stats.items(), key=lambda item: -item[1][1]):
+            lines.append("%-24s %9d %11.4f %11.4f %9d %11d"
+                         % (name, calls, seconds, self_seconds, opens,
+                            attribute_reads))
+        lines.append("Wall time of the run: %.4f s" % self.wall_seconds)
+        return lines
+
+    def print_table(self, stream=None):
+        """ Print the table to `stream` (default: stderr) """
+        stream = stream or sys.stderr
+        for line in self.table():
+            stream.write(line + "\n")
+        stream.flush()
+
+    def as_dict(self):
+        """ The statistics as a JSON-serializable dictionary """
+        return {"wall_seconds": self.wall_seconds,
+                "functions": dict(
+                    (name, dict(zip(columns, values)))
+                    for name, values in self.stats.items())}
+
+    def write_json(self, file_name):
+        """ Write the statistics of as_dict to the file `file_name` """
+        with open(file_name, "w") as json_file:
+            json.dump(self.as_dict(), json_file, indent=2, sort_keys=True)
@@ -38,6 +38,9 @@ setup(
     entry_points={
         'console_scripts': [
         'openPMD_check_h5 = openpmd_validator.check_h5:main',
+        'openPMD_check_h5_batch = openpmd_validator.check_h5:batch_main',
+        'openPMD_check_h5_daemon = openpmd_validator.daemon_h5:main',
+        'openPMD_check_h5_client = openpmd_validator.client_h5:main',
         'openPMD_createExamples_h5 = openpmd_validator.createExamples_h5:main',
         ]
     },
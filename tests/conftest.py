@@ -0,0 +1,127 @@
+"""
+Fixtures shared by the behavioural tests
+
+The checks run as `openPMD_check_h5` does, in a fresh interpreter each, on
+small example files written with createExamples_h5 and then modified.
+
+Run the tests with `python -m pytest tests` from the top of the repository.
+"""
+import json
+import os
+import subprocess
+import sys
+
+import h5py as h5
+import pytest
+
+import openpmd_validator
+from openpmd_validator.createExamples_h5 import write_example
+
+
+# the directory that holds the tested openpmd_validator package
+package_root = os.path.dirname(os.path.dirname(
+    os.path.abspath(openpmd_validator.__file__)))
+
+
+def start_python(tmp_path, args):
+    """
+    Start `python args` in `tmp_path`, with pipes for stdin, stdout and
+    stderr
+
+    The cache of the check goes to `tmp_path`.
+
+    Returns
+    -------
+    A subprocess.Popen object
+    """
+    env = dict(os.environ)
+    env["XDG_CACHE_HOME"] = str(tmp_path / "cache")
+    env["PYTHONPATH"] = os.pathsep.join(
+        [package_root] + [p for p in [env.get("PYTHONPATH")] if p])
+    return subprocess.Popen(
+        [sys.executable] + list(args), stdin=subprocess.PIPE,
+        stdout=subprocess.PIPE, stderr=subprocess.PIPE, env=env,
+        cwd=str(tmp_path), universal_newlines=True)
+
+
+def run_python(tmp_path, args, stdin=None):
+    """
+    Run `python args` in `tmp_path`, with `stdin` as input, see
+    start_python
+
+    Returns
+    -------
+    A tuple (exit status, stdout, stderr)
+    """
+    process = start_python(tmp_path, args)
+    out, err = process.communicate(stdin)
+    assert "Traceback" not in err, err
+    return process.returncode, out, err
+
+
+def run_module(tmp_path, module, args):
+    """
+    Run `python -m openpmd_validator.<module> args`, see run_python
+    """
+    return run_python(tmp_path, ["-m", "openpmd_validator." + module] +
+                      list(args))
+
+
+@pytest.fixture
+def check(tmp_path):
+    """
+    Run the check with a command line, see run_module
+    """
+    def check(*args):
+        return run_module(tmp_path, "check_h5", args)
+    return check
+
+
+@pytest.fixture
+def check_jsonl(check):
+    """
+    Run the check with a command line and --format jsonl
+
+    The check returns a tuple (findings that are no notes, summary record).
+    """
+    def check_jsonl(*args):
+        status, out, err = check("--format", "jsonl", *args)
+        records = [json.loads(line) for line in out.splitlines()]
+        assert records[-1]["type"] == "summary"
+        assert status == min(records[-1]["errors"], 255)
+        findings = [r for r in records[:-1] if r["severity"] != "note"]
+        return findings, records[-1]
+    return check_jsonl
+
+
+@pytest.fixture
+def small_example(tmp_path):
+    """
+    Write a small valid example file, with particle patches, to `tmp_path`
+
+    The writer takes the file name and the numbers of iterations and
+    species and returns the path of the file.
+    """
+    def small_example(name, iterations=1, species=1, **kwargs):
+        file_name = str(tmp_path / name)
+        write_example(file_name, iterations=iterations, cells=(8, 16),
+                      particles=16, species=species, **kwargs)
+        return file_name
+    return small_example
+
+
+@pytest.fixture
+def series_file(small_example):
+    """ A valid file with 12 iterations and 2 species """
+    return small_example("multi.h5", iterations=12, species=2)
+
+
+@pytest.fixture
+def bad_file(small_example):
+    """ A file with 3 errors in each of its 3 iterations """
+    file_name = small_example("bad.h5", iterations=3)
+    with h5.File(file_name, "r+") as f:
+        for iteration in f["data"].values():
+            for mesh in iteration["meshes"].values():
+                del mesh.attrs["axisLabels"]
+    return file_name
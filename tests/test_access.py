@@ -0,0 +1,86 @@
+"""
+Tests of the HDF5 file access settings
+"""
+import h5py as h5
+import numpy as np
+import pytest
+
+from openpmd_validator import access_h5
+from openpmd_validator.access_h5 import FileAccess, is_paged
+
+
+@pytest.fixture
+def files(tmp_path):
+    """ A file with the default file space strategy and a paged one """
+    names = {"default": str(tmp_path / "default.h5"),
+             "paged": str(tmp_path / "paged.h5")}
+    with h5.File(names["default"], "w") as f:
+        f["x"] = np.arange(8)
+    with h5.File(names["paged"], "w", fs_strategy="page",
+                 fs_page_size=4096) as f:
+        f["x"] = np.arange(8)
+    return names
+
+
+def page_buffer_size(f):
+    return f.id.get_access_plist().get_page_buffer_size()[0]
+
+
+def test_page_buffer(files):
+    access = FileAccess(page_buf_size=1024**2, mdc_bytes=8 * 1024**2)
+    with access.open(files["paged"]) as f:
+        assert is_paged(f)
+        assert page_buffer_size(f) == 1024**2
+        assert f.id.get_mdc_config().initial_size == 8 * 1024**2
+    with access.open(files["default"]) as f:
+        assert not is_paged(f)
+        assert f["x"][-1] == 7
+
+
+def test_page_buffer_refused(files, monkeypatch):
+    # older HDF5 versions refuse a page buffer for files that are not paged
+    opened = []
+    File = h5.File
+
+    def strict_file(name, mode, **kwargs):
+        opened.append(sorted(kwargs))
+        f = File(name, mode, **kwargs)
+        if "page_buf_size" in kwargs and not is_paged(f):
+            f.close()
+            raise OSError("Unable to open file (file is not paged)")
+        return f
+
+    monkeypatch.setattr(access_h5.h5, "File", strict_file)
+    access = FileAccess(page_buf_size=1024**2, rdcc_nbytes=4 * 1024**2)
+    with access.open(files["default"]) as f:
+        assert page_buffer_size(f) == 0
+        assert f.id.get_access_plist().get_cache()[2] == 4 * 1024**2
+    assert opened == [["page_buf_size", "rdcc_nbytes", "swmr"],
+                      ["rdcc_nbytes", "swmr"]]
+    # other errors are not retried
+    with pytest.raises(OSError):
+        FileAccess(rdcc_nbytes=1024).open(files["default"] + ".missing")
+
+
+def test_swmr_latest(tmp_path):
+    file_name = str(tmp_path / "swmr.h5")
+    with h5.File(file_name, "w", libver="latest") as f:
+        f["x"] = np.arange(8)
+        latest = f.libver
+    access = FileAccess(libver="earliest")
+    with access.open(file_name) as f:
+        assert f.libver[0] == "earliest"
+        assert not f.swmr_mode
+    # the single-writer/multiple-reader mode needs the latest bounds
+    with access.open(file_name, swmr=True) as f:
+        assert f.libver == latest
+        assert f.swmr_mode
+    assert access.libver == "earliest"
+
+
+def test_invalid_settings():
+    with pytest.raises(ValueError):
+        FileAccess(driver="mpio")
+    with pytest.raises(ValueError):
+        FileAccess(libver="v999")
+    assert FileAccess().describe() == "defaults"
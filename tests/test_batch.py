@@ -0,0 +1,101 @@
+"""
+Tests of the batch mode
+"""
+import json
+import os
+
+import pytest
+
+from conftest import run_python
+from openpmd_validator.check_h5 import in_shard, shard_key
+
+
+batch_code = "from openpmd_validator.check_h5 import batch_main; batch_main()"
+
+
+@pytest.fixture
+def check_batch(tmp_path):
+    """
+    Run the batch mode with a command line and --format jsonl
+
+    The check returns a tuple (names of the files reported, summary).
+    """
+    def check_batch(*args, **kwargs):
+        status, out, err = run_python(
+            tmp_path, ["-c", batch_code, "--format", "jsonl"] + list(args),
+            stdin=kwargs.get("stdin"))
+        records = [json.loads(line) for line in out.splitlines()]
+        assert records[-1]["type"] == "summary"
+        assert status == min(records[-1]["errors"], 255)
+        files = [r["file"] for r in records if r["type"] == "file"]
+        return files, records[-1]
+    return check_batch
+
+
+@pytest.fixture
+def archive(tmp_path, small_example):
+    """ A directory `archive` of 9 files """
+    os.mkdir(str(tmp_path / "archive"))
+    for i in range(9):
+        small_example(os.path.join("archive", "run%d.h5" % i))
+    return tmp_path / "archive"
+
+
+def mount(archive):
+    """ Link the directory `archive` as `mount` next to it """
+    try:
+        os.symlink(str(archive), str(archive.parent / "mount"))
+    except (AttributeError, NotImplementedError, OSError):
+        pytest.skip("cannot create symbolic links")
+
+
+def test_batch(check_batch, archive):
+    with open(str(archive / "broken.h5"), "w") as f:
+        f.write("not HDF5")
+    files, summary = check_batch("archive/*.h5", "-j", "2")
+    assert sorted(os.path.basename(f) for f in files) == \
+        ["broken.h5"] + ["run%d.h5" % i for i in range(9)]
+    assert summary["errors"] == 1
+
+
+def test_shard_key(tmp_path, archive):
+    mount(archive)
+    key = shard_key(str(archive / "run1.h5"), str(archive))
+    assert key == "run1.h5"
+    assert shard_key(str(tmp_path / "mount" / "run1.h5"),
+                     str(tmp_path / "mount")) == key
+    assert shard_key(os.path.join(os.curdir, "run1.h5"), os.curdir) == key
+    assert shard_key("run1.h5") == key
+
+
+@pytest.mark.parametrize("n", [1, 3])
+def test_shards(check_batch, archive, n):
+    mount(archive)
+    spellings = [["archive"], ["./archive/"], [str(archive)], ["mount"],
+                 ["mount/*.h5"]]
+    all_files = sorted(os.listdir(str(archive)))
+    shards = []
+    for i in range(n):
+        shard = None
+        for args in spellings:
+            files, summary = check_batch("--shard", "%d/%d" % (i, n), *args)
+            files = sorted(os.path.basename(f) for f in files)
+            assert shard is None or files == shard
+            shard = files
+        assert shard == sorted(f for f in all_files
+                               if in_shard(str(archive / f), (i, n),
+                                           str(archive)))
+        shards += shard
+    # the shards are disjoint and cover all files
+    assert sorted(shards) == all_files
+
+
+def test_shard_root(check_batch, archive):
+    stdin = "\n".join(os.path.join("archive", f)
+                      for f in os.listdir(str(archive)))
+    for i in range(3):
+        files, summary = check_batch("--shard", "%d/3" % i, "archive")
+        from_stdin, summary = check_batch("--shard", "%d/3" % i,
+                                          "--shard-root", "archive", "-",
+                                          stdin=stdin)
+        assert sorted(from_stdin) == sorted(files)
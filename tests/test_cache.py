@@ -0,0 +1,106 @@
+"""
+Tests of the reuse of the results of unchanged iterations
+"""
+import json
+import os
+
+import h5py as h5
+import numpy as np
+
+from openpmd_validator.cache_h5 import ResultCache, object_fingerprint
+from openpmd_validator.check_h5 import Findings, check_file
+
+
+def test_cache_hit_same_output(tmp_path, check, series_file, bad_file):
+    for file_name in (series_file, bad_file):
+        fresh = check("-i", file_name, "-v")
+        cold = check("-i", file_name, "-v", "--cache")
+        assert os.listdir(str(tmp_path / "cache" / "openpmd_validator"))
+        warm = check("-i", file_name, "-v", "--cache")
+        assert fresh == cold == warm
+
+
+def test_cache_is_opt_in(tmp_path, check, series_file):
+    check("-i", series_file)
+    assert not os.path.exists(str(tmp_path / "cache"))
+
+
+def test_cache_partial_check(check, series_file):
+    fresh = check("-i", series_file)
+    check("-i", series_file, "--cache")
+    check("-i", series_file, "--cache", "--iterations", "3:5")
+    assert check("-i", series_file, "--cache") == fresh
+
+
+def test_cache_changed_iteration(check, check_jsonl, series_file):
+    check("-i", series_file, "--cache")
+    with h5.File(series_file, "r+") as f:
+        del f["data/5/meshes/E"].attrs["axisLabels"]
+    findings, summary = check_jsonl("-i", series_file, "--cache")
+    assert [(r["path"], r["rule"]) for r in findings] == \
+        [("/data/5/meshes/E", "attribute-missing")]
+    assert check("-i", series_file, "--cache") == check("-i", series_file)
+
+
+def test_cache_changed_attribute_value(check_jsonl, series_file):
+    check_jsonl("-i", series_file, "--cache")
+    with h5.File(series_file, "r+") as f:
+        attrs = f["data/5/meshes/E"].attrs
+        grid_unit = attrs["gridUnitSI"]
+        del attrs["gridUnitSI"]
+        attrs.create("gridUnitSI", grid_unit, dtype=np.float32)
+    findings, summary = check_jsonl("-i", series_file, "--cache")
+    assert summary["errors"] == 1
+    assert [(r["path"], r["rule"]) for r in findings] == \
+        [("/data/5/meshes/E", "attribute-type")]
+
+
+def test_cache_not_used_for_data(tmp_path, check_jsonl, small_example):
+    file_name = small_example("nan.h5", iterations=2)
+    for options in (["--cache", "--check-data"],
+                    ["--cache", "--sample-bytes", "1M"]):
+        findings, summary = check_jsonl("-i", file_name, *options)
+        assert summary["errors"] == 0
+    with h5.File(file_name, "r+") as f:
+        f["data/1/meshes/E/x"][0, 1] = np.nan
+    for options in (["--cache", "--check-data"],
+                    ["--cache", "--sample-bytes", "1M"]):
+        findings, summary = check_jsonl("-i", file_name, *options)
+        assert summary["errors"] == 1
+    assert not os.path.exists(str(tmp_path / "cache"))
+
+
+def test_fingerprint(small_example):
+    file_name = small_example("link.h5")
+    with h5.File(file_name, "r+") as f:
+        f["data/0/particles/ions"] = h5.SoftLink("/data/0/particles/electrons")
+        iteration = f["data/0"]
+        fingerprint = object_fingerprint(iteration)
+        assert object_fingerprint(iteration) == fingerprint
+        # a value of the same type and size, through a soft link
+        f["data/0/particles/ions/charge"].attrs["unitSI"] = 2.
+        assert object_fingerprint(iteration) != fingerprint
+
+
+def cached_shards(directory):
+    """ The iterations of each shard in the cache entries in `directory` """
+    shards = {}
+    for name in os.listdir(directory):
+        with open(os.path.join(directory, name)) as entry_file:
+            entry = json.load(entry_file)
+        shards[entry["shard"]] = sorted(entry["iterations"], key=int)
+    return shards
+
+
+def test_cache_shards(tmp_path, series_file):
+    directory = str(tmp_path / "shards")
+    cache = ResultCache(directory, shard_size=5)
+    check_file(series_file, findings=Findings(echo=False), cache=cache)
+    shards = {0: ["0", "1", "2", "3", "4"], 1: ["5", "6", "7", "8", "9"],
+              2: ["10", "11"]}
+    assert cached_shards(directory) == shards
+
+    # a partial check keeps the entries of the other iterations
+    check_file(series_file, findings=Findings(echo=False), cache=cache,
+               iterations=slice(6, 7))
+    assert cached_shards(directory) == shards
@@ -0,0 +1,113 @@
+"""
+Tests of the validation daemon and its client
+"""
+import json
+import multiprocessing
+import os
+import signal
+import socket
+import threading
+
+import pytest
+
+from conftest import run_module, start_python
+from openpmd_validator.daemon_h5 import ValidationServer
+
+
+pytestmark = pytest.mark.skipif(not hasattr(socket, "AF_UNIX"),
+                                reason="needs Unix sockets")
+
+
+@pytest.fixture
+def socket_path(tmp_path):
+    return str(tmp_path / "daemon.sock")
+
+
+@pytest.fixture
+def daemon(tmp_path, socket_path):
+    """ A daemon with one worker that listens on `socket_path` """
+    process = start_python(tmp_path, ["-m", "openpmd_validator.daemon_h5",
+                                      "--socket", socket_path, "-j", "1"])
+    try:
+        assert process.stdout.readline().startswith("Listening")
+        yield process
+    finally:
+        if process.poll() is None:
+            process.terminate()
+        process.communicate()
+
+
+@pytest.fixture
+def client(tmp_path, socket_path):
+    """ Run the client with a command line, see run_module """
+    def client(*args):
+        return run_module(tmp_path, "client_h5",
+                          ["--socket", socket_path] + list(args))
+    return client
+
+
+def reports(check, client, file_name, *options):
+    """ The reports of the check and of the client, which must agree """
+    for output_format in ("text", "jsonl"):
+        expected = check("-i", file_name, "--format", output_format,
+                         *options)
+        status, out, err = client("-i", file_name, "--format",
+                                  output_format, *options)
+        assert (status, out) == expected[:2]
+        yield err
+
+
+def test_daemon_client(daemon, check, client, series_file, bad_file):
+    for file_name in (series_file, bad_file):
+        for options in ([], ["-v"], ["--max-errors", "2"]):
+            for err in reports(check, client, file_name, *options):
+                assert err == ""
+    status, out, err = client("-i", bad_file, "--format", "jsonl")
+    assert status == 3
+    assert json.loads(out.splitlines()[-1]) == {
+        "type": "summary", "errors": 3, "warnings": 0, "truncated": False,
+        "partial": None}
+
+    assert client("--ping") == (0, "ok\n", "")
+    assert client("--shutdown")[0] == 0
+    assert daemon.wait() == 0
+
+
+def test_client_without_daemon(check, client, bad_file):
+    # the file is checked in the client process instead
+    for err in reports(check, client, bad_file):
+        assert "Could not reach the daemon" in err
+    status, out, err = client("--ping")
+    assert status == 1
+    assert "Could not reach the daemon" in err
+
+
+@pytest.fixture
+def stopped_server(socket_path):
+    """
+    A daemon in this process whose only worker is stopped, so that it
+    never answers a check
+    """
+    server = ValidationServer(socket_path, 1, timeout=1.)
+    workers = multiprocessing.active_children()
+    thread = threading.Thread(target=server.serve_forever)
+    thread.start()
+    try:
+        for worker in workers:
+            os.kill(worker.pid, signal.SIGSTOP)
+        yield server
+    finally:
+        for worker in workers:
+            os.kill(worker.pid, signal.SIGCONT)
+        server.shutdown()
+        thread.join()
+        server.server_close()
+
+
+def test_daemon_timeout(stopped_server, check, client, bad_file):
+    response = stopped_server.respond({"command": "check", "file": bad_file})
+    assert response["type"] == "error"
+    assert "did not finish within 1 s" in response["message"]
+    # the client checks the file itself instead
+    for err in reports(check, client, bad_file):
+        assert "did not finish" in err
@@ -0,0 +1,50 @@
+"""
+Tests of the checks of the data of record components
+"""
+import h5py as h5
+import numpy as np
+import pytest
+
+from openpmd_validator.data_h5 import find_non_finite, iter_blocks
+
+
+@pytest.mark.parametrize("values, messages", [
+    ({"data/1/meshes/E/x": ((0, 1), np.nan),
+      "data/1/meshes/E/y": ((2, 3), -np.inf)},
+     ["nan at index [0, 1]", "-inf at index [2, 3]"]),
+    ({"data/1/particles/electrons/momentum/z": ((5,), np.inf)},
+     ["inf at index [5]"]),
+])
+def test_non_finite_data(check_jsonl, small_example, values, messages):
+    file_name = small_example("nan.h5", iterations=2)
+    with h5.File(file_name, "r+") as f:
+        for path, (index, value) in values.items():
+            f[path][index] = value
+
+    findings, summary = check_jsonl("-i", file_name, "--no-cache")
+    assert findings == []
+
+    for options in ([], ["-j", "2"]):
+        findings, summary = check_jsonl("-i", file_name, "--no-cache",
+                                        "--check-data", *options)
+        assert sorted((r["path"], r["rule"]) for r in findings) == \
+            sorted(("/" + path, "data-finite") for path in values)
+        for finding, message in zip(findings, messages):
+            assert message in finding["message"]
+
+
+def test_first_non_finite_index(tmp_path):
+    with h5.File(str(tmp_path / "blocks.h5"), "w") as f:
+        dset = f.create_dataset("values", shape=(4, 4), chunks=(2, 2),
+                                dtype=np.float64, fillvalue=0.)
+        # in the second row of the first chunk, and in the first row of
+        # the second chunk, which comes first in C order
+        dset[1, 0] = np.nan
+        dset[0, 3] = np.inf
+        dset[3, 3] = -np.inf
+        assert find_non_finite(dset, 32) == ((0, 3), np.inf)
+        # blocks in another order, e.g. of a sample
+        blocks = list(reversed(list(iter_blocks(dset.shape, (2, 2)))))
+        assert find_non_finite(dset, 32, blocks) == ((0, 3), np.inf)
+        assert find_non_finite(dset, 32, blocks[:2]) == ((3, 3), -np.inf)
+        assert find_non_finite(dset, 1024) == ((0, 3), np.inf)
@@ -0,0 +1,64 @@
+"""
+Tests of the attribute rules of the ED-PIC extension
+"""
+import h5py as h5
+import numpy as np
+import pytest
+
+
+meshes = "data/0/meshes"
+
+
+def missing(path, name):
+    """ The message of a missing required attribute """
+    return "Attribute %s (required) does NOT exist in `/%s`!" % (name, path)
+
+
+@pytest.mark.parametrize("attrs, errors", [
+    # valid
+    ({}, []),
+    # fieldSolverParameters is required for some solvers only
+    ({meshes: {"fieldSolver": "Yee"}}, []),
+    ({meshes: {"fieldSolver": "other"}},
+     [missing(meshes, "fieldSolverParameters")]),
+    ({meshes: {"fieldSolver": "GPSTD"}},
+     [missing(meshes, "fieldSolverParameters")]),
+    ({meshes: {"fieldSolver": "GPSTD", "fieldSolverParameters": "order=8"}},
+     []),
+    # fieldSmoothing is required and counted for each mesh record
+    ({meshes + "/E": {"fieldSmoothing": None}},
+     [missing(meshes + "/E", "fieldSmoothing")]),
+    ({meshes + "/E": {"fieldSmoothing": "Binomial"}},
+     [missing(meshes + "/E", "fieldSmoothingParameters")]),
+    # the records in file order, then the meshes group
+    ({meshes: {"fieldSolver": None, "chargeCorrection": "other"},
+      meshes + "/B": {"fieldSmoothing": None},
+      meshes + "/E": {"fieldSmoothing": None}},
+     [missing(meshes + "/B", "fieldSmoothing"),
+      missing(meshes + "/E", "fieldSmoothing"),
+      missing(meshes, "fieldSolver"),
+      missing(meshes, "chargeCorrectionParameters")]),
+])
+def test_edpic_rules(check_jsonl, small_example, attrs, errors):
+    file_name = small_example("edpic.h5")
+    with h5.File(file_name, "r+") as f:
+        for path, values in attrs.items():
+            for name, value in values.items():
+                if value is None:
+                    del f[path].attrs[name]
+                else:
+                    f[path].attrs[name] = np.string_(value)
+    findings, summary = check_jsonl("-i", file_name)
+    assert [r["message"] for r in findings] == errors
+    assert all(r["severity"] == "error" and r["rule"] == "attribute-missing"
+               for r in findings)
+    assert summary["errors"] == len(errors)
+
+    # without the extension in the file, its rules do not apply, and
+    # --EDPIC requires it
+    with h5.File(file_name, "r+") as f:
+        f.attrs["openPMDextension"] = np.uint32(0)
+    findings, summary = check_jsonl("-i", file_name)
+    assert findings == []
+    findings, summary = check_jsonl("-i", file_name, "--EDPIC")
+    assert [(r["path"], r["rule"]) for r in findings] == [("/", "extension")]
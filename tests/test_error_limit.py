@@ -0,0 +1,21 @@
+"""
+Tests of --max-errors and --fail-fast
+"""
+import pytest
+
+
+@pytest.mark.parametrize("options, errors, truncated", [
+    ([], 3, False),
+    (["--max-errors", "2"], 2, True),
+    (["--max-errors", "2", "-j", "2"], 2, True),
+    (["--max-errors", "4"], 3, False),
+    (["--fail-fast"], 1, True),
+])
+def test_error_limit(check, check_jsonl, bad_file, options, errors,
+                     truncated):
+    findings, summary = check_jsonl("-i", bad_file, "--no-cache", *options)
+    assert len(findings) == summary["errors"] == errors
+    assert summary["truncated"] is truncated
+    status, out, err = check("-i", bad_file, "--no-cache", *options)
+    assert status == errors
+    assert ("(truncated: stopped at the error limit)" in out) is truncated
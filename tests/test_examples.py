@@ -0,0 +1,88 @@
+"""
+Tests of the example generator
+"""
+import h5py as h5
+import numpy as np
+import pytest
+
+from openpmd_validator.createExamples_h5 import write_example
+
+
+def file_contents(file_name):
+    """
+    The attributes and the data of all objects in a file, but the `date`
+    of the file, which changes with each run
+
+    Returns
+    -------
+    A dictionary {path: (attributes, data or None)}
+    """
+    contents = {}
+
+    def add(name, obj):
+        attrs = dict( (key, np.asarray(value).tolist())
+                      for key, value in obj.attrs.items() if key != "date" )
+        data = obj[()].tolist() if isinstance(obj, h5.Dataset) else None
+        contents[name] = (attrs, data)
+
+    with h5.File(file_name, "r") as f:
+        add("/", f)
+        f.visititems(add)
+    return contents
+
+
+@pytest.mark.parametrize("cells, storage", [
+    ((64,), None),
+    ((8, 16), {"chunks": 256}),
+    ((4, 6, 8), {"chunks": True, "compression": "gzip"}),
+])
+def test_example_parameters(tmp_path, check_jsonl, cells, storage):
+    file_name = str(tmp_path / "example.h5")
+    assert write_example(file_name, iterations=2, cells=cells, particles=40,
+                         species=3, storage=storage) == [file_name]
+    findings, summary = check_jsonl("-i", file_name, "--check-data")
+    assert findings == []
+
+    with h5.File(file_name, "r") as f:
+        assert sorted(f["data"].keys(), key=int) == ["0", "1"]
+        assert len(f["data/1/particles"]) == 3
+        assert f["data/1/meshes/E/x"].shape == cells
+        assert f["data/1/particles/electrons/position/x"].shape == (40,)
+        dset = f["data/1/meshes/E/x"]
+        if storage is None:
+            assert dset.chunks is None
+        elif storage["chunks"] is not True:
+            assert dset.chunks is not None
+            assert np.prod(dset.chunks) * dset.dtype.itemsize <= 256
+        assert dset.compression == (storage or {}).get("compression")
+
+    # the same data for the same seed, whatever the storage layout
+    other = str(tmp_path / "other.h5")
+    write_example(other, iterations=2, cells=cells, particles=40, species=3)
+    assert file_contents(other) == file_contents(file_name)
+    write_example(other, iterations=2, cells=cells, particles=40, species=3,
+                  seed=1)
+    assert file_contents(other) != file_contents(file_name)
+
+
+
+def test_file_based_workers(tmp_path, check_jsonl):
+    series = {}
+    for workers in (1, 2):
+        directory = tmp_path / ("workers%d" % workers)
+        directory.mkdir()
+        pattern = str(directory / "data_%T.h5")
+        file_names = write_example(pattern, iterations=3, cells=(8, 16),
+                                   particles=16, workers=workers,
+                                   iteration_encoding="fileBased")
+        assert file_names == [pattern.replace("%T", str(iteration))
+                              for iteration in range(3)]
+        series[workers] = [file_contents(name) for name in file_names]
+        for iteration, name in enumerate(file_names):
+            findings, summary = check_jsonl("-i", name)
+            assert findings == []
+            assert [path for path in series[workers][iteration]
+                    if path.startswith("data/") and path.count("/") == 1] \
+                == ["data/%d" % iteration]
+    # the same files whatever the number of workers
+    assert series[1] == series[2]
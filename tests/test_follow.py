@@ -0,0 +1,80 @@
+"""
+Tests of the follow mode
+"""
+import json
+import time
+
+import h5py as h5
+import numpy as np
+import pytest
+
+from conftest import start_python
+
+
+def test_follow_options_need_follow(check, series_file):
+    for option in ("--poll", "--idle-timeout"):
+        status, out, err = check("-i", series_file, option, "1")
+        assert out.startswith("Options --poll and --idle-timeout need "
+                              "--follow!")
+
+
+def follow(tmp_path, file_name, update=None):
+    """
+    Follow `file_name` until it is idle for 3 s, and call `update` after
+    the follow mode started
+
+    Returns
+    -------
+    A tuple (findings that are no notes, summary record)
+    """
+    process = start_python(tmp_path, [
+        "-m", "openpmd_validator.check_h5", "-i", file_name, "--follow",
+        "--poll", "0.1", "--idle-timeout", "3", "--format", "jsonl"])
+    if update is not None:
+        time.sleep(1.5)
+        # the follow mode opens the file at each poll
+        for attempt in range(100):
+            try:
+                with h5.File(file_name, "r+") as f:
+                    update(f)
+                break
+            except (IOError, OSError):
+                time.sleep(0.05)
+    out, err = process.communicate()
+    assert "Traceback" not in err, err
+    records = [json.loads(line) for line in out.splitlines()]
+    assert records[-1]["type"] == "summary"
+    findings = [r for r in records[:-1] if r["severity"] != "note"]
+    return findings, records[-1]
+
+
+@pytest.fixture
+def unfinished_file(small_example):
+    """ A file whose root misses the attribute iterationFormat """
+    file_name = small_example("unfinished.h5", iterations=2)
+    with h5.File(file_name, "r+") as f:
+        del f.attrs["iterationFormat"]
+    return file_name
+
+
+def finish(f):
+    f.attrs["iterationFormat"] = np.bytes_("/data/%T/")
+
+
+def test_follow(tmp_path, series_file):
+    findings, summary = follow(tmp_path, series_file)
+    assert findings == []
+    assert summary["errors"] == 0
+
+
+def test_follow_root_rechecked(tmp_path, unfinished_file):
+    findings, summary = follow(tmp_path, unfinished_file, finish)
+    assert findings == []
+    assert summary["errors"] == 0
+
+
+def test_follow_root_reported(tmp_path, unfinished_file):
+    findings, summary = follow(tmp_path, unfinished_file)
+    assert [(r["path"], r["rule"]) for r in findings] == \
+        [("/", "attribute-missing")]
+    assert summary["errors"] == 1
@@ -0,0 +1,101 @@
+"""
+Tests of the metadata index of a file
+"""
+import h5py as h5
+import numpy as np
+import pytest
+from h5py import h5a
+from h5py._hl.attrs import AttributeManager
+
+from openpmd_validator.check_h5 import IndexAttrs, attr_types, build_index, \
+    stored_types
+
+
+@pytest.fixture
+def linked_file(small_example):
+    """ A file whose species `electrons` is linked four more times """
+    file_name = small_example("link.h5")
+    with h5.File(file_name, "r+") as f:
+        particles = f["data/0/particles"]
+        particles["ions"] = h5.SoftLink("/data/0/particles/electrons")
+        particles["hard"] = particles["electrons"]
+        # a link back to a group above is not walked again
+        particles["electrons"]["loop"] = h5.SoftLink("/data/0/particles")
+        # neither are dangling soft links
+        f["data/0/meshes/missing"] = h5.SoftLink("/data/0/nothing")
+    return file_name
+
+
+def test_index_links(linked_file):
+    with h5.File(linked_file, "r") as f:
+        root = build_index(f, "/data/0/")
+        particles = root["data/0/particles"]
+        assert sorted(particles.keys()) == ["electrons", "hard", "ions"]
+        for name in ("electrons", "hard", "ions"):
+            species = particles[name]
+            assert species.name == "/data/0/particles/" + name
+            assert "position" in species.keys()
+            assert species["position/x"].shape == \
+                f["data/0/particles/electrons/position/x"].shape
+        assert "loop" in particles["electrons"].keys()
+        assert "particles" not in particles["electrons/loop"].keys()
+        assert "missing" not in root["data/0/meshes"].keys()
+
+
+def test_check_links(check, linked_file):
+    with h5.File(linked_file, "r+") as f:
+        del f["data/0/particles/electrons/loop"]
+        del f["data/0/meshes/missing"]
+    status, out, err = check("-i", linked_file, "--no-cache")
+    assert "Iteration 0 : found 3 particle species" in out
+    assert status == 0
+
+
+@pytest.mark.parametrize("value, dtype, types", [
+    (1., np.float64, (np.float64, None)),
+    (1., np.float32, (np.float32, None)),
+    (1, np.uint32, (np.uint32, None)),
+    (np.string_("x"), None, (np.bytes_, None)),
+    ("x", h5.string_dtype(), (str, None)),
+    ([1., 2.], np.float64, (np.ndarray, np.float64)),
+    (np.array([b"x", b"yz"]), None, (np.ndarray, np.bytes_)),
+    # a scalar of a top-level array type
+    (np.zeros(3), np.dtype("(3,)f8"), (np.ndarray, np.float64)),
+    (h5.Empty("f8"), None, (h5.Empty, None)),
+])
+def test_stored_types(tmp_path, value, dtype, types):
+    with h5.File(str(tmp_path / "attrs.h5"), "w") as f:
+        f.attrs.create("a", value, dtype=dtype)
+        assert stored_types(h5a.open(f.id, b"a")) == types
+        # the types of the value as h5py reads it
+        assert attr_types(f.attrs, "a") == types
+        assert IndexAttrs(f).types("a") == types
+
+
+def test_lazy_attrs(small_example, monkeypatch):
+    file_name = small_example("lazy.h5")
+    reads = []
+    getitem = AttributeManager.__getitem__
+
+    def counted_getitem(attrs, name):
+        reads.append(name)
+        return getitem(attrs, name)
+
+    monkeypatch.setattr(AttributeManager, "__getitem__", counted_getitem)
+    with h5.File(file_name, "r") as f:
+        mesh = build_index(f, "/data/0/")["data/0/meshes/E"]
+        attrs = mesh.attrs
+        assert isinstance(attrs, IndexAttrs)
+        assert sorted(attrs.keys()) == sorted(f["data/0/meshes/E"].attrs)
+        assert "gridUnitSI" in attrs and "nothing" not in attrs
+        assert attrs.types("gridUnitSI") == (np.float64, None)
+        assert attrs.get("nothing", 0) == 0
+        with pytest.raises(KeyError):
+            attrs["nothing"]
+        # no value is read until it is accessed, and then only once
+        assert reads == []
+        assert attrs["gridUnitSI"] == f["data/0/meshes/E"].attrs["gridUnitSI"]
+        assert attrs["gridUnitSI"] == attrs.get("gridUnitSI")
+        assert reads == ["gridUnitSI", "gridUnitSI"]
+    # values that were read stay available after the file is closed
+    assert attrs["gridUnitSI"] == 1.
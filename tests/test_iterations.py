@@ -0,0 +1,55 @@
+"""
+Tests of the enumeration and selection of iterations
+"""
+import h5py as h5
+import pytest
+
+
+def iterations_checked(out):
+    """ The iterations in the order their particles were reported """
+    return [int(line.split()[1]) for line in out.splitlines()
+            if line.startswith("Iteration ") and "particle species" in line]
+
+
+def test_iteration_order(check, series_file):
+    status, out, err = check("-i", series_file, "--no-cache")
+    assert iterations_checked(out) == list(range(12))
+    status, out, err = check("-i", series_file, "--no-cache", "-j", "2",
+                             "--sort-batch", "5")
+    assert iterations_checked(out) == list(range(12))
+
+
+@pytest.mark.parametrize("options, iterations", [
+    (["--iterations", "2:10:3"], [2, 5, 8]),
+    (["--iterations", "7"], [7]),
+    (["--iterations", "9:"], [9, 10, 11]),
+    (["--last", "2"], [10, 11]),
+    (["--iterations", ":6", "--last", "2"], [4, 5]),
+    (["--sample", "3"], [0, 5, 11]),
+])
+def test_iteration_selection(check, series_file, options, iterations):
+    status, out, err = check("-i", series_file, "--no-cache", *options)
+    assert iterations_checked(out) == iterations
+    assert out.splitlines()[-1] == \
+        "Result: 0 Errors and 0 Warnings (partial: checked %d of 12 " \
+        "iterations)." % len(iterations)
+
+
+def test_iteration_zero_padded(check, series_file):
+    with h5.File(series_file, "r+") as f:
+        f["data"].move("2", "0002")
+    status, out, err = check("-i", series_file, "--no-cache",
+                             "--iterations", "0:3")
+    assert "Iteration 0002 : found 2 particle species" in out
+    assert len(iterations_checked(out)) == 3
+    assert out.splitlines()[-1].endswith("(partial: checked 3 of 12 "
+                                         "iterations).")
+
+
+@pytest.mark.parametrize("options", [[], ["--iterations", "0:3"]])
+def test_iteration_invalid_name(check, series_file, options):
+    with h5.File(series_file, "r+") as f:
+        f["data"].move("3", "abc")
+    status, out, err = check("-i", series_file, "--no-cache", *options)
+    assert status == 1
+    assert "corresponds to an actual integer" in out
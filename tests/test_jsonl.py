@@ -0,0 +1,20 @@
+"""
+Tests of the JSON Lines output
+"""
+import json
+
+
+def test_jsonl_schema(check, bad_file):
+    status, out, err = check("-i", bad_file, "--no-cache", "-v",
+                             "--format", "jsonl", "--iterations", "0")
+    records = [json.loads(line) for line in out.splitlines()]
+    for record in records[:-1]:
+        assert sorted(record) == ["file", "message", "path", "rule",
+                                  "severity", "type"]
+        assert record["type"] == "finding"
+        assert record["file"] == bad_file
+        assert record["severity"] in ("error", "warning", "info", "note")
+        assert record["path"].startswith("/")
+    assert records[-1] == {"type": "summary", "errors": 3, "warnings": 0,
+                           "truncated": False,
+                           "partial": "checked 1 of 3 iterations"}
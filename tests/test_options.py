@@ -0,0 +1,19 @@
+"""
+Tests of the parsers of command line options shared by the tools
+"""
+import pytest
+
+from openpmd_validator.options_h5 import parse_bytes
+
+
+@pytest.mark.parametrize("arg, value", [("0", 0), ("100", 100),
+                                        ("1.5k", 1536), ("2M", 2 * 1024**2),
+                                        ("1G", 1024**3), ("1T", 1024**4)])
+def test_parse_bytes(arg, value):
+    assert parse_bytes(arg) == value
+
+
+@pytest.mark.parametrize("arg", ["", "k", "x", "-1", "inf", "nan", "1P"])
+def test_parse_bytes_invalid(arg):
+    with pytest.raises(ValueError):
+        parse_bytes(arg)
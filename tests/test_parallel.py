@@ -0,0 +1,19 @@
+"""
+Tests of the checks of the iterations of a file in worker processes
+"""
+import pytest
+
+
+def test_valid_example(check, series_file):
+    status, out, err = check("-i", series_file, "--no-cache")
+    assert status == 0
+    assert out.splitlines()[-1] == "Result: 0 Errors and 0 Warnings."
+
+
+@pytest.mark.parametrize("options", [[], ["-v"], ["--check-data"],
+                                     ["--format", "jsonl", "-v"]])
+def test_workers_same_output(check, series_file, bad_file, options):
+    for file_name in (series_file, bad_file):
+        serial = check("-i", file_name, "--no-cache", *options)
+        parallel = check("-i", file_name, "--no-cache", "-j", "2", *options)
+        assert serial == parallel
@@ -0,0 +1,44 @@
+"""
+Tests of the checks of particle patches
+"""
+import h5py as h5
+import numpy as np
+import pytest
+
+
+def remove_position_components(species):
+    for record in ("position", "positionOffset"):
+        for name in list(species[record]):
+            del species[record][name]
+
+
+def num_particles_group(species):
+    patches = species["particlePatches"]
+    del patches["numParticles"]
+    group = patches.create_group("numParticles")
+    group["a"] = np.arange(4)
+
+
+def rename_position_offset(species):
+    species["positionOffset"].move("x", "u")
+
+
+def scalar_positions(species):
+    for name in list(species["position"]):
+        del species["position"][name]
+        species["position"][name] = np.float64(1.)
+        species["position"][name].attrs["unitSI"] = 1.
+
+
+@pytest.mark.parametrize("modify", [remove_position_components,
+                                    num_particles_group,
+                                    rename_position_offset,
+                                    scalar_positions])
+def test_malformed_patches(check_jsonl, small_example, modify):
+    file_name = small_example("patches.h5")
+    with h5.File(file_name, "r+") as f:
+        modify(f["data/0/particles/electrons"])
+    findings, summary = check_jsonl("-i", file_name, "--no-cache",
+                                    "--check-data")
+    assert ("/data/0/particles/electrons/particlePatches",
+            "particle-patches") in [(r["path"], r["rule"]) for r in findings]
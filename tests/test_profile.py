@@ -0,0 +1,53 @@
+"""
+Tests of the profile of the checks
+"""
+import json
+
+import pytest
+
+from openpmd_validator.profile_h5 import Profile, columns
+
+
+def test_profile_merge(tmp_path):
+    profile = Profile()
+    profile.merge({"check_meshes": [2, 0.5, 0.25, 3, 4]})
+    profile.merge({"check_meshes": [1, 0.25, 0.25, 1, 1],
+                   "build_index": [1, 1.0, 1.0, 9, 0]})
+    assert profile.stats == {"check_meshes": [3, 0.75, 0.5, 4, 5],
+                             "build_index": [1, 1.0, 1.0, 9, 0]}
+
+    # by decreasing time
+    lines = profile.table()
+    assert lines[0].split()[0] == "function"
+    assert [line.split()[0] for line in lines[1:3]] == \
+        ["build_index", "check_meshes"]
+    assert lines[2].split() == ["check_meshes", "3", "0.7500", "0.5000",
+                                "4", "5"]
+    assert lines[-1].startswith("Wall time of the run")
+
+    file_name = str(tmp_path / "profile.json")
+    profile.write_json(file_name)
+    with open(file_name) as json_file:
+        written = json.load(json_file)
+    assert written == profile.as_dict()
+    assert written["functions"]["check_meshes"] == \
+        dict(zip(columns, [3, 0.75, 0.5, 4, 5]))
+
+
+@pytest.mark.parametrize("workers", ["1", "2"])
+def test_profile_workers(tmp_path, check, series_file, workers):
+    status, out, err = check("-i", series_file, "-j", workers,
+                             "--profile-json", "profile.json")
+    assert status == 0
+    assert out == check("-i", series_file)[1]
+    assert "Wall time of the run" in err
+    with open(str(tmp_path / "profile.json")) as json_file:
+        functions = json.load(json_file)["functions"]
+    # the calls of the checks in the worker processes are merged
+    calls = dict((name, stats["calls"]) for name, stats in functions.items())
+    assert calls["check_meshes"] == calls["check_particles"] == 12
+    assert calls["check_root_attr"] == calls["check_iterations"] == 1
+    assert calls["build_index"] == 13
+    assert calls.get("check_iteration", 12) == 12
+    assert all(stats["seconds"] >= stats["self_seconds"] >= 0
+               for stats in functions.values())
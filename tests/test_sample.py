@@ -0,0 +1,86 @@
+"""
+Tests of the random samples of the data checks
+"""
+import os
+
+import h5py as h5
+import numpy as np
+import pytest
+
+from openpmd_validator.data_h5 import DataCheck, find_non_finite, \
+    sample_blocks
+
+
+@pytest.fixture
+def sample_file(tmp_path):
+    """
+    A file with a contiguous, a chunked and a compressed dataset of 1 MiB
+    of random values each
+    """
+    file_name = str(tmp_path / "sample.h5")
+    values = np.random.RandomState(0).random_sample((256, 512))
+    with h5.File(file_name, "w") as f:
+        f.create_dataset("contiguous", data=values)
+        f.create_dataset("chunked", data=values, chunks=(32, 64))
+        f.create_dataset("compressed", data=values, chunks=(64, 64),
+                         compression="gzip")
+    return file_name
+
+
+def read_samples(file_name, data_check, monkeypatch):
+    """
+    Scan the samples of all datasets of `file_name`
+
+    Returns
+    -------
+    A tuple (dictionary {dataset: covered fraction}, number of bytes read)
+    """
+    read = []
+    getitem = h5.Dataset.__getitem__
+
+    def counted_getitem(dset, args, **kwargs):
+        data = getitem(dset, args, **kwargs)
+        read.append(data.nbytes)
+        return data
+
+    monkeypatch.setattr(h5.Dataset, "__getitem__", counted_getitem)
+    coverage = {}
+    with h5.File(file_name, "r") as f:
+        for name in sorted(f.keys()):
+            blocks, coverage[name] = sample_blocks(f[name], data_check)
+            assert find_non_finite(f[name], data_check.block_bytes,
+                                   blocks) is None
+    return coverage, sum(read)
+
+
+@pytest.mark.parametrize("sample_bytes", [1000, 100 * 1024, 1024**2])
+def test_sample_bytes_read(sample_file, monkeypatch, sample_bytes):
+    data_check = DataCheck(block_bytes=64 * 1024, sample_bytes=sample_bytes)
+    coverage, read = read_samples(sample_file, data_check, monkeypatch)
+    assert read <= sample_bytes
+    # the uncompressed datasets use up their share up to less than a row
+    # of a chunk
+    share = sample_bytes * 1024**2 // os.path.getsize(sample_file)
+    for name in ("contiguous", "chunked"):
+        covered = coverage[name] * 1024**2
+        assert share - 512 * 8 < covered <= share
+
+    # the same sample for the same seed
+    assert read_samples(sample_file, data_check, monkeypatch) == \
+        (coverage, read)
+
+
+def test_sample_whole_chunks(sample_file, monkeypatch):
+    # compressed chunks are read as a whole or not at all
+    data_check = DataCheck(sample_bytes=300 * 1024)
+    coverage, read = read_samples(sample_file, data_check, monkeypatch)
+    chunks = coverage["compressed"] * 256 * 512 / (64 * 64)
+    assert 0 < chunks == int(chunks)
+
+
+def test_sample_all(sample_file, monkeypatch):
+    # no chunk is drawn twice
+    data_check = DataCheck(sample_bytes=2 * os.path.getsize(sample_file))
+    coverage, read = read_samples(sample_file, data_check, monkeypatch)
+    assert coverage == {"chunked": 1.0, "compressed": 1.0, "contiguous": 1.0}
+    assert read == 3 * 1024**2
@@ -0,0 +1,64 @@
+"""
+Tests of the consistency of the shapes of records and species
+"""
+import h5py as h5
+import numpy as np
+import pytest
+
+
+def resize(f, path, shape):
+    """ Replace the dataset `path` by one of `shape`, with its attributes """
+    attrs = dict(f[path].attrs)
+    del f[path]
+    dset = f.create_dataset(path, data=np.zeros(shape))
+    for name, value in attrs.items():
+        dset.attrs[name] = value
+
+
+def test_shapes_valid(check_jsonl, small_example):
+    file_name = small_example("valid.h5", species=2)
+    findings, summary = check_jsonl("-i", file_name)
+    assert findings == []
+    assert summary["errors"] == 0
+
+
+@pytest.mark.parametrize("changes, errors", [
+    # a mesh component
+    ({"data/0/meshes/E/y": (8, 8)},
+     [("/data/0/meshes/E", "record-shape",
+       "(x: (8, 16), y: (8, 8), z: (8, 16))")]),
+    # a constant mesh component
+    ({"data/0/meshes/B/x": [16, 8]},
+     [("/data/0/meshes/B", "record-shape",
+       "(x: (16, 8), y: (8, 16), z: (8, 16))")]),
+    # a component of a particle record
+    ({"data/0/particles/electrons/momentum/z": (15,)},
+     [("/data/0/particles/electrons/momentum", "record-shape",
+       "(x: (16,), y: (16,), z: (15,))")]),
+    # a whole particle record
+    ({"data/0/particles/electrons/weighting": (15,)},
+     [("/data/0/particles/electrons/weighting", "record-shape",
+       "`weighting` has the shape (15,) but the other records have the "
+       "shape (16,)")]),
+    # a particlePatches record, which also no longer matches the patches
+    ({"data/0/particles/electrons/particlePatches/numParticles": (3,)},
+     [("/data/0/particles/electrons/particlePatches", "particle-patches",
+       ""),
+      ("/data/0/particles/electrons/particlePatches/numParticles",
+       "record-shape", "`numParticles` has the shape (3,) but the other "
+       "records have the shape (4,)")]),
+])
+def test_shapes_mismatch(check_jsonl, small_example, changes, errors):
+    file_name = small_example("shapes.h5")
+    with h5.File(file_name, "r+") as f:
+        for path, shape in changes.items():
+            if isinstance(f[path], h5.Group):
+                f[path].attrs["shape"] = np.array(shape, dtype=np.uint64)
+            else:
+                resize(f, path, shape)
+    findings, summary = check_jsonl("-i", file_name)
+    assert summary["errors"] == len(errors)
+    assert [(r["path"], r["rule"]) for r in findings] == \
+        [(path, rule) for path, rule, _ in errors]
+    for finding, (_, _, message) in zip(findings, errors):
+        assert message in finding["message"]